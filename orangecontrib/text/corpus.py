@@ -10,7 +10,7 @@ from warnings import warn
 import nltk
 import numpy as np
 import scipy.sparse as sp
-from gensim import corpora
+from gensim import corpora, matutils
 
 from Orange.data import (
     Variable,
@@ -24,7 +24,7 @@ from Orange.data import (
 )
 from Orange.preprocess.transformation import Identity
 from Orange.data.util import get_unique_names
-from orangecontrib.text.vectorization import BowVectorizer
+from orangecontrib.text.util import Sparse2CorpusSliceable
 
 try:
     from orangewidget.utils.signals import summarize, PartialSummary
@@ -86,6 +86,9 @@ class Corpus(Table):
         self._tokens = None
         self._dictionary = None
         self._ngrams_corpus = None
+        self._ngrams_dictionary = None
+        self._raw_ngrams = None
+        self._inverted_index = None
         self.ngram_range = (1, 1)
         self.attributes = {}
         self._pos_tags = None
@@ -257,7 +260,8 @@ class Corpus(Table):
 
     def extend_attributes(
             self, X, feature_names, feature_values=None, compute_values=None,
-            var_attrs=None, sparse=False, rename_existing=False
+            var_attrs=None, sparse=False, rename_existing=False,
+            copy_arrays=True
         ):
         """
         Append features to corpus. If `feature_values` argument is present,
@@ -272,6 +276,9 @@ class Corpus(Table):
             sparse (bool): Whether the features should be marked as sparse.
             rename_existing (bool): When true and names are not unique rename
                 exiting features; if false rename new features
+            copy_arrays (bool): When false Y, metas and W are shared with this
+                corpus instead of being copied. Use it only when the caller
+                owns this corpus (e.g. it is already a copy).
         """
         def _rename_features(additional_names: List) -> Tuple[List, List, List]:
             cur_attr = list(self.domain.attributes)
@@ -294,7 +301,10 @@ class Corpus(Table):
                 cur_meta = renamed_vars[-len(cur_meta):]
             return cur_attr, cur_class, cur_meta
 
-        if sp.issparse(self.X) or sp.issparse(X):
+        if not self.X.shape[1]:
+            # nothing to append to - avoid copying (possibly huge) X in hstack
+            X = X.tocsr() if sp.issparse(X) else np.asarray(X, dtype=float)
+        elif sp.issparse(self.X) or sp.issparse(X):
             X = sp.hstack((self.X, X)).tocsr()
         else:
             X = np.hstack((self.X, X))
@@ -332,14 +342,11 @@ class Corpus(Table):
                 class_vars=curr_class_var,
                 metas=curr_metas
         )
-        c = Corpus(
-            new_domain,
-            X,
-            self.Y.copy(),
-            self.metas.copy(),
-            self.W.copy(),
-            copy(self.text_features)
-        )
+        if copy_arrays:
+            Y, metas, W = self.Y.copy(), self.metas.copy(), self.W.copy()
+        else:
+            Y, metas, W = self.Y, self.metas, self.W
+        c = Corpus(new_domain, X, Y, metas, W, copy(self.text_features))
         Corpus.retain_preprocessing(self, c)
         return c
 
@@ -424,6 +431,22 @@ class Corpus(Table):
             return self._base_tokens()[1]
         return self._dictionary
 
+    @property
+    def inverted_index(self):
+        """
+        InvertedIndex: An inverted index of tokens used for fast word counting
+        and ranking. It is built at first use and kept until tokens change.
+        """
+        from orangecontrib.text.inverted_index import InvertedIndex
+
+        tokens = self.tokens
+        if self._inverted_index is None or self._inverted_index[0] is not tokens:
+            index = InvertedIndex(tokens)
+            if self._tokens is None:  # base tokens are not cached
+                return index
+            self._inverted_index = (tokens, index)
+        return self._inverted_index[1]
+
     @property
     def pos_tags(self):
         """
@@ -461,13 +484,72 @@ class Corpus(Table):
 
     @property
     def ngrams_corpus(self):
+        """
+        Sparse2CorpusSliceable: Ngrams of documents in the bag-of-words
+        format; term ids are given by `ngrams_dictionary`. Weights of
+        bag-of-words features are used when the corpus has them and counts
+        otherwise.
+        """
         if self._ngrams_corpus is None:
-            return BowVectorizer().transform(self).ngrams_corpus
+            return self._ngrams_counts()[1]
         return self._ngrams_corpus
 
     @ngrams_corpus.setter
     def ngrams_corpus(self, value):
         self._ngrams_corpus = value
+        self._ngrams_dictionary = None
+
+    @property
+    def ngrams_dictionary(self):
+        """
+        corpora.Dictionary: An ngram to id mapper of `ngrams_corpus`.
+        """
+        if self._ngrams_corpus is None:
+            return self._ngrams_counts()[0]
+        if self._ngrams_dictionary is None:
+            self._ngrams_dictionary = corpora.Dictionary(
+                self.ngrams_iterator(include_postags=True), prune_at=None)
+        return self._ngrams_dictionary
+
+    @ngrams_dictionary.setter
+    def ngrams_dictionary(self, value):
+        self._ngrams_dictionary = value
+
+    def _ngrams_key(self):
+        return self.tokens, self._pos_tags, self.ngram_range
+
+    def _cached_ngrams_dictionary(self):
+        """
+        `ngrams_dictionary` if it is already computed and None otherwise.
+        """
+        if self._ngrams_corpus is not None:
+            return self._ngrams_dictionary
+        if self._raw_ngrams is not None and self._tokens is not None and \
+                all(a is b for a, b in zip(self._raw_ngrams[0],
+                                           self._ngrams_key())):
+            return self._raw_ngrams[1]
+        return None
+
+    def _ngrams_counts(self):
+        """
+        Dictionary of ngrams and the ngram-document count matrix built in a
+        single pass over ngrams. The result is kept while tokens, POS tags
+        and ngram range do not change.
+        """
+        key = self._ngrams_key()
+        if self._raw_ngrams is not None and \
+                all(a is b for a, b in zip(self._raw_ngrams[0], key)):
+            return self._raw_ngrams[1:]
+
+        dictionary = corpora.Dictionary()
+        # doc2bow with allow_update assigns the same ids as Dictionary(docs)
+        bow = [dictionary.doc2bow(doc, allow_update=True)
+               for doc in self.ngrams_iterator(include_postags=True)]
+        counts = Sparse2CorpusSliceable(matutils.corpus2csc(
+            bow, num_terms=len(dictionary), num_docs=len(bow), dtype=float))
+        if self._tokens is not None:  # base tokens are not cached
+            self._raw_ngrams = (key, dictionary, counts)
+        return dictionary, counts
 
     @property
     def ngrams(self):
@@ -488,6 +570,9 @@ class Corpus(Table):
         c._titles = self._titles
         c._pp_documents = self._pp_documents
         c._ngrams_corpus = self._ngrams_corpus
+        c._ngrams_dictionary = self._ngrams_dictionary
+        c._raw_ngrams = self._raw_ngrams
+        c._inverted_index = self._inverted_index
         return c
 
     @staticmethod
@@ -608,9 +693,14 @@ class Corpus(Table):
                         or isinstance(key, slice) or isinstance(key, range):
                     new._tokens = orig._tokens[key]
                     new.pos_tags = None if orig.pos_tags is None else orig.pos_tags[key]
+                    if orig._inverted_index is not None \
+                            and orig._inverted_index[0] is orig._tokens:
+                        new._inverted_index = (
+                            new._tokens, orig._inverted_index[1][key])
                 elif key is Ellipsis:
                     new._tokens = orig._tokens
                     new.pos_tags = orig.pos_tags
+                    new._inverted_index = orig._inverted_index
                 else:
                     raise TypeError('Indexing by type {} not supported.'.format(type(key)))
                 new._dictionary = orig._dictionary
@@ -635,6 +725,15 @@ class Corpus(Table):
             new.used_preprocessor = orig.used_preprocessor
             if orig._ngrams_corpus is not None:
                 new.ngrams_corpus = orig._ngrams_corpus[key]
+                new.ngrams_dictionary = orig._ngrams_dictionary
+            elif orig._cached_ngrams_dictionary() is not None \
+                    and new._tokens is not None:
+                # counts of ngrams of a subset are a subset of counts
+                _, dictionary, counts = orig._raw_ngrams
+                if key is not Ellipsis:
+                    rows = np.arange(len(orig._tokens))[key]
+                    counts = counts[np.atleast_1d(rows)]
+                new._raw_ngrams = (new._ngrams_key(), dictionary, counts)
         else:  # orig is not Corpus
             new._set_unique_titles()
             new._infer_text_features()
@@ -0,0 +1,221 @@
+"""This module contains an inverted index over tokens of documents used for
+fast word counting and BM25/TF-IDF ranking.
+
+Postings are stored in a sparse document-term matrix in CSC format, so
+counts of a word in all documents are a single contiguous slice. Scoring a
+list of words therefore only touches postings of these words.
+
+    >>> index = InvertedIndex(corpus.tokens)
+    >>> scores = index.bm25(['orange', 'apple'])  # shape (n_docs, 2)
+    >>> docs, doc_scores = index.search(['orange', 'apple'], k=10)
+
+The index of a corpus is cached in `Corpus.inverted_index`.
+"""
+import json
+import os
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import scipy.sparse as sp
+
+COUNT_DTYPE = np.int32
+
+
+class InvertedIndex:
+    """Inverted index of tokenized documents.
+
+    Attributes
+    ----------
+    vocabulary : dict
+        Mapping from a token to its column in `postings`.
+    postings : sp.csc_matrix
+        Token counts, shape (n_docs, n_tokens).
+    doc_lengths : np.ndarray
+        Number of tokens in every document.
+    """
+
+    def __init__(self, tokens: Optional[Iterable[Sequence[str]]] = None) \
+            -> None:
+        """
+        Parameters
+        ----------
+        tokens
+            Tokens of every document.
+        """
+        self.vocabulary: Dict[str, int] = {}
+        self.postings = sp.csc_matrix((0, 0), dtype=COUNT_DTYPE)
+        self.doc_lengths = np.zeros(0, dtype=np.int64)
+        if tokens is not None:
+            self.append(tokens)
+
+    def __len__(self) -> int:
+        return self.postings.shape[0]
+
+    @property
+    def document_frequency(self) -> np.ndarray:
+        """Number of documents containing each token."""
+        return np.diff(self.postings.indptr)
+
+    def append(self, tokens: Iterable[Sequence[str]]) -> None:
+        """Add documents to the index without rebuilding existing postings.
+
+        Parameters
+        ----------
+        tokens
+            Tokens of every new document.
+        """
+        # copy since subsets share the vocabulary
+        vocabulary = dict(self.vocabulary)
+        term_ids, lengths = [], []
+        for doc in tokens:
+            term_ids.extend(vocabulary.setdefault(t, len(vocabulary))
+                            for t in doc)
+            lengths.append(len(doc))
+        n_new, n_terms = len(lengths), len(vocabulary)
+        lengths = np.array(lengths, dtype=np.int64)
+        new = sp.csc_matrix(
+            (np.ones(len(term_ids), dtype=COUNT_DTYPE),
+             (np.repeat(np.arange(n_new), lengths),
+              np.array(term_ids, dtype=np.int64))),
+            shape=(n_new, n_terms))
+        new.sum_duplicates()
+        self.postings = sp.vstack(
+            [self._with_columns(self.postings, n_terms), new],
+            format='csc', dtype=COUNT_DTYPE)
+        self.doc_lengths = np.concatenate((self.doc_lengths, lengths))
+        self.vocabulary = vocabulary
+
+    @staticmethod
+    def _with_columns(matrix: sp.csc_matrix, n_columns: int) \
+            -> sp.csc_matrix:
+        """Pad a CSC matrix with empty columns."""
+        indptr = np.pad(matrix.indptr, (0, n_columns - matrix.shape[1]),
+                        mode='edge')
+        return sp.csc_matrix((matrix.data, matrix.indices, indptr),
+                             shape=(matrix.shape[0], n_columns))
+
+    def __getitem__(self, rows) -> "InvertedIndex":
+        """Index of a subset of documents; the vocabulary is shared."""
+        rows = np.arange(len(self))[rows]
+        index = InvertedIndex()
+        index.vocabulary = self.vocabulary
+        index.postings = self.postings[rows]
+        index.doc_lengths = self.doc_lengths[rows]
+        return index
+
+    def _columns(self, words: Sequence[str]) \
+            -> Tuple[sp.csc_matrix, np.ndarray]:
+        """Postings of known words and positions of these words in `words`."""
+        cols = np.fromiter((self.vocabulary.get(w, -1) for w in words),
+                           dtype=np.int64, count=len(words))
+        known = np.flatnonzero(cols >= 0)
+        return self.postings[:, cols[known]], known
+
+    def _scatter(self, matrix: sp.csc_matrix, known: np.ndarray,
+                 n_words: int) -> np.ndarray:
+        result = np.zeros((len(self), n_words))
+        result[:, known] = matrix.toarray()
+        return result
+
+    def frequency(self, words: Sequence[str]) -> np.ndarray:
+        """Counts of words in documents, shape (n_docs, n_words)."""
+        return self._scatter(*self._columns(words), len(words))
+
+    def appearance(self, words: Sequence[str]) -> np.ndarray:
+        """Whether words appear in documents, shape (n_docs, n_words)."""
+        return self.frequency(words) > 0
+
+    def idf(self, words: Sequence[str]) -> np.ndarray:
+        """Smoothed BM25 inverse document frequency of words; it is
+        positive also for words that appear in most documents."""
+        counts, known = self._columns(words)
+        df = np.zeros(len(words))
+        df[known] = np.diff(counts.indptr)
+        return np.log(1 + (len(self) - df + 0.5) / (df + 0.5))
+
+    def bm25(self, words: Sequence[str], k1: float = 1.2, b: float = 0.75) \
+            -> np.ndarray:
+        """Okapi BM25 scores of words, shape (n_docs, n_words).
+
+        Parameters
+        ----------
+        words
+            Words to score documents with.
+        k1
+            Saturation of the term frequency.
+        b
+            Strength of the document length normalization.
+        """
+        counts, known = self._columns(words)
+        scores = counts.astype(float)
+        if scores.nnz:
+            tf = scores.data
+            avg_length = self.doc_lengths.mean()
+            norm = k1 * (1 - b + b * self.doc_lengths[scores.indices]
+                         / avg_length)
+            idf = self.idf([words[i] for i in known])
+            scores.data = np.repeat(idf, np.diff(scores.indptr)) \
+                * tf * (k1 + 1) / (tf + norm)
+        return self._scatter(scores, known, len(words))
+
+    def tfidf(self, words: Sequence[str]) -> np.ndarray:
+        """TF-IDF weights of words with smoothed IDF as in BowVectorizer,
+        shape (n_docs, n_words)."""
+        counts, known = self._columns(words)
+        scores = counts.astype(float)
+        df = np.diff(scores.indptr)
+        idf = np.log((len(self) + 1) / (df + 1)) + 1
+        scores.data *= np.repeat(idf, df)
+        return self._scatter(scores, known, len(words))
+
+    def search(self, query: Sequence[str], k: Optional[int] = None,
+               method: str = 'bm25') -> Tuple[np.ndarray, np.ndarray]:
+        """Rank documents by the sum of scores of query words.
+
+        Parameters
+        ----------
+        query
+            Query tokens; repeated tokens are counted once.
+        k
+            Number of returned documents; all matching documents if None.
+        method
+            'bm25' or 'tfidf'.
+
+        Returns
+        -------
+        Indices and scores of documents containing at least one query word,
+        sorted by decreasing score.
+        """
+        if method not in ('bm25', 'tfidf'):
+            raise ValueError('{} is not a valid method.'.format(method))
+        words = list(dict.fromkeys(query))
+        scores = getattr(self, method)(words).sum(axis=1)
+        matching = np.flatnonzero(self.frequency(words).any(axis=1))
+        if k is not None and k < len(matching):
+            top = np.argpartition(-scores[matching], k - 1)[:k]
+            matching = matching[top]
+        order = np.argsort(-scores[matching], kind='stable')
+        return matching[order], scores[matching[order]]
+
+    def save(self, path: str) -> None:
+        """Save the index to directory path."""
+        os.makedirs(path, exist_ok=True)
+        words = sorted(self.vocabulary, key=self.vocabulary.get)
+        with open(os.path.join(path, 'vocabulary.json'), 'w',
+                  encoding='utf-8') as f:
+            json.dump(words, f, ensure_ascii=False)
+        sp.save_npz(os.path.join(path, 'postings.npz'), self.postings)
+        np.save(os.path.join(path, 'doc_lengths.npy'), self.doc_lengths)
+
+    @classmethod
+    def load(cls, path: str) -> "InvertedIndex":
+        """Load the index saved to directory path."""
+        index = cls()
+        with open(os.path.join(path, 'vocabulary.json'),
+                  encoding='utf-8') as f:
+            words: List[str] = json.load(f)
+        index.vocabulary = {w: i for i, w in enumerate(words)}
+        index.postings = sp.load_npz(os.path.join(path, 'postings.npz')) \
+            .tocsc()
+        index.doc_lengths = np.load(os.path.join(path, 'doc_lengths.npy'))
+        return index
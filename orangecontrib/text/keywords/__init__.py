@@ -1,21 +1,34 @@
 """
 Module for keyword extraction.
 """
-from collections import defaultdict
+import atexit
+import hashlib
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 from itertools import chain
-from typing import List, Tuple, Callable
+from operator import itemgetter
+from threading import Lock
+from typing import List, Tuple, Callable, Optional
 
 import yake
 from nltk.corpus import stopwords
 import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
+import pandas as pd
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import TfidfVectorizer, \
+    TfidfTransformer
 
 from Orange.util import dummy_callback
 
+from orangecontrib.text.corpus import Corpus
 from orangecontrib.text.keywords.rake import Rake
 from orangecontrib.text.keywords.embedding import embedding_keywords, \
     EMBEDDING_LANGUAGE_MAPPING
 from orangecontrib.text.preprocess import StopwordsFilter
+from orangecontrib.text.vectorization import BowVectorizer
+from orangecontrib.text.vectorization.base import VectorizationComputeValue
 
 # all available languages for RAKE
 RAKE_LANGUAGES = StopwordsFilter.supported_languages()
@@ -58,9 +71,50 @@ YAKE_LANGUAGE_MAPPING = {
 }
 
 
+def _bow_tfidf(corpus: Corpus) -> Optional[sp.csr_matrix]:
+    """
+    Return TF-IDF weights from bag-of-words features of the corpus.
+
+    Weights of features computed with IDF are used as they are; raw counts
+    are weighted with IDF and L2-normalized as in `TfidfVectorizer`. Other
+    features (or none) give None.
+
+    Parameters
+    ----------
+    corpus : Corpus
+        A corpus, possibly with bag-of-words features.
+
+    Returns
+    -------
+    X : sp.csr_matrix or None
+    """
+    if corpus._ngrams_corpus is None:
+        return None
+    vectorizer = next(
+        (attr.compute_value.compute_shared.vectorizer
+         for attr in corpus.domain.attributes
+         if attr.attributes.get("bow-feature")
+         and isinstance(attr.compute_value, VectorizationComputeValue)),
+        None
+    )
+    if not isinstance(vectorizer, BowVectorizer) \
+            or vectorizer.wlocal != BowVectorizer.COUNT:
+        return None
+
+    X = sp.csr_matrix(corpus.ngrams_corpus.sparse.T)
+    if vectorizer.wglobal in (BowVectorizer.IDF, BowVectorizer.SMOOTH):
+        return X
+    if vectorizer.wglobal == BowVectorizer.NONE \
+            and vectorizer.norm == BowVectorizer.NONE:
+        return TfidfTransformer().fit_transform(X)
+    return None
+
+
 def tfidf_keywords(
         tokens: List[List[str]],
-        progress_callback: Callable = None
+        progress_callback: Callable = None,
+        top_k: Optional[int] = None,
+        corpus: Optional[Corpus] = None
 ) -> List[List[Tuple[str, float]]]:
     """
     Extract keywords using TF-IDF.
@@ -71,6 +125,14 @@ def tfidf_keywords(
         Lists of tokens.
     progress_callback : callable
         Function for reporting progress.
+    top_k : int, optional
+        Number of keywords with the highest scores kept for each document;
+        keywords are then sorted by decreasing score. All keywords are kept
+        in the order of the vocabulary if None.
+    corpus : Corpus, optional
+        A corpus of `tokens`. If it has bag-of-words features with counts or
+        IDF weights, TF-IDF is computed from them and tokens are not
+        vectorized again; keywords are then the bag-of-words n-grams.
 
     Returns
     -------
@@ -79,23 +141,210 @@ def tfidf_keywords(
     if progress_callback is None:
         progress_callback = dummy_callback
 
-    vectorizer = TfidfVectorizer(tokenizer=lambda x: x, lowercase=False)
-    X = vectorizer.fit_transform(tokens)
-    words = vectorizer.get_feature_names()
-
-    keywords = []
-    n_docs = X.shape[0]
-    for i, row in enumerate(X):
-        progress_callback(i / n_docs)
-        keywords.append([(words[i], row[0, i]) for i in row.nonzero()[1]])
+    X = _bow_tfidf(corpus) if corpus is not None else None
+    if X is not None:
+        dictionary = corpus.ngrams_dictionary
+        words = [dictionary[i] for i in range(X.shape[1])]
+        if not words:
+            raise ValueError("empty vocabulary")
+    else:
+        vectorizer = TfidfVectorizer(tokenizer=lambda x: x, lowercase=False)
+        X = vectorizer.fit_transform(tokens)
+        words = vectorizer.get_feature_names()
+    progress_callback(0.5)
+
+    # scores are read from the CSR arrays of all documents at once; explicit
+    # zeros are skipped without modifying a (shared) matrix
+    nonzero = X.data != 0
+    rows = np.repeat(np.arange(X.shape[0]), np.diff(X.indptr))[nonzero]
+    indices, data = X.indices[nonzero], X.data[nonzero]
+    if top_k is not None:
+        order = np.lexsort((-data, rows))
+        rows, indices, data = rows[order], indices[order], data[order]
+        indptr = np.searchsorted(rows, np.arange(X.shape[0] + 1))
+        rank = np.arange(len(rows)) - indptr[rows]
+        keep = rank < top_k
+        rows, indices, data = rows[keep], indices[keep], data[keep]
+    indptr = np.searchsorted(rows, np.arange(X.shape[0] + 1))
+
+    pairs = list(zip(np.array(words, dtype=object)[indices].tolist(),
+                     data.tolist()))
+    keywords = [pairs[start:end] for start, end in zip(indptr, indptr[1:])]
+    progress_callback(1)
     return keywords
 
 
+class _KeywordsCache:
+    """
+    Keywords of single documents extracted with YAKE! or RAKE, keyed by
+    (method, language, max_len, hash of the text). The least recently used
+    documents are removed when the cache is full.
+    """
+    def __init__(self, max_size: int = 10000):
+        self.max_size = max_size
+        self._data = OrderedDict()
+        self._lock = Lock()
+
+    @staticmethod
+    def key(method: str, language: str, max_len: int, text: str) -> Tuple:
+        digest = hashlib.sha1(text.encode("utf-8", "surrogatepass")).digest()
+        return method, language, max_len, digest
+
+    def get(self, key: Tuple) -> Optional[List[Tuple[str, float]]]:
+        with self._lock:
+            keywords = self._data.get(key)
+            if keywords is not None:
+                self._data.move_to_end(key)
+            return keywords
+
+    def set(self, key: Tuple, keywords: List[Tuple[str, float]]):
+        with self._lock:
+            self._data[key] = keywords
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+_keywords_cache = _KeywordsCache()
+
+
+def clear_keywords_cache():
+    """
+    Remove keywords of documents cached by `yake_keywords` and
+    `rake_keywords`.
+    """
+    _keywords_cache.clear()
+
+
+@lru_cache(maxsize=None)
+def _yake_extractor(language: str, max_len: int) -> yake.KeywordExtractor:
+    return yake.KeywordExtractor(lan=YAKE_LANGUAGE_MAPPING[language], n=max_len)
+
+
+@lru_cache(maxsize=None)
+def _rake_extractor(language: str, max_len: int) -> Rake:
+    stop_words_ = [x.strip() for x in stopwords.words(language.lower())]
+    return Rake(stop_words_, max_words_length=max_len)
+
+
+_EXTRACTORS = {
+    "yake": (_yake_extractor, "extract_keywords"),
+    "rake": (_rake_extractor, "run"),
+}
+
+# extractor of a worker process; see _init_worker
+_extract = None
+
+
+def _init_worker(method: str, language: str, max_len: int):
+    # workers receive the configuration and build the extractor once
+    global _extract
+    factory, name = _EXTRACTORS[method]
+    _extract = getattr(factory(language, max_len), name)
+
+
+def _extract_chunk(texts: List[str]) -> List[List[Tuple[str, float]]]:
+    return [_extract(text) for text in texts]
+
+
+# minimal number of documents extracted in worker processes; fewer
+# documents are extracted in this process
+MIN_PARALLEL_DOCS = 100
+
+# worker pools, kept for later calls, by (method, language, max_len)
+_executors = {}
+_executors_lock = Lock()
+
+
+def _executor(n_jobs: int, initargs: Tuple) -> ProcessPoolExecutor:
+    """
+    Return the pool of `n_jobs` workers with an extractor for `initargs`.
+    Workers are started once and kept for later calls with the same
+    configuration.
+    """
+    with _executors_lock:
+        pool_jobs, executor = _executors.get(initargs, (None, None))
+        if pool_jobs != n_jobs or executor._broken:
+            if executor is not None:
+                executor.shutdown(wait=False, cancel_futures=True)
+            # forking a process with running threads (Qt, BLAS) may deadlock
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context(
+                "forkserver" if "forkserver" in methods else "spawn")
+            executor = ProcessPoolExecutor(
+                n_jobs, mp_context=context,
+                initializer=_init_worker, initargs=initargs)
+            _executors[initargs] = n_jobs, executor
+        return executor
+
+
+@atexit.register
+def _shutdown_executors():
+    with _executors_lock:
+        for _, executor in _executors.values():
+            executor.shutdown(wait=False, cancel_futures=True)
+        _executors.clear()
+
+
+def _extract_keywords(
+        method: str,
+        texts: List[str],
+        language: str,
+        max_len: int,
+        n_jobs: int,
+        progress_callback: Callable
+) -> List[List[Tuple[str, float]]]:
+    """
+    Extract keywords of documents that are not cached, in this process or in
+    `n_jobs` worker processes, and cache them.
+    """
+    keys = [_keywords_cache.key(method, language, max_len, text)
+            for text in texts]
+    keywords = [_keywords_cache.get(key) for key in keys]
+    todo = [i for i, kws in enumerate(keywords) if kws is None]
+    n_docs, n_cached = len(texts), len(texts) - len(todo)
+
+    def store(i, kws):
+        _keywords_cache.set(keys[i], kws)
+        keywords[i] = kws
+
+    if n_jobs == 1 or len(todo) < MIN_PARALLEL_DOCS:
+        factory, name = _EXTRACTORS[method]
+        extract = getattr(factory(language, max_len), name)
+        for done, i in enumerate(todo):
+            progress_callback((n_cached + done) / n_docs)
+            store(i, extract(texts[i]))
+    else:
+        # documents are sent in chunks to reduce inter-process communication
+        chunk_size = max(1, min(100, len(todo) // (4 * n_jobs)))
+        chunks = [todo[i:i + chunk_size]
+                  for i in range(0, len(todo), chunk_size)]
+        executor = _executor(n_jobs, (method, language, max_len))
+        futures = [executor.submit(_extract_chunk, [texts[i] for i in c])
+                   for c in chunks]
+        try:
+            done = 0
+            for chunk, future in zip(chunks, futures):
+                progress_callback((n_cached + done) / n_docs)
+                for i, kws in zip(chunk, future.result()):
+                    store(i, kws)
+                done += len(chunk)
+        finally:
+            for future in futures:
+                future.cancel()
+    return [list(kws) for kws in keywords]
+
+
 def yake_keywords(
         texts: List[str],
         language: str = "English",
         max_len: int = 1,
-        progress_callback: Callable = None
+        progress_callback: Callable = None,
+        n_jobs: int = 1
 ) -> List[List[Tuple[str, float]]]:
     """
     Extract keywords using YAKE!.
@@ -110,6 +359,11 @@ def yake_keywords(
         Maximum number of tokens.
     progress_callback : callable
         Function for reporting progress.
+    n_jobs : int
+        Number of worker processes; documents are processed in this process
+        if 1 or if fewer than `MIN_PARALLEL_DOCS` are not cached. Workers are
+        kept for later calls. Keywords of documents processed before are
+        taken from the cache.
 
     Returns
     -------
@@ -118,22 +372,18 @@ def yake_keywords(
     if progress_callback is None:
         progress_callback = dummy_callback
 
-    language = YAKE_LANGUAGE_MAPPING[language]
-    extractor = yake.KeywordExtractor(lan=language, n=max_len)
-
-    keywords = []
-    n_docs = len(texts)
-    for i, text in enumerate(texts):
-        progress_callback(i / n_docs)
-        keywords.append(extractor.extract_keywords(text))
-    return keywords
+    if language not in YAKE_LANGUAGE_MAPPING:
+        raise KeyError(language)
+    return _extract_keywords("yake", texts, language, max_len, n_jobs,
+                             progress_callback)
 
 
 def rake_keywords(
         texts: List[str],
         language: str = "English",
         max_len: int = 1,
-        progress_callback: Callable = None
+        progress_callback: Callable = None,
+        n_jobs: int = 1
 ) -> List[List[Tuple[str, float]]]:
     """
     Extract keywords from text with RAKE method.
@@ -148,6 +398,11 @@ def rake_keywords(
         Maximal length of keywords/keyphrases extracted
     progress_callback : callable
         Function for reporting progress.
+    n_jobs : int
+        Number of worker processes; texts are processed in this process
+        if 1 or if fewer than `MIN_PARALLEL_DOCS` are not cached. Workers are
+        kept for later calls. Keywords of texts processed before are taken
+        from the cache.
 
     Returns
     -------
@@ -160,15 +415,8 @@ def rake_keywords(
     if language.lower() not in [l.lower() for l in RAKE_LANGUAGES]:
         raise ValueError(f"Language must be one of: {RAKE_LANGUAGES}")
 
-    stop_words_ = [x.strip() for x in stopwords.words(language.lower())]
-    rake_object = Rake(stop_words_, max_words_length=max_len)
-
-    keywords = []
-    n_docs = len(texts)
-    for i, text in enumerate(texts):
-        progress_callback(i / n_docs)
-        keywords.append(rake_object.run(text))
-    return keywords
+    return _extract_keywords("rake", texts, language.lower(), max_len,
+                             n_jobs, progress_callback)
 
 
 class ScoringMethods:
@@ -211,16 +459,34 @@ class AggregationMethods:
         -------
         Aggregated keyword scores.
         """
-        compute_mean = agg_method == AggregationMethods.MEAN
-        aggregator = [np.mean, np.median, np.min, np.max][agg_method]
-        unique_scores = defaultdict(lambda: 0. if compute_mean else [])
-
-        for word, score in chain.from_iterable(keywords):
-            unique_scores[word] += score if compute_mean else [score]
-
-        for word, score in unique_scores.items():
+        pairs = list(chain.from_iterable(keywords))
+        if not pairs:
+            return []
+        words = np.fromiter(map(itemgetter(0), pairs), dtype=object,
+                            count=len(pairs))
+        scores = np.fromiter(map(itemgetter(1), pairs), dtype=float,
+                             count=len(pairs))
+        # keyword ids in the order of first appearance
+        ids, unique_words = pd.factorize(words)
+        n_words = len(unique_words)
+
+        if agg_method == AggregationMethods.MEAN:
             # compute mean amongst all keywords
-            unique_scores[word] = score / len(keywords) if compute_mean \
-                else aggregator(score)
-
-        return list(unique_scores.items())
+            values = np.bincount(ids, weights=scores, minlength=n_words) \
+                / len(keywords)
+        else:
+            # scores sorted by keyword and then by score; every keyword's
+            # scores form a sorted segment
+            order = np.lexsort((scores, ids))
+            scores = scores[order]
+            counts = np.bincount(ids, minlength=n_words)
+            starts = np.cumsum(counts) - counts
+            if agg_method == AggregationMethods.MEDIAN:
+                values = (scores[starts + (counts - 1) // 2]
+                          + scores[starts + counts // 2]) / 2
+            elif agg_method == AggregationMethods.MIN:
+                values = scores[starts]
+            else:
+                values = scores[starts + counts - 1]
+
+        return list(zip(unique_words.tolist(), values.tolist()))
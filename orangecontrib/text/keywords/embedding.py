@@ -1,32 +1,40 @@
-from collections import defaultdict
-from operator import itemgetter
-from typing import List, Tuple, Dict, Set, Callable, Collection
+from typing import List, Tuple, Callable, Collection
 
 import numpy as np
+import scipy.sparse as sp
 from Orange.util import dummy_callback, wrap_callback
 
 from orangecontrib.text import Corpus
 from orangecontrib.text.vectorization import document_embedder
 from orangecontrib.text.vectorization.document_embedder import DocumentEmbedder
-from sklearn.metrics.pairwise import cosine_similarity
 
 
 EMBEDDING_LANGUAGE_MAPPING = document_embedder.LANGS_TO_ISO
 
 
+# maximal number of (document, word) pairs whose embeddings are multiplied
+# at once; bounds memory to about BLOCK_SIZE * embedding dimension floats
+BLOCK_SIZE = 10000
+
+
 def _embedd_tokens(
     tokens: Collection[List[str]], language: str, progress_callback: Callable
-) -> Tuple[np.ndarray, np.ndarray, Dict[str, Set[int]]]:
+) -> Tuple[np.ndarray, np.ndarray, sp.csr_matrix, List[str]]:
     """
-    Embedd document and words and create a mapping dictionary between words and
-    documents
+    Embedd documents and words and create a sparse document-word matrix
+    with the words of every document
     """
-    # extract words
-    word2doc = defaultdict(set)
-    for i, doc_tokens in enumerate(tokens):
-        for t in doc_tokens:
-            word2doc[t].add(i)
-    words = list(word2doc.keys())
+    # extract words; every word is embedded once
+    word2ind = {}
+    indices, indptr = [], [0]
+    for doc_tokens in tokens:
+        indices.extend({word2ind.setdefault(t, len(word2ind))
+                        for t in doc_tokens})
+        indptr.append(len(indices))
+    words = list(word2ind)
+    doc2word = sp.csr_matrix(
+        (np.ones(len(indices)), indices, indptr),
+        shape=(len(tokens), len(words)))
 
     # TODO: currently embedding report success unify them to report progress float
     ticks = iter(np.linspace(0, 1, len(tokens) + len(words)))
@@ -35,19 +43,23 @@ def _embedd_tokens(
         if sucess:
             progress_callback(next(ticks))
 
-    # embedd documents
+    # embedd documents; embeddings of documents and words embedded before are
+    # taken from the persistent embedding store
     embedder = DocumentEmbedder(language=language)
     # tokens is tranformedt to list in case it is np.ndarray
-    doc_embs = np.array(embedder(list(tokens), emb_cb))
+    doc_embs = np.array(embedder(list(tokens), emb_cb), dtype=float)
 
     # embedd words
-    word_embs = np.array(embedder([[w] for w in words], emb_cb))
+    word_embs = np.array(embedder([[w] for w in words], emb_cb), dtype=float)
 
-    return doc_embs, word_embs, word2doc
+    return doc_embs, word_embs, doc2word, words
 
 
-def cos_dist(x: np.ndarray, y: np.ndarray) -> np.ndarray:
-    return 1 - cosine_similarity(x, y)
+def _normalize(x: np.ndarray) -> np.ndarray:
+    # zero vectors are left as they are (as in cosine_similarity)
+    norms = np.linalg.norm(x, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return x / norms
 
 
 def embedding_keywords(
@@ -78,34 +90,42 @@ def embedding_keywords(
 
     # prepare structures
     language = EMBEDDING_LANGUAGE_MAPPING[language]
-    doc_embs, word_embs, word2doc = _embedd_tokens(
+    doc_embs, word_embs, doc2word, words = _embedd_tokens(
         tokens, language, wrap_callback(progress_callback, 0, 0.7)
     )
-    doc2word = [set(t) for t in tokens]
-    word2ind = {w: i for i, w in enumerate(word2doc)}
-
-    # many combinations of distances will not be used since each document do
-    # not include all words. Anyway it is still much faster to compute all
-    # distances pairs because of matrix calculations
-    distances = cos_dist(doc_embs, word_embs)
-    # the sum of document embeddings for each word
-    dist_sums = {
-        w: distances[list(dcs), i].sum() for i, (w, dcs) in enumerate(word2doc.items())
-    }
+    if not words:
+        return [[] for _ in range(len(doc_embs))]
+    doc_embs, word_embs = _normalize(doc_embs), _normalize(word_embs)
 
+    # cosine distances are computed only between documents and their words,
+    # in blocks of (document, word) pairs
     cb = wrap_callback(progress_callback, 0.7, 1)
-    # compute keywords scores
-    doc_desc = []
-    for j in range(doc_embs.shape[0]):
-        scores = []
-        for word in doc2word[j]:
-            l_ = len(word2doc[word])
-            dist = distances[j, word2ind[word]]
-            mean_distance = ((dist_sums[word] - dist) / (l_ - 1)) if l_ > 1 else 0
-            scores.append((word, dist - mean_distance))
-        doc_desc.append(sorted(scores, key=itemgetter(1)))
-        cb((j + 1) / len(doc_embs))
-    return doc_desc
+    docs = np.repeat(np.arange(doc2word.shape[0]), np.diff(doc2word.indptr))
+    word_ids = doc2word.indices
+    n_pairs = len(word_ids)
+    distances = np.empty(n_pairs)
+    for start in range(0, n_pairs, BLOCK_SIZE):
+        end = min(start + BLOCK_SIZE, n_pairs)
+        distances[start:end] = 1 - np.einsum(
+            "ij,ij->i", doc_embs[docs[start:end]], word_embs[word_ids[start:end]])
+        cb(end / n_pairs)
+
+    # a word's distance is compared to its mean distance to other documents
+    # with the word
+    n_docs = np.bincount(word_ids, minlength=len(words))[word_ids]
+    dist_sums = np.bincount(word_ids, weights=distances,
+                            minlength=len(words))[word_ids]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean_distances = np.where(
+            n_docs > 1, (dist_sums - distances) / (n_docs - 1), 0)
+    scores = distances - mean_distances
+
+    # keywords of every document sorted by score
+    order = np.lexsort((scores, docs))
+    keywords = list(zip(np.array(words, dtype=object)[word_ids[order]].tolist(),
+                        scores[order].tolist()))
+    indptr = doc2word.indptr
+    return [keywords[indptr[j]:indptr[j + 1]] for j in range(len(indptr) - 1)]
 
 
 if __name__ == "__main__":
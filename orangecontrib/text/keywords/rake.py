@@ -41,15 +41,20 @@ def is_number(s):
         return False
 
 
+WORD_SPLITTER = re.compile('[^a-zA-Z0-9_\\+\\-/]')
+SENTENCE_DELIMITERS = re.compile(u'[\\[\\]\n.!?,;:\t\\-\\"\\(\\)\\\'\u2019\u2013]')
+# words (\b...\b) and the text between them, in alternating order
+WORD_TOKENS = re.compile('(\\w+)')
+
+
 def separate_words(text, min_word_return_size):
     """
     Utility function to return a list of all words that are have a length greater than a specified number of characters.
     @param text The text that must be split in to words.
     @param min_word_return_size The minimum no of characters a word must have to be included.
     """
-    splitter = re.compile('[^a-zA-Z0-9_\\+\\-/]')
     words = []
-    for single_word in splitter.split(text):
+    for single_word in WORD_SPLITTER.split(text):
         current_word = single_word.strip().lower()
         # leave numbers in phrase, but don't count as words, since they tend to invalidate scores of their phrases
         if len(current_word) > min_word_return_size and current_word != '' and not is_number(current_word):
@@ -62,18 +67,33 @@ def split_sentences(text):
     Utility function to return a list of sentences.
     @param text The text that must be split in to sentences.
     """
-    sentence_delimiters = re.compile(u'[\\[\\]\n.!?,;:\t\\-\\"\\(\\)\\\'\u2019\u2013]')
-    sentences = sentence_delimiters.split(text)
+    sentences = SENTENCE_DELIMITERS.split(text)
     return sentences
 
 
-def build_stop_word_regex(stop_word_list):
-    stop_word_regex_list = []
-    for word in stop_word_list:
-        word_regex = '\\b' + word + '\\b'
-        stop_word_regex_list.append(word_regex)
-    stop_word_pattern = re.compile('|'.join(stop_word_regex_list), re.IGNORECASE)
-    return stop_word_pattern
+class StopWordMatcher(object):
+    """
+    Splits sentences into phrases at stop words.
+
+    Sentences are tokenized into words once and every word is looked up in a
+    set of lowercase stop words, which takes linear time in the length of the
+    sentence regardless of the number of stop words. Stop words match whole
+    words, as in a case-insensitive regular expression '\\bword\\b'.
+    """
+
+    def __init__(self, stop_word_list):
+        self.stop_words = frozenset(word.lower() for word in stop_word_list)
+
+    def split(self, sentence):
+        """
+        Return phrases between stop words (and '|' characters).
+        """
+        parts = WORD_TOKENS.split(sentence)
+        stop_words = self.stop_words
+        for i in range(1, len(parts), 2):
+            if parts[i].lower() in stop_words:
+                parts[i] = '|'
+        return ''.join(parts).split('|')
 
 
 #
@@ -147,17 +167,16 @@ def filter_adjoined_candidates(candidates, min_freq):
     return filtered_candidates
 
 
-def generate_candidate_keywords(sentence_list, stopword_pattern, stop_word_list, min_char_length=1, max_words_length=5,
+def generate_candidate_keywords(sentence_list, stop_word_matcher, min_char_length=1, max_words_length=5,
                                 min_words_length_adj=1, max_words_length_adj=1, min_phrase_freq_adj=2):
     phrase_list = []
     for s in sentence_list:
-        tmp = re.sub(stopword_pattern, '|', s.strip())
-        phrases = tmp.split("|")
+        phrases = stop_word_matcher.split(s.strip())
         for phrase in phrases:
             phrase = phrase.strip().lower()
             if phrase != "" and is_acceptable(phrase, min_char_length, max_words_length):
                 phrase_list.append(phrase)
-    phrase_list += extract_adjoined_candidates(sentence_list, stop_word_list, min_words_length_adj,
+    phrase_list += extract_adjoined_candidates(sentence_list, stop_word_matcher.stop_words, min_words_length_adj,
                                                max_words_length_adj, min_phrase_freq_adj)
     return phrase_list
 
@@ -235,6 +254,8 @@ class Rake(object):
     def __init__(self, stop_words, min_char_length=1, max_words_length=5, min_keyword_frequency=1,
                  min_words_length_adj=1, max_words_length_adj=1, min_phrase_freq_adj=2):
         self.__stop_words_list = stop_words
+        # built once and reused for all texts
+        self.__stop_word_matcher = StopWordMatcher(stop_words)
         self.__min_char_length = min_char_length
         self.__max_words_length = max_words_length
         self.__min_keyword_frequency = min_keyword_frequency
@@ -245,9 +266,7 @@ class Rake(object):
     def run(self, text):
         sentence_list = split_sentences(text)
 
-        stop_words_pattern = build_stop_word_regex(self.__stop_words_list)
-
-        phrase_list = generate_candidate_keywords(sentence_list, stop_words_pattern, self.__stop_words_list,
+        phrase_list = generate_candidate_keywords(sentence_list, self.__stop_word_matcher,
                                                   self.__min_char_length, self.__max_words_length,
                                                   self.__min_words_length_adj, self.__max_words_length_adj,
                                                   self.__min_phrase_freq_adj)
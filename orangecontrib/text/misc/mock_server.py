@@ -0,0 +1,248 @@
+"""A local mock of the embedding servers used by DocumentEmbedder, SBERT,
+SemanticSearch and TweetProfiler.
+
+The server returns deterministic vectors (equal texts always get equal
+vectors) and can simulate latency, errors and timeouts, so embedders can be
+tested and benchmarked offline.
+
+    >>> from orangecontrib.text.vectorization.sbert import SBERT
+    >>> with MockServer(latency=0.05) as server:
+    ...     embeddings = SBERT(server_url=server.url)(['a text'])
+    ...     server.stats['items']
+    1
+
+Run `python -m orangecontrib.text.misc.mock_server --port 8000` to start a
+server from the command line.
+"""
+import argparse
+import base64
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+import zlib
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+FASTTEXT_DIM = 300
+SBERT_DIM = 384
+TWEET_PROFILER_CLASSES = ['Anger', 'Fear', 'Joy', 'Sadness', 'Surprise',
+                          'Disgust']
+
+
+def _decode(data: str) -> str:
+    return zlib.decompress(base64.b64decode(data)).decode('utf-8', 'replace')
+
+
+def _seed(text: str) -> int:
+    return int.from_bytes(
+        hashlib.md5(text.encode('utf-8', 'replace')).digest()[:4], 'little')
+
+
+def vector(text: str, dim: int) -> List[float]:
+    """Deterministic unit vector of a text."""
+    v = np.random.RandomState(_seed(text)).standard_normal(dim)
+    return (v / np.linalg.norm(v)).tolist()
+
+
+class MockServer:
+    """Embedding server running in a background thread.
+
+    Attributes
+    ----------
+    latency : float
+        Seconds the server waits before answering a request.
+    error_rate : float
+        Share of requests answered with an error (status 500, empty body).
+    timeout_rate : float
+        Share of requests that are answered only after `timeout` seconds;
+        set the client's timeout below it to simulate timeouts.
+    timeout : float
+        Delay of requests that time out.
+    port : int
+        Port of the server; a free port is chosen when 0.
+    stats : Counter
+        Number of received `requests`, embedded `items`, simulated `errors`
+        and `timeouts`, and the highest number of `concurrent` requests.
+    """
+
+    def __init__(self, latency: float = 0, error_rate: float = 0,
+                 timeout_rate: float = 0, timeout: float = 5,
+                 port: int = 0, seed: int = 0) -> None:
+        self.latency = latency
+        self.error_rate = error_rate
+        self.timeout_rate = timeout_rate
+        self.timeout = timeout
+        self.port = port
+        self.stats = Counter()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._active = 0
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        return 'http://127.0.0.1:{}'.format(self.port)
+
+    def start(self) -> "MockServer":
+        server = self
+
+        class Handler(_Handler):
+            mock = server
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', self.port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._thread.join()
+            self._server = self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, ex_type, value, traceback):
+        self.stop()
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self.stats.clear()
+
+    def _begin(self) -> Optional[str]:
+        """Register a request and decide whether it fails."""
+        with self._lock:
+            self._active += 1
+            self.stats['requests'] += 1
+            self.stats['concurrent'] = max(self.stats['concurrent'],
+                                           self._active)
+            r = self._random.random()
+            if r < self.error_rate:
+                self.stats['errors'] += 1
+                return 'error'
+            if r < self.error_rate + self.timeout_rate:
+                self.stats['timeouts'] += 1
+                return 'timeout'
+        return None
+
+    def _end(self, n_items: int = 0) -> None:
+        with self._lock:
+            self._active -= 1
+            self.stats['items'] += n_items
+
+    def respond(self, path: str, body: bytes) -> Tuple[Optional[Dict], int]:
+        """Compute response to a request and the number of embedded items;
+        response is None for unknown paths."""
+        model = path.split('?')[0].strip('/')
+        if model.startswith('text/fasttext'):
+            data = json.loads(body)
+            tokens = json.loads(_decode(data['data']))
+            return {'embedding': vector(' '.join(tokens), FASTTEXT_DIM)}, 1
+        if model == 'text/sbert':
+            texts = [_decode(t) for t in json.loads(body)]
+            return {'embedding': [vector(t, SBERT_DIM) for t in texts]}, \
+                len(texts)
+        if model == 'text/semantic-search':
+            texts, queries = json.loads(body)
+            queries = json.loads(_decode(queries))
+            return {'embedding': [self._matches(_decode(t), queries)
+                                  for t in texts]}, len(texts)
+        if model == 'get_configurations':
+            return {'models': ['Multiclass', 'Multilabel'],
+                    'output_modes': ['Classes', 'Probabilities',
+                                     'Embeddings']}, 0
+        if model == 'tweet_profiler':
+            tweets = json.loads(body)['tweets']
+            profile = [vector(str(t), len(TWEET_PROFILER_CLASSES))
+                       for t in tweets]
+            return {'classes': TWEET_PROFILER_CLASSES,
+                    'profile': profile, 'target_mode': 'ml'}, len(tweets)
+        return None, 0
+
+    @staticmethod
+    def _matches(text: str, queries: List[str]) -> List:
+        matches = []
+        for sentence in re.finditer(r'[^.!?]+[.!?]*', text):
+            rng = random.Random(_seed(sentence.group() + '|'.join(queries)))
+            matches.append([[sentence.start(), sentence.end()], rng.random()])
+        return matches
+
+
+class _Handler(BaseHTTPRequestHandler):
+    mock: MockServer = None
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length)
+        failure = self.mock._begin()
+        response, n_items = None, 0
+        try:
+            time.sleep(self.mock.latency)
+            if failure == 'timeout':
+                time.sleep(self.mock.timeout)
+            if failure != 'error':
+                try:
+                    response, n_items = self.mock.respond(self.path, body)
+                except (ValueError, KeyError, TypeError, zlib.error):
+                    response = None
+        finally:
+            # count items before responding; stats are then complete as
+            # soon as the client has the response
+            self.mock._end(n_items)
+        if response is None:
+            self._send(500, b'')
+        else:
+            self._send(200, json.dumps(response).encode('utf-8'))
+
+    def _send(self, status, content):
+        try:
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+        except (BrokenPipeError, ConnectionResetError):
+            # the client gave up waiting
+            pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--latency', type=float, default=0)
+    parser.add_argument('--error-rate', type=float, default=0)
+    parser.add_argument('--timeout-rate', type=float, default=0)
+    parser.add_argument('--timeout', type=float, default=5)
+    args = parser.parse_args()
+    server = MockServer(args.latency, args.error_rate, args.timeout_rate,
+                        args.timeout, args.port).start()
+    print('Serving on', server.url)
+    try:
+        server._thread.join()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,13 +1,14 @@
+import os
+import shutil
 from typing import List, Set, Dict, Tuple, Optional, Callable
 from collections import Counter
 from itertools import chain
-import os
-import pickle
 
 import numpy as np
 
-from orangecontrib.text.vectorization.sbert import SBERT
 from Orange.misc.environ import cache_dir
+from orangecontrib.text.vectorization.embedding_store import EmbeddingStore
+from orangecontrib.text.vectorization.sbert import SBERT
 from Orange.util import dummy_callback, wrap_callback
 
 EMB_DIM = 384
@@ -228,43 +229,50 @@ def cos_sim(x: np.array, y: np.array) -> float:
 
 
 class EmbeddingStorage:
+    """Word embeddings used by the ontology. They are kept in the embedding
+    store shared with SBERT, so words embedded elsewhere are reused."""
 
     def __init__(self):
-        self.cache_dir = os.path.join(cache_dir(), 'ontology')
-        if not os.path.isdir(self.cache_dir):
-            os.makedirs(self.cache_dir)
-        self.similarities = dict()
-        try:
-            with open(os.path.join(self.cache_dir, 'sims.pkl'), 'rb') as file:
-                self.similarities = pickle.load(file)
-        except IOError:
-            self.similarities = dict()
+        self.store = EmbeddingStore.for_model('sbert')
         self.embeddings = dict()
+        self._migrate(os.path.join(cache_dir(), 'ontology'))
 
-    def save_similarities(self):
-        with open(os.path.join(self.cache_dir, 'sims.pkl'), 'wb') as file:
-            pickle.dump(self.similarities, file)
+    def _migrate(self, path: str) -> None:
+        """Move embeddings from the former per-word cache into the store and
+        remove the old cache directory."""
+        if not os.path.isdir(path):
+            return
+        words, embs = [], []
+        for file in os.listdir(path):
+            word, ext = os.path.splitext(file)
+            if ext != '.npy':
+                continue
+            try:
+                emb = np.load(os.path.join(path, file))
+            except (OSError, ValueError):
+                continue
+            if emb.shape == (EMB_DIM,):
+                words.append(word)
+                embs.append(emb)
+        if words:
+            self.store.insert(words, embs)
+        shutil.rmtree(path, ignore_errors=True)
 
     def get_embedding(self, word: str) -> Optional[np.array]:
         if word in self.embeddings:
             return self.embeddings[word]
-        try:
-            emb = np.load(os.path.join(self.cache_dir, f'{word}.npy'))
+        emb = self.store.lookup([word])[0]
+        if emb is not None:
             self.embeddings[word] = emb
-            return emb
-        except IOError:
-            return None
+        return emb
 
     def save_embedding(self, word: str, emb: np.array) -> None:
         self.embeddings[word] = emb
-        np.save(os.path.join(self.cache_dir, f'{word}.npy'), emb)
+        self.store.insert([word], [emb])
 
     def clear_storage(self) -> None:
-        self.similarities = dict()
         self.embeddings = dict()
-        if os.path.isdir(self.cache_dir):
-            for file in os.listdir(self.cache_dir):
-                os.remove(os.path.join(self.cache_dir, file))
+        self.store.clear()
 
 
 class OntologyHandler:
@@ -378,18 +386,12 @@ class OntologyHandler:
         embeddings: np.array,
         callback: Callable = dummy_callback
     ) -> np.array:
-        sims = np.zeros((len(words), len(words)))
-        ticks = iter(np.linspace(0.0, 1.0, int(len(words) * (len(words) - 1) / 2)))
-        for i in range(len(words)):
-            for j in range(i + 1, len(words)):
-                callback(next(ticks))
-                key = tuple(sorted((words[i], words[j])))
-                try:
-                    sim = self.storage.similarities[key]
-                except KeyError:
-                    sim = cos_sim(embeddings[i, :], embeddings[j, :])
-                    self.storage.similarities[key] = sim
-                sims[i, j] = sim
-                sims[j, i] = sim
-        self.storage.save_similarities()
+        dots = embeddings @ embeddings.T
+        norms = np.linalg.norm(embeddings, axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            sims = dots / np.outer(norms, norms)
+        # same as cos_sim: orthogonal or zero vectors have zero similarity
+        sims[np.isclose(dots, 0)] = 0
+        np.fill_diagonal(sims, 0)
+        callback(1.0)
         return sims
@@ -1,30 +1,49 @@
+import hashlib
 import json
-import base64
-import zlib
-import sys
-from typing import Any, List, Optional, Callable, Union
+import os
+import re
+import shutil
+from typing import Any, List, Optional, Callable, Union, Dict, Tuple
 
 import numpy as np
 
+from Orange.misc.environ import cache_dir
 from Orange.misc.server_embedder import ServerEmbedderCommunicator
-from Orange.util import dummy_callback
+from Orange.util import dummy_callback, wrap_callback
 
-# maximum document size that we still send to the server
-MAX_PACKAGE_SIZE = 3000000
-# maximum size of a chunk - when one document is longer send is as a chunk with
-# a single document
-MAX_CHUNK_SIZE = 50000
-MIN_CHUNKS = 20
+from orangecontrib.text.util import server_cache_name
+from orangecontrib.text.vectorization.ann_index import IVFIndex
+from orangecontrib.text.vectorization.embedding_store import EmbeddingStore, \
+    NoCache
+from orangecontrib.text.vectorization.sbert import EMB_DIM, SERVER_URL, \
+    SBERT, encode_text, _make_chunks
+
+# a sentence ends with (a sequence of) sentence-ending punctuation or a line
+SENTENCE_RE = re.compile(r'[^\s.!?。！？][^\n.!?。！？]*[.!?。！？]*')
+# maximal number of indices kept on disk; the least recently used are removed
+MAX_SAVED_INDICES = 5
 
 
 class SemanticSearch:
-    def __init__(self) -> None:
+    def __init__(self, server_url: Optional[str] = None) -> None:
+        """
+        Parameters
+        ----------
+        server_url
+            Url of the server (e.g. a local mock server). The default server
+            if None.
+        """
         self._server_communicator = _ServerCommunicator(
             model_name='semantic-search',
             max_parallel_requests=100,
-            server_url='https://apiv2.garaza.io',
+            server_url=server_url or SERVER_URL,
             embedder_type='text',
         )
+        # matches of a document for given queries are stored as rows
+        # (start, end, score) under keys '<key>:<i>'; the row under '<key>'
+        # holds the number of matches
+        self._store = EmbeddingStore.for_model(
+            server_cache_name('semantic-search', server_url))
 
     def __call__(
         self, texts: List[str], queries: List[str], callback: Callable = dummy_callback
@@ -50,76 +69,77 @@ class SemanticSearch:
         if len(texts) == 0 or len(queries) == 0:
             return [None] * len(texts)
 
-        skipped = list()
-        queries_enc = base64.b64encode(
-            zlib.compress(
-                json.dumps(queries).encode('utf-8', 'replace'),
-                level=-1
-            )
-        ).decode('utf-8', 'replace')
-
-        encoded_texts = list()
-        sizes = list()
-        chunks = list()
-        for i, text in enumerate(texts):
-            encoded = base64.b64encode(zlib.compress(
-                text.encode('utf-8', 'replace'), level=-1)
-            ).decode('utf-8', 'replace')
-            size = sys.getsizeof(encoded)
-            if size > MAX_PACKAGE_SIZE:
-                skipped.append(i)
-                continue
-            encoded_texts.append(encoded)
-            sizes.append(size)
-
-        chunks_ = self._make_chunks(encoded_texts, sizes)
-        for chunk in chunks_:
-            chunks.append([chunk, queries_enc])
-
-        # temporary callback - will be changed when ServerEmbedderCommunicator
-        # change callback - return proportion instead bool
-        ticks = iter(np.linspace(0.0, 1.0, len(chunks)))
-
-        def cb(success=True):
-            if success:
-                callback(next(ticks))
-
-        result_ = self._server_communicator.embedd_data(chunks, processed_callback=cb)
-        if result_ is None:
-            return [None] * len(texts)
-
-        result = list()
-        assert len(result_) == len(chunks)
-        for res_chunk, orig_chunk in zip(result_, chunks):
-            if res_chunk is None:
-                # when embedder fails (Timeout or other error) result will be None
-                result.extend([None] * len(orig_chunk))
-            else:
-                result.extend(res_chunk)
-
-        results = list()
-        idx = 0
-        for i in range(len(texts)):
-            if i in skipped:
-                results.append(None)
-            else:
-                results.append(result[idx])
-                idx += 1
+        queries_json = json.dumps(queries)
+        keys = [hashlib.md5((queries_json + text).encode('utf-8', 'replace'))
+                .hexdigest() for text in texts]
+        results = self._lookup(keys)
+        missing = [i for i, matches in enumerate(results) if matches is None]
+        if missing:
+            new_results = self._search([texts[i] for i in missing],
+                                       queries_json, callback)
+            searched = [(i, matches) for i, matches
+                        in zip(missing, new_results) if matches is not None]
+            self._insert([keys[i] for i, _ in searched],
+                         [matches for _, matches in searched])
+            for i, matches in searched:
+                results[i] = matches
+        return results
 
+    def _lookup(
+        self, keys: List[str]
+    ) -> List[Optional[List[List[Union[List[int], float]]]]]:
+        """Return stored matches of documents; None for missing documents
+        (or documents some of whose matches were evicted)."""
+        counts = self._store.lookup(keys)
+        found = [i for i, count in enumerate(counts) if count is not None]
+        rows = iter(self._store.lookup(
+            ['{}:{}'.format(keys[i], j)
+             for i in found for j in range(int(counts[i][0]))]))
+        results = [None] * len(keys)
+        for i in found:
+            matches = [next(rows) for _ in range(int(counts[i][0]))]
+            if all(m is not None for m in matches):
+                results[i] = [[[int(start), int(end)], float(score)]
+                              for start, end, score in matches]
         return results
 
-    def _make_chunks(self, encoded_texts, sizes, depth=0):
-        chunks = np.array_split(encoded_texts, MIN_CHUNKS if depth == 0 else 2)
-        chunk_sizes = np.array_split(sizes, MIN_CHUNKS if depth == 0 else 2)
-        result = list()
-        for i in range(len(chunks)):
-            # checking that more than one text in chunk prevent recursion to infinity
-            # when one text is bigger than MAX_CHUNK_SIZE
-            if len(chunks[i]) > 1 and np.sum(chunk_sizes[i]) > MAX_CHUNK_SIZE:
-                result.extend(self._make_chunks(chunks[i], chunk_sizes[i], depth + 1))
-            else:
-                result.append(chunks[i])
-        return [list(r) for r in result if len(r) > 0]
+    def _insert(
+        self, keys: List[str],
+        results: List[List[List[Union[List[int], float]]]]
+    ) -> None:
+        """Store matches of documents."""
+        store_keys, rows = [], []
+        for key, matches in zip(keys, results):
+            store_keys.append(key)
+            rows.append([len(matches), 0, 0])
+            for j, ((start, end), score) in enumerate(matches):
+                store_keys.append('{}:{}'.format(key, j))
+                rows.append([start, end, score])
+        if store_keys:
+            self._store.insert(store_keys, rows)
+
+    def _search(
+        self, texts: List[str], queries_json: str, callback: Callable
+    ) -> List[Optional[List[List[Union[List[int], float]]]]]:
+        queries_enc = encode_text(queries_json.encode('utf-8', 'replace'))
+        encoded, chunks = _make_chunks(texts)
+        # texts are compressed by the communicator's workers while other
+        # chunks are already being processed
+        result = self._server_communicator.embedd_data(
+            [[[encoded[i] for i in chunk], queries_enc] for chunk in chunks],
+            callback=callback
+        )
+        results = [None] * len(texts)
+        if result is None:
+            return results
+
+        assert len(result) == len(chunks)
+        for res_chunk, chunk in zip(result, chunks):
+            # when embedder fails (Timeout or other error) result will be None
+            if res_chunk is not None:
+                for i, matches in zip(chunk.tolist(), res_chunk):
+                    results[i] = matches
+        return results
 
     def set_cancelled(self):
         if hasattr(self, '_server_communicator'):
@@ -128,6 +148,7 @@ class SemanticSearch:
     def clear_cache(self):
         if self._server_communicator:
             self._server_communicator.clear_cache()
+        self._store.clear()
 
     def __enter__(self):
         return self
@@ -139,14 +160,162 @@ class SemanticSearch:
         self.__exit__(None, None, None)
 
 
+class LocalSemanticSearch:
+    """Semantic search that embeds sentences of documents only once.
+
+    Sentences are embedded with SBERT and indexed in an on-disk approximate
+    nearest neighbour index, which is reused for all queries on the same
+    documents. A query thus only requires embedding the query itself.
+    Scores are cosine similarities between sentences and the most similar
+    query; for every query only the `k` most similar sentences are matched.
+    """
+
+    def __init__(self, k: int = 1000, n_probe: int = 8,
+                 server_url: Optional[str] = None,
+                 path: Optional[str] = None) -> None:
+        """
+        Parameters
+        ----------
+        k
+            Number of sentences matched by each query.
+        n_probe
+            Number of index clusters searched for each query.
+        server_url
+            Url of the SBERT server; the default server if None.
+        path
+            Directory with indices; in Orange's cache directory if None.
+        """
+        self.k = k
+        self.n_probe = n_probe
+        self.path = path or os.path.join(cache_dir(), 'semantic_search')
+        self._embedder = SBERT(server_url=server_url)
+        # indices of recently searched documents
+        self._indices: Dict[str, Tuple[IVFIndex, np.ndarray]] = {}
+
+    def __call__(
+        self, texts: List[str], queries: List[str], callback: Callable = dummy_callback
+    ) -> List[Optional[List[List[Union[List[int], float]]]]]:
+        """Computes matches for given documents and queries.
+
+        Parameters
+        ----------
+        texts
+            A list of raw texts to be matched.
+        queries
+            A list of query words/phrases.
+
+        Returns
+        -------
+        Matches in the same format as SemanticSearch. Documents whose
+        sentences could not be embedded are None.
+        """
+        if len(texts) == 0 or len(queries) == 0:
+            return [None] * len(texts)
+
+        index, spans = self._index(texts, wrap_callback(callback, 0, 0.9))
+        # ids in the index are rows of embedded sentences
+        indexed = spans[spans[:, 3] == 1]
+        query_embs = [e for e in self._embedder(queries) if e is not None]
+        callback(0.95)
+        best: Dict[int, float] = {}
+        if len(index) and query_embs:
+            ids, scores = index.search(np.array(query_embs), self.k,
+                                       self.n_probe)
+            for i, score in zip(ids.flat, scores.flat):
+                if i >= 0 and score > best.get(i, -np.inf):
+                    best[i] = float(score)
+
+        results = [None if failed else []
+                   for failed in self._failed_documents(spans, len(texts))]
+        for i in sorted(best, key=lambda i: indexed[i, 1]):
+            doc, start, end = indexed[i, :3]
+            results[doc].append([[int(start), int(end)], best[i]])
+        callback(1)
+        return results
+
+    @staticmethod
+    def _failed_documents(spans: np.ndarray, n: int) -> np.ndarray:
+        """Documents with sentences, none of which were embedded."""
+        embedded = np.zeros(n, dtype=bool)
+        embedded[spans[spans[:, 3] == 1, 0]] = True
+        has_sentences = np.zeros(n, dtype=bool)
+        has_sentences[spans[:, 0]] = True
+        return has_sentences & ~embedded
+
+    def _index(
+        self, texts: List[str], callback: Callable
+    ) -> Tuple[IVFIndex, np.ndarray]:
+        """Return the index of sentences and an array with the document,
+        start, end and embedded flag of every sentence."""
+        key = hashlib.md5(
+            b''.join(hashlib.md5(t.encode('utf-8', 'replace')).digest()
+                     for t in texts)).hexdigest()
+        if key in self._indices:
+            return self._indices[key]
+
+        path = os.path.join(self.path, key)
+        spans_path = os.path.join(path, 'spans.npy')
+        if os.path.exists(spans_path):
+            index, spans = IVFIndex.load(path), np.load(spans_path)
+            os.utime(path)
+        else:
+            index, spans = self._build_index(texts, callback)
+            if not spans[:, 3].all():
+                # sentences that failed to embed are retried in the next
+                # search, so the incomplete index is neither kept nor saved
+                return index, spans
+            self._save_index(index, spans, path)
+        self._indices = {key: (index, spans)}
+        return index, spans
+
+    def _save_index(self, index: IVFIndex, spans: np.ndarray, path: str):
+        """Save the index and remove the least recently used indices."""
+        index.save(path)
+        np.save(os.path.join(path, 'spans.npy'), spans)
+        saved = sorted((os.path.join(self.path, d)
+                        for d in os.listdir(self.path)),
+                       key=os.path.getmtime)
+        for old in saved[:-MAX_SAVED_INDICES]:
+            shutil.rmtree(old, ignore_errors=True)
+
+    def _build_index(
+        self, texts: List[str], callback: Callable
+    ) -> Tuple[IVFIndex, np.ndarray]:
+        spans, sentences = [], []
+        for i, text in enumerate(texts):
+            for match in SENTENCE_RE.finditer(text):
+                spans.append((i, match.start(), match.end(), 0))
+                sentences.append(match.group())
+        spans = np.array(spans, dtype=np.int64).reshape(-1, 4)
+        embeddings = self._embedder(sentences, callback)
+        embedded = [i for i, e in enumerate(embeddings) if e is not None]
+        spans[embedded, 3] = 1
+        index = IVFIndex(np.array([embeddings[i] for i in embedded]
+                                  or np.zeros((0, EMB_DIM))))
+        return index, spans
+
+    def clear_cache(self):
+        self._indices = {}
+        shutil.rmtree(self.path, ignore_errors=True)
+        self._embedder.clear_cache()
+
+    def set_cancelled(self):
+        self._embedder.set_cancelled()
+
+
 class _ServerCommunicator(ServerEmbedderCommunicator):
 
     def __init__(self, *args, **kwargs) -> None:
         super().__init__(*args, **kwargs)
         self.content_type = 'application/json'
+        # results are kept in the embedding store
+        self._cache = NoCache()
 
     async def _encode_data_instance(self, data_instance: Any) -> Optional[bytes]:
-        return json.dumps(data_instance).encode('utf-8', 'replace')
+        texts, queries = data_instance
+        return json.dumps(
+            [[encode_text(text) for text in texts], queries]
+        ).encode('utf-8', 'replace')
 
 
 if __name__ == "__main__":
@@ -0,0 +1,25 @@
+import tempfile
+from unittest.mock import patch
+
+from orangecontrib.text.vectorization.embedding_store import EmbeddingStore
+
+
+def isolate_embedding_store(test_case):
+    """
+    Keep embeddings stored during a test in a temporary directory instead of
+    the user's embedding store (or the legacy ontology and server caches).
+    Call it in setUp; the directory is removed after the test.
+    """
+    tmp = tempfile.TemporaryDirectory()
+    test_case.addCleanup(tmp.cleanup)
+    test_case.cache_dir = tmp.name
+    for patcher in (
+            patch("orangecontrib.text.vectorization.embedding_store.cache_dir",
+                  return_value=tmp.name),
+            patch("orangecontrib.text.ontology.cache_dir",
+                  return_value=tmp.name),
+            patch("Orange.misc.utils.embedder_utils.cache_dir",
+                  return_value=tmp.name),
+            patch.dict(EmbeddingStore._stores, clear=True)):
+        patcher.start()
+        test_case.addCleanup(patcher.stop)
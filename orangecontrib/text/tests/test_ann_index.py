@@ -0,0 +1,72 @@
+import tempfile
+import unittest
+
+import numpy as np
+
+from orangecontrib.text.vectorization.ann_index import IVFIndex
+
+
+class TestIVFIndex(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        centers = rng.randn(20, 16)
+        self.x = centers[rng.randint(20, size=2000)] + 0.3 * rng.randn(2000, 16)
+        self.queries = self.x[:50] + 0.1 * rng.randn(50, 16)
+
+    def exact(self, k):
+        x = self.x / np.linalg.norm(self.x, axis=1, keepdims=True)
+        q = self.queries / np.linalg.norm(self.queries, axis=1, keepdims=True)
+        sims = np.einsum("ik,jk->ij", q, x)
+        return np.argsort(-sims, axis=1)[:, :k], np.sort(sims, axis=1)[:, ::-1][:, :k]
+
+    def test_exhaustive_search(self):
+        index = IVFIndex(self.x)
+        ids, scores = index.search(self.queries, 5, n_probe=len(index.centroids))
+        exact_ids, exact_scores = self.exact(5)
+        np.testing.assert_equal(ids, exact_ids)
+        np.testing.assert_almost_equal(scores, exact_scores, decimal=5)
+
+    def test_recall(self):
+        index = IVFIndex(self.x)
+        ids, _ = index.search(self.queries, 10, n_probe=4)
+        exact_ids, _ = self.exact(10)
+        recall = np.mean([len(set(a) & set(b)) / 10
+                          for a, b in zip(ids, exact_ids)])
+        self.assertGreater(recall, 0.9)
+
+    def test_structure(self):
+        index = IVFIndex(self.x, n_lists=7)
+        self.assertEqual(len(index), 2000)
+        self.assertEqual(index.offsets[-1], 2000)
+        self.assertEqual(len(index.offsets), 8)
+        np.testing.assert_equal(np.sort(index.ids), np.arange(2000))
+        np.testing.assert_almost_equal(
+            np.linalg.norm(index.vectors, axis=1), 1, decimal=5)
+
+    def test_single_query_and_padding(self):
+        index = IVFIndex(self.x[:3])
+        ids, scores = index.search(self.x[0], 5)
+        self.assertEqual(ids.shape, (5,))
+        self.assertEqual(ids[0], 0)
+        np.testing.assert_equal(ids[3:], -1)
+        self.assertTrue(np.all(np.isneginf(scores[3:])))
+
+    def test_empty(self):
+        index = IVFIndex(np.zeros((0, 4)))
+        self.assertEqual(len(index), 0)
+        ids, _ = index.search(np.ones((2, 4)), 3)
+        np.testing.assert_equal(ids, -1)
+
+    def test_save_load(self):
+        index = IVFIndex(self.x)
+        with tempfile.TemporaryDirectory() as path:
+            index.save(path)
+            loaded = IVFIndex.load(path)
+            self.assertIsInstance(loaded.vectors, np.memmap)
+            np.testing.assert_equal(loaded.search(self.queries, 5)[0],
+                                    index.search(self.queries, 5)[0])
+            del loaded
+
+
+if __name__ == "__main__":
+    unittest.main()
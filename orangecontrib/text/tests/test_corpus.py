@@ -21,6 +21,7 @@ from Orange.data import (
 from orangecontrib.text import preprocess
 from orangecontrib.text.corpus import Corpus
 from orangecontrib.text.tag import AveragedPerceptronTagger
+from orangecontrib.text.vectorization import BowVectorizer
 
 try:
     from orangewidget.utils.signals import summarize
@@ -528,6 +529,32 @@ class CorpusTests(unittest.TestCase):
             for token in doc:
                 self.assertRegex(token, '\w+_[A-Z]+')
 
+    def test_ngrams_dictionary(self):
+        c = Corpus.from_file('deerwester')
+        c.store_tokens([doc.lower().split() for doc in c.documents])
+        c.ngram_range = (1, 2)
+        bow = BowVectorizer().transform(c)
+        dictionary, ngrams_corpus = c.ngrams_dictionary, c.ngrams_corpus
+        self.assertEqual(dictionary.token2id, bow.ngrams_dictionary.token2id)
+        np.testing.assert_array_equal(ngrams_corpus.sparse.toarray(),
+                                      bow.ngrams_corpus.sparse.toarray())
+
+        # cached while tokens and ngram range do not change
+        self.assertIs(c.ngrams_dictionary, dictionary)
+        self.assertIs(c.copy().ngrams_corpus, ngrams_corpus)
+        subset = c[[1, 3]]
+        self.assertIs(subset.ngrams_dictionary, dictionary)
+        np.testing.assert_array_equal(subset.ngrams_corpus.sparse.toarray(),
+                                      ngrams_corpus.sparse[:, [1, 3]].toarray())
+        c.ngram_range = (1, 1)
+        self.assertIsNot(c.ngrams_dictionary, dictionary)
+        dictionary = c.ngrams_dictionary
+        c.store_tokens(list(c.tokens))
+        self.assertIsNot(c.ngrams_dictionary, dictionary)
+
+        # a bag-of-words corpus uses the vectorizer's dictionary
+        self.assertIs(bow.ngrams_dictionary, bow[:3].ngrams_dictionary)
+
     def test_from_documents(self):
         documents = [
             {
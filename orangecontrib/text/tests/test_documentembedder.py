@@ -4,7 +4,9 @@ import asyncio
 from numpy.testing import assert_array_equal
 
 from orangecontrib.text.vectorization.document_embedder import DocumentEmbedder
+from orangecontrib.text.vectorization.embedding_store import EmbeddingStore
 from orangecontrib.text import Corpus
+from orangecontrib.text.tests import isolate_embedding_store
 
 PATCH_METHOD = 'httpx.AsyncClient.post'
 
@@ -26,6 +28,7 @@ def make_dummy_post(response, sleep=0):
 class DocumentEmbedderTest(unittest.TestCase):
 
     def setUp(self):
+        isolate_embedding_store(self)
         self.embedder = DocumentEmbedder()  # default params
         self.corpus = Corpus.from_file('deerwester')
 
@@ -38,13 +41,13 @@ class DocumentEmbedderTest(unittest.TestCase):
         self.assertIsNone(self.embedder(self.corpus[:0])[1])
         mock.request.assert_not_called()
         mock.get_response.assert_not_called()
-        self.assertEqual(self.embedder._embedder._cache._cache_dict, dict())
+        self.assertEqual(len(self.embedder._store), 0)
 
     @patch(PATCH_METHOD, make_dummy_post(b'{"embedding": [0.3, 1]}'))
     def test_success_subset(self):
         res, skipped = self.embedder(self.corpus[[0]])
         assert_array_equal(res.X, [[0.3, 1]])
-        self.assertEqual(len(self.embedder._embedder._cache._cache_dict), 1)
+        self.assertEqual(len(self.embedder._store), 1)
         self.assertIsNone(skipped)
 
     @patch(PATCH_METHOD, make_dummy_post(b'{"embedding": [0.3, 1]}'))
@@ -61,7 +64,7 @@ class DocumentEmbedderTest(unittest.TestCase):
             res, skipped = self.embedder(self.corpus[[0]])
         self.assertIsNone(res)
         self.assertEqual(len(skipped), 1)
-        self.assertEqual(len(self.embedder._embedder._cache._cache_dict), 0)
+        self.assertEqual(len(self.embedder._store), 0)
 
     @patch(PATCH_METHOD, make_dummy_post(b'str'))
     def test_invalid_response(self):
@@ -69,7 +72,7 @@ class DocumentEmbedderTest(unittest.TestCase):
             res, skipped = self.embedder(self.corpus[[0]])
         self.assertIsNone(res)
         self.assertEqual(len(skipped), 1)
-        self.assertEqual(len(self.embedder._embedder._cache._cache_dict), 0)
+        self.assertEqual(len(self.embedder._store), 0)
 
     @patch(PATCH_METHOD, make_dummy_post(b'{"embeddings": [0.3, 1]}'))
     def test_invalid_json_key(self):
@@ -77,53 +80,49 @@ class DocumentEmbedderTest(unittest.TestCase):
             res, skipped = self.embedder(self.corpus[[0]])
         self.assertIsNone(res)
         self.assertEqual(len(skipped), 1)
-        self.assertEqual(len(self.embedder._embedder._cache._cache_dict), 0)
+        self.assertEqual(len(self.embedder._store), 0)
 
     @patch(PATCH_METHOD, make_dummy_post(b'{"embedding": [0.3, 1]}'))
     def test_persistent_caching(self):
-        self.assertEqual(len(self.embedder._embedder._cache._cache_dict), 0)
+        self.assertEqual(len(self.embedder._store), 0)
         self.embedder(self.corpus[[0]])
-        self.assertEqual(len(self.embedder._embedder._cache._cache_dict), 1)
-        self.embedder._embedder._cache.persist_cache()
+        self.assertEqual(len(self.embedder._store), 1)
 
+        # stores are loaded from disk again
+        EmbeddingStore._stores.clear()
         self.embedder = DocumentEmbedder()
-        self.assertEqual(len(self.embedder._embedder._cache._cache_dict), 1)
+        self.assertEqual(len(self.embedder._store), 1)
 
         self.embedder.clear_cache()
+        EmbeddingStore._stores.clear()
         self.embedder = DocumentEmbedder()
-        self.assertEqual(len(self.embedder._embedder._cache._cache_dict), 0)
+        self.assertEqual(len(self.embedder._store), 0)
 
     @patch(PATCH_METHOD, make_dummy_post(b'{"embedding": [0.3, 1]}'))
     def test_cache_for_different_languages(self):
         embedder = DocumentEmbedder(language='sl')
-        embedder.clear_cache()
-        self.assertEqual(len(embedder._embedder._cache._cache_dict), 0)
+        self.assertEqual(len(embedder._store), 0)
         embedder(self.corpus[[0]])
-        self.assertEqual(len(embedder._embedder._cache._cache_dict), 1)
-        embedder._embedder._cache.persist_cache()
+        self.assertEqual(len(embedder._store), 1)
 
         self.embedder = DocumentEmbedder()
-        self.assertEqual(len(self.embedder._embedder._cache._cache_dict), 0)
-        self.embedder._embedder._cache.persist_cache()
+        self.assertEqual(len(self.embedder._store), 0)
 
         embedder = DocumentEmbedder(language='sl')
-        self.assertEqual(len(embedder._embedder._cache._cache_dict), 1)
+        self.assertEqual(len(embedder._store), 1)
         embedder.clear_cache()
-        self.embedder.clear_cache()
 
     @patch(PATCH_METHOD, make_dummy_post(b'{"embedding": [0.3, 1]}'))
     def test_cache_for_different_aggregators(self):
         embedder = DocumentEmbedder(aggregator='max')
-        embedder.clear_cache()
-        self.assertEqual(len(embedder._embedder._cache._cache_dict), 0)
+        self.assertEqual(len(embedder._store), 0)
         embedder(self.corpus[[0]])
-        self.assertEqual(len(embedder._embedder._cache._cache_dict), 1)
-        embedder._embedder._cache.persist_cache()
+        self.assertEqual(len(embedder._store), 1)
 
         embedder = DocumentEmbedder(aggregator='min')
-        self.assertEqual(len(embedder._embedder._cache._cache_dict), 1)
+        self.assertEqual(len(embedder._store), 0)
         embedder(self.corpus[[0]])
-        self.assertEqual(len(embedder._embedder._cache._cache_dict), 2)
+        self.assertEqual(len(embedder._store), 1)
 
     @patch(PATCH_METHOD, make_dummy_post(b'{"embedding": [0.3, 1]}'))
     def test_with_statement(self):
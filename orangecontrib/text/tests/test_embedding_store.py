@@ -0,0 +1,223 @@
+import multiprocessing
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+
+import numpy as np
+from numpy.testing import assert_array_almost_equal
+
+from orangecontrib.text.vectorization.document_embedder import DocumentEmbedder
+from orangecontrib.text.vectorization.embedding_store import EmbeddingStore
+from orangecontrib.text.tests import isolate_embedding_store
+
+
+def _insert_many(path, prefix):
+    store = EmbeddingStore('model', path=path)
+    for i in range(30):
+        store.insert(['{}{}'.format(prefix, i)], [[i, len(prefix)]])
+
+
+class TestEmbeddingStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'model')
+        self.store = EmbeddingStore('model', path=self.path)
+        isolate_embedding_store(self)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_lookup_insert(self):
+        self.assertListEqual(self.store.lookup(['a', 'b']), [None, None])
+        self.store.insert(['a', 'b', 'a'], [[1, 2], [3, 4], [5, 6]])
+        self.assertEqual(len(self.store), 2)
+        a, c, b = self.store.lookup(['a', 'c', 'b'])
+        assert_array_almost_equal(a, [1, 2])
+        self.assertIsNone(c)
+        assert_array_almost_equal(b, [3, 4])
+
+        # existing embeddings are not replaced
+        self.store.insert(['a', 'c'], [[0, 0], [7, 8]])
+        self.assertEqual(len(self.store), 3)
+        assert_array_almost_equal(self.store.lookup(['a'])[0], [1, 2])
+        assert_array_almost_equal(self.store.lookup(['c'])[0], [7, 8])
+
+    def test_persistence(self):
+        self.store.insert(['a', 'b'], np.arange(6).reshape(2, 3))
+        store = EmbeddingStore('model', path=self.path)
+        self.assertEqual(len(store), 2)
+        self.assertEqual(store.dim, 3)
+        assert_array_almost_equal(store.lookup(['b'])[0], [3, 4, 5])
+
+        store.insert(['c'], [[6, 7, 8]])
+        store = EmbeddingStore('model', path=self.path)
+        assert_array_almost_equal(store.lookup(['c', 'a']), [[6, 7, 8], [0, 1, 2]])
+
+    def test_partial_write(self):
+        self.store.insert(['a'], [[1, 2]])
+        with open(os.path.join(self.path, 'vectors.bin'), 'ab') as f:
+            f.write(np.array([3, 4, 5], dtype=np.float32).tobytes())
+        store = EmbeddingStore('model', path=self.path)
+        self.assertEqual(len(store), 1)
+        store.insert(['b'], [[3, 4]])
+        store = EmbeddingStore('model', path=self.path)
+        assert_array_almost_equal(store.lookup(['a', 'b']), [[1, 2], [3, 4]])
+
+    def test_dimension_mismatch(self):
+        self.store.insert(['a'], [[1, 2]])
+        with self.assertRaises(ValueError):
+            self.store.insert(['b'], [[1, 2, 3]])
+
+    def test_eviction(self):
+        store = EmbeddingStore('model', max_size=4, path=self.path)
+        store.insert(['a', 'b', 'c'], [[1], [2], [3]])
+        store.lookup(['a'])
+        store.insert(['d', 'e'], [[4], [5]])
+        # 3 most recently used are kept
+        self.assertEqual(len(store), 3)
+        self.assertIsNotNone(store.lookup(['a'])[0])
+        self.assertIsNone(store.lookup(['b'])[0])
+        self.assertIsNone(store.lookup(['c'])[0])
+        assert_array_almost_equal(store.lookup(['e'])[0], [5])
+
+        store = EmbeddingStore('model', path=self.path)
+        self.assertEqual(len(store), 3)
+        assert_array_almost_equal(store.lookup(['a', 'd', 'e']), [[1], [4], [5]])
+
+    def test_clear(self):
+        self.store.insert(['a'], [[1, 2]])
+        self.store.clear()
+        self.assertEqual(len(self.store), 0)
+        self.assertFalse(os.path.exists(os.path.join(self.path, 'keys.bin')))
+        self.assertFalse(os.path.exists(os.path.join(self.path, 'vectors.bin')))
+        self.store.insert(['a'], [[1, 2, 3]])
+        self.assertEqual(self.store.dim, 3)
+
+    def test_concurrent_stores(self):
+        # stores of two processes share files
+        other = EmbeddingStore('model', path=self.path)
+        self.store.insert(['a'], [[1, 2]])
+        other.insert(['b'], [[3, 4]])
+        self.store.insert(['c'], [[5, 6]])
+        for store in (self.store, other):
+            assert_array_almost_equal(store.lookup(['a', 'b', 'c']),
+                                      [[1, 2], [3, 4], [5, 6]])
+            self.assertEqual(len(store), 3)
+
+        store = EmbeddingStore('model', path=self.path)
+        assert_array_almost_equal(store.lookup(['c', 'b', 'a']),
+                                  [[5, 6], [3, 4], [1, 2]])
+
+    def test_processes(self):
+        context = multiprocessing.get_context('spawn')
+        processes = [context.Process(target=_insert_many,
+                                     args=(self.path, prefix))
+                     for prefix in ('a', 'bb')]
+        for process in processes:
+            process.start()
+        _insert_many(self.path, 'ccc')
+        for process in processes:
+            process.join()
+        for prefix in ('a', 'bb', 'ccc'):
+            assert_array_almost_equal(
+                self.store.lookup(['{}{}'.format(prefix, i)
+                                   for i in range(30)]),
+                [[i, len(prefix)] for i in range(30)])
+        self.assertEqual(len(self.store), 90)
+
+    def test_concurrent_eviction(self):
+        other = EmbeddingStore('model', max_size=4, path=self.path)
+        self.store.insert(['a', 'b', 'c'], [[1], [2], [3]])
+        other.insert(['d', 'e'], [[4], [5]])
+        # rows of the other store were rewritten - the index is reloaded
+        self.assertEqual(len(other), 3)
+        lookup = self.store.lookup(['a', 'b', 'c', 'd', 'e'])
+        self.assertEqual(sum(v is not None for v in lookup), 3)
+        for v, expected in zip(lookup, [1, 2, 3, 4, 5]):
+            if v is not None:
+                assert_array_almost_equal(v, [expected])
+        self.store.insert(['f'], [[6]])
+        assert_array_almost_equal(other.lookup(['f', 'e']), [[6], [5]])
+
+    def test_for_model(self):
+        self.assertIs(EmbeddingStore.for_model('foo'),
+                      EmbeddingStore.for_model('foo'))
+        self.assertIsNot(EmbeddingStore.for_model('foo'),
+                         EmbeddingStore.for_model('bar'))
+
+
+class TestDocumentEmbedderStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        isolate_embedding_store(self)
+        self.embedder = DocumentEmbedder()
+        self.embedder._store = EmbeddingStore('fasttext', path=self.tmp.name)
+        self.embedder._embedder = MagicMock()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_only_missing_embedded(self):
+        mock = self.embedder._embedder.embedd_data
+        mock.return_value = [[1, 2], [3, 4]]
+        res = self.embedder([['a'], ['b']])
+        self.assertListEqual(res, [[1, 2], [3, 4]])
+
+        mock.return_value = [[5, 6]]
+        progress = []
+        res = self.embedder([['a'], ['c'], ['b']], progress.append)
+        self.assertListEqual(res, [[1, 2], [5, 6], [3, 4]])
+        self.assertListEqual(mock.call_args[0][0], [['c']])
+        self.assertListEqual(progress, [True, True])
+
+        mock.reset_mock()
+        self.embedder([['c'], ['a']])
+        mock.assert_not_called()
+
+    def test_duplicates(self):
+        mock = self.embedder._embedder.embedd_data
+        mock.return_value = [[1, 2], [3, 4]]
+        res = self.embedder([['a'], ['b'], ['a'], ['a']])
+        self.assertListEqual(res, [[1, 2], [3, 4], [1, 2], [1, 2]])
+        self.assertListEqual(mock.call_args[0][0], [['a'], ['b']])
+        self.assertEqual(self.embedder.n_duplicates, 2)
+
+        # duplicates do not share the same list
+        res[0][0] = 0
+        self.assertListEqual(res[2], [1, 2])
+
+    def test_duplicates_progress(self):
+        def embedd_data(data, processed_callback=None):
+            embs = []
+            for doc in data:
+                embs.append([len(doc), 0])
+                progress.append(len(embs))
+                processed_callback(True)
+            return embs
+
+        progress = []
+        self.embedder._embedder.embedd_data = embedd_data
+        self.embedder([['a'], ['b', 'c'], ['a'], ['a'], ['b', 'c'], ['d']],
+                      lambda success: progress.append(success))
+        # progress advances by the number of occurrences of each embedded
+        # document, not for all duplicates at the end
+        self.assertListEqual(progress, [1, True, True, True, 2, True, True,
+                                        3, True])
+
+        # store hits are reported for each of their occurrences
+        progress = []
+        self.embedder([['a'], ['a'], ['e']],
+                      lambda success: progress.append(success))
+        self.assertListEqual(progress, [True, True, 1, True])
+
+    def test_failed_not_stored(self):
+        mock = self.embedder._embedder.embedd_data
+        mock.return_value = [None, [1, 2]]
+        res = self.embedder([['a'], ['b']])
+        self.assertListEqual(res, [None, [1, 2]])
+        self.assertEqual(len(self.embedder._store), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
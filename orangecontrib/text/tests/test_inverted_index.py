@@ -0,0 +1,135 @@
+import tempfile
+import unittest
+from collections import Counter
+
+import numpy as np
+
+from orangecontrib.text import Corpus
+from orangecontrib.text.inverted_index import InvertedIndex
+
+TOKENS = [
+    ['orange', 'apple', 'orange'],
+    ['apple', 'banana'],
+    ['pear'],
+    [],
+    ['orange', 'kiwi', 'kiwi', 'kiwi', 'kiwi', 'kiwi'],
+]
+
+
+def bm25(tokens, word, k1=1.2, b=0.75):
+    n = len(tokens)
+    df = sum(word in doc for doc in tokens)
+    idf = np.log(1 + (n - df + 0.5) / (df + 0.5))
+    avg = np.mean([len(doc) for doc in tokens])
+    scores = []
+    for doc in tokens:
+        tf = doc.count(word)
+        scores.append(idf * tf * (k1 + 1)
+                      / (tf + k1 * (1 - b + b * len(doc) / avg)))
+    return np.array(scores)
+
+
+class TestInvertedIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = InvertedIndex(TOKENS)
+
+    def test_frequency(self):
+        words = ['orange', 'kiwi', 'unknown', 'orange']
+        expected = [[Counter(doc)[w] for w in words] for doc in TOKENS]
+        np.testing.assert_array_equal(self.index.frequency(words), expected)
+        np.testing.assert_array_equal(self.index.appearance(words),
+                                      np.array(expected) > 0)
+        self.assertEqual(self.index.frequency([]).shape, (len(TOKENS), 0))
+
+    def test_bm25(self):
+        words = ['orange', 'kiwi', 'unknown']
+        scores = self.index.bm25(words)
+        for i, w in enumerate(words):
+            np.testing.assert_almost_equal(scores[:, i], bm25(TOKENS, w))
+
+    def test_tfidf(self):
+        scores = self.index.tfidf(['orange', 'pear'])
+        idf_orange = np.log(6 / 3) + 1
+        np.testing.assert_almost_equal(
+            scores[:, 0], [2 * idf_orange, 0, 0, 0, idf_orange])
+        np.testing.assert_almost_equal(scores[2, 1], np.log(6 / 2) + 1)
+
+    def test_search(self):
+        docs, scores = self.index.search(['orange', 'apple', 'orange'])
+        self.assertEqual(docs.tolist(), [0, 1, 4])
+        self.assertTrue(np.all(np.diff(scores) <= 0))
+        docs, _ = self.index.search(['orange', 'apple'], k=1)
+        self.assertEqual(docs.tolist(), [0])
+        docs, _ = self.index.search(['unknown'])
+        self.assertEqual(len(docs), 0)
+        self.assertRaises(ValueError, self.index.search, ['a'], method='x')
+
+    def test_append(self):
+        index = InvertedIndex(TOKENS[:2])
+        index.append(TOKENS[2:])
+        self.assertEqual(len(index), len(TOKENS))
+        words = ['orange', 'kiwi', 'pear']
+        np.testing.assert_array_equal(index.frequency(words),
+                                      self.index.frequency(words))
+        np.testing.assert_almost_equal(index.bm25(words),
+                                       self.index.bm25(words))
+
+    def test_subset(self):
+        subset = self.index[[0, 4]]
+        np.testing.assert_array_equal(subset.frequency(['orange', 'kiwi']),
+                                      [[2, 0], [1, 5]])
+        np.testing.assert_almost_equal(
+            subset.bm25(['kiwi'])[:, 0],
+            bm25([TOKENS[0], TOKENS[4]], 'kiwi'))
+        # appending to a subset does not change the original
+        subset.append([['melon']])
+        self.assertNotIn('melon', self.index.vocabulary)
+
+    def test_save_load(self):
+        with tempfile.TemporaryDirectory() as path:
+            self.index.save(path)
+            index = InvertedIndex.load(path)
+        words = ['orange', 'kiwi', 'banana']
+        np.testing.assert_almost_equal(index.bm25(words),
+                                       self.index.bm25(words))
+        index.append([['kiwi']])
+        self.assertEqual(len(index), len(TOKENS) + 1)
+
+    def test_empty(self):
+        index = InvertedIndex([])
+        self.assertEqual(index.bm25(['a']).shape, (0, 1))
+        docs, scores = index.search(['a'])
+        self.assertEqual(len(docs), 0)
+
+
+class TestCorpusInvertedIndex(unittest.TestCase):
+    def setUp(self):
+        self.corpus = Corpus.from_file('deerwester')
+
+    def test_cached(self):
+        corpus = self.corpus.copy()
+        corpus.store_tokens(TOKENS[:1] * len(corpus))
+        index = corpus.inverted_index
+        self.assertIs(corpus.inverted_index, index)
+        self.assertIs(corpus.copy().inverted_index, index)
+        corpus.store_tokens(TOKENS[:1] * len(corpus))
+        self.assertIsNot(corpus.inverted_index, index)
+
+    def test_subset(self):
+        corpus = self.corpus.copy()
+        corpus.store_tokens([[str(i)] for i in range(len(corpus))])
+        index = corpus.inverted_index
+        subset = corpus[[1, 3]]
+        self.assertIsNot(subset.inverted_index, index)
+        np.testing.assert_array_equal(
+            subset.inverted_index.frequency(['1', '2', '3']),
+            [[1, 0, 0], [0, 0, 1]])
+
+    def test_base_tokens(self):
+        index = self.corpus.inverted_index
+        self.assertEqual(len(index), len(self.corpus))
+        self.assertGreater(index.frequency(['human'])[:, 0].sum(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
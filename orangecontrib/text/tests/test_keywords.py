@@ -3,8 +3,18 @@ import unittest
 from unittest.mock import patch
 
 import numpy as np
+import scipy.sparse as sp
+from gensim.corpora import Dictionary
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from orangecontrib.text import Corpus
+from orangecontrib.text import keywords as keywords_module
 from orangecontrib.text.keywords import tfidf_keywords, yake_keywords, \
-    rake_keywords, AggregationMethods, embedding_keywords
+    rake_keywords, AggregationMethods, embedding_keywords, _keywords_cache, \
+    clear_keywords_cache
+from orangecontrib.text.keywords.rake import Rake, StopWordMatcher
+from orangecontrib.text.util import Sparse2CorpusSliceable
+from orangecontrib.text.vectorization import BowVectorizer
 
 
 class TestTfIdf(unittest.TestCase):
@@ -37,6 +47,70 @@ class TestTfIdf(unittest.TestCase):
         self.assertEqual(keywords[0][1][0], "b")
         self.assertEqual(keywords[0][2][0], "a")
 
+    def test_top_k(self):
+        tokens = [["foo", "bar", "baz", "baz", "bar", "bar"],
+                  ["foobar", "foo"],
+                  []]
+        keywords = tfidf_keywords(tokens, top_k=2)
+        self.assertEqual([w for w, _ in keywords[0]], ["bar", "baz"])
+        self.assertEqual(len(keywords[1]), 2)
+        self.assertEqual(keywords[1][0][0], "foobar")
+        self.assertEqual(keywords[2], [])
+        for kws in keywords:
+            scores = [s for _, s in kws]
+            self.assertEqual(scores, sorted(scores, reverse=True))
+
+        all_keywords = tfidf_keywords(tokens)
+        for kws, top in zip(all_keywords, keywords):
+            self.assertEqual(sorted(kws, key=lambda x: -x[1])[:2], top)
+
+    def test_corpus_features(self):
+        corpus = Corpus.from_file("deerwester")
+        bow = BowVectorizer(wglobal=BowVectorizer.IDF).transform(corpus)
+        X = bow.ngrams_corpus.sparse.T.tocsr()
+        words = bow.ngrams_dictionary
+
+        with patch.object(TfidfVectorizer, "fit_transform") as fit_transform:
+            keywords = tfidf_keywords(corpus.tokens, corpus=bow)
+            fit_transform.assert_not_called()
+        self.assertEqual(len(keywords), len(corpus))
+        for i, kws in enumerate(keywords):
+            self.assertEqual(
+                dict(kws),
+                {words[j]: X[i, j] for j in X[i].indices if X[i, j]})
+
+        keywords = tfidf_keywords(corpus.tokens, corpus=bow, top_k=1)
+        self.assertTrue(all(len(kws) <= 1 for kws in keywords))
+
+    def test_corpus_counts(self):
+        corpus = Corpus.from_file("deerwester")
+        bow = BowVectorizer().transform(corpus)
+        with patch.object(TfidfVectorizer, "fit_transform") as fit_transform:
+            keywords = tfidf_keywords(corpus.tokens, corpus=bow)
+            fit_transform.assert_not_called()
+        self.assertFalse(all(s == 1 for kws in keywords for _, s in kws))
+        expected = tfidf_keywords(corpus.tokens)
+        for kws, exp in zip(keywords, expected):
+            self.assertEqual([w for w, _ in sorted(kws)],
+                             [w for w, _ in sorted(exp)])
+            np.testing.assert_almost_equal(
+                [s for _, s in sorted(kws)], [s for _, s in sorted(exp)])
+
+    def test_corpus_other_weights(self):
+        corpus = Corpus.from_file("deerwester")
+        expected = tfidf_keywords(corpus.tokens)
+        for vectorizer in (BowVectorizer(wlocal=BowVectorizer.BINARY),
+                           BowVectorizer(norm=BowVectorizer.L2)):
+            bow = vectorizer.transform(corpus)
+            keywords = tfidf_keywords(corpus.tokens, corpus=bow)
+            self.assertEqual(keywords, expected)
+
+        corpus.ngrams_corpus = Sparse2CorpusSliceable(
+            sp.csr_matrix(np.ones((len(corpus), 2))).T)
+        corpus.ngrams_dictionary = Dictionary([["a", "b"]])
+        self.assertEqual(tfidf_keywords(corpus.tokens, corpus=corpus),
+                         expected)
+
 
 class TestYake(unittest.TestCase):
     def test_extractor(self):
@@ -60,6 +134,54 @@ class TestYake(unittest.TestCase):
         self.assertEqual(len(keywords[1]), 0)
         self.assertEqual(len(keywords[2]), 0)
 
+    def test_cache(self):
+        documents = ["Human machine interface for lab abc computer applications",
+                     "A survey of user opinion of computer system response time"]
+        _keywords_cache.clear()
+        keywords = yake_keywords(documents)
+        with patch("yake.KeywordExtractor.extract_keywords") as extract:
+            self.assertEqual(yake_keywords(documents[::-1]), keywords[::-1])
+            extract.assert_not_called()
+            yake_keywords(documents, max_len=2)
+            self.assertEqual(extract.call_count, 2)
+
+    @patch("orangecontrib.text.keywords.MIN_PARALLEL_DOCS", 2)
+    def test_parallel(self):
+        documents = [f"Document {i} about computer system {i % 3} response"
+                     for i in range(10)] + [""]
+        _keywords_cache.clear()
+        keywords = yake_keywords(documents)
+        _keywords_cache.clear()
+        progress = []
+        self.assertEqual(yake_keywords(documents, n_jobs=2,
+                                       progress_callback=progress.append),
+                         keywords)
+        self.assertEqual(progress, sorted(progress))
+        self.assertLess(progress[-1], 1)
+
+        # workers are kept for later calls
+        _, executor = keywords_module._executors["yake", "English", 1]
+        _keywords_cache.clear()
+        self.assertEqual(yake_keywords(documents, n_jobs=2), keywords)
+        self.assertIs(keywords_module._executors["yake", "English", 1][1],
+                      executor)
+
+    def test_parallel_few_documents(self):
+        documents = ["A survey of user opinion", "Human machine interface"]
+        _keywords_cache.clear()
+        with patch("orangecontrib.text.keywords._executor") as executor:
+            keywords = yake_keywords(documents, n_jobs=2)
+            executor.assert_not_called()
+        self.assertEqual(len(keywords), 2)
+
+    def test_clear_cache(self):
+        yake_keywords(["A survey of user opinion"])
+        clear_keywords_cache()
+        with patch("yake.KeywordExtractor.extract_keywords",
+                   return_value=[]) as extract:
+            yake_keywords(["A survey of user opinion"])
+            extract.assert_called_once()
+
 
 class TestRake(unittest.TestCase):
     def test_extractor(self):
@@ -83,6 +205,19 @@ class TestRake(unittest.TestCase):
         self.assertEqual(len(keywords[1]), 0)
         self.assertEqual(len(keywords[2]), 0)
 
+    def test_stop_word_matcher(self):
+        matcher = StopWordMatcher(["of", "The", "a"])
+        self.assertEqual(
+            matcher.split("The survey of user opinion | often a/b"),
+            ["", " survey ", " user opinion ", " often ", "/b"])
+        # stop words match whole words only
+        self.assertEqual(matcher.split("offset theory"), ["offset theory"])
+
+        rake = Rake(["of", "the", "a"], max_words_length=2)
+        self.assertEqual(
+            rake.run("A survey of the user opinion. Survey of computers"),
+            [("user opinion", 4.0), ("survey", 1.0), ("computers", 1.0)])
+
 
 def mock_embedding(_, tokens, __):
     emb_dict = {"foo": [1, 2, 3], "bar": [2, 3, 4], "baz": [4, 4, 4], "fobar": [1, 2, 3], "a": [1, 2, 3], "b": [4, 5, 6]}
@@ -120,6 +255,22 @@ class TestEmbedding(unittest.TestCase):
         self.assertEqual(keywords[0][1][0], " ")
         self.assertEqual(keywords[0][2][0], "a")
 
+    def test_blocks(self):
+        tokens = [["foo", "bar", "baz"], ["foo", "b"], [], ["bar", "a", "foo"],
+                  ["foobar"]]
+        keywords = embedding_keywords(tokens)
+        with patch("orangecontrib.text.keywords.embedding.BLOCK_SIZE", 2):
+            self.assertEqual(embedding_keywords(tokens), keywords)
+        self.assertEqual([len(kws) for kws in keywords], [3, 2, 0, 3, 1])
+        for kws in keywords:
+            scores = [s for _, s in kws]
+            self.assertEqual(scores, sorted(scores))
+        # a word in a single document is scored by its distance to the document
+        self.assertAlmostEqual(keywords[4][0][1], 0)
+
+    def test_no_words(self):
+        self.assertEqual(embedding_keywords([[], []]), [[], []])
+
 
 class TestAggregationMethods(unittest.TestCase):
     def test_aggregate(self):
@@ -145,6 +296,24 @@ class TestAggregationMethods(unittest.TestCase):
         self.assertEqual(scores[0], ("foo", 0.5))
         self.assertEqual(scores[1], ("bar", 0.6))
 
+    def test_aggregate_segments(self):
+        keywords = [[("foo", 0.4), ("bar", 0.2), ("foo", 0.1)],
+                    [],
+                    [("bar", 0.8), ("baz", 0.5), ("foo", 0.3)]]
+        expected = {
+            AggregationMethods.MEAN: [0.8 / 3, 1 / 3, 0.5 / 3],
+            AggregationMethods.MEDIAN: [0.3, 0.5, 0.5],
+            AggregationMethods.MIN: [0.1, 0.2, 0.5],
+            AggregationMethods.MAX: [0.4, 0.8, 0.5],
+        }
+        for method, values in expected.items():
+            scores = AggregationMethods.aggregate(keywords, method)
+            self.assertEqual([w for w, _ in scores], ["foo", "bar", "baz"])
+            np.testing.assert_almost_equal([s for _, s in scores], values)
+
+        self.assertEqual(AggregationMethods.aggregate([], 0), [])
+        self.assertEqual(AggregationMethods.aggregate([[], []], 1), [])
+
 
 if __name__ == "__main__":
     unittest.main()
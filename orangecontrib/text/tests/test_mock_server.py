@@ -0,0 +1,158 @@
+import os
+import unittest
+
+import numpy as np
+from Orange.misc.utils.embedder_utils import EmbeddingConnectionError
+
+from orangecontrib.text import Corpus
+from orangecontrib.text.misc.mock_server import MockServer, FASTTEXT_DIM, \
+    SBERT_DIM
+from orangecontrib.text.semantic_search import SemanticSearch
+from orangecontrib.text.tweet_profiler import TweetProfiler
+from orangecontrib.text.vectorization.document_embedder import \
+    DocumentEmbedder
+from orangecontrib.text.vectorization.sbert import SBERT
+from orangecontrib.text.tests import isolate_embedding_store
+
+
+class TestMockServer(unittest.TestCase):
+    def setUp(self):
+        isolate_embedding_store(self)
+        self.server = MockServer().start()
+        self.corpus = Corpus.from_file('deerwester')
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_sbert(self):
+        sbert = SBERT(server_url=self.server.url)
+        try:
+            result = sbert(self.corpus.documents)
+            self.assertEqual(len(result), len(self.corpus))
+            self.assertEqual(len(result[0]), SBERT_DIM)
+            self.assertEqual(self.server.stats['items'], len(self.corpus))
+
+            # results are cached
+            self.server.reset_stats()
+            sbert(self.corpus.documents)
+            self.assertEqual(self.server.stats['requests'], 0)
+
+            # and deterministic
+            sbert.clear_cache()
+            np.testing.assert_almost_equal(
+                sbert(self.corpus.documents[:2]), result[:2])
+            self.assertGreater(self.server.stats['requests'], 0)
+        finally:
+            sbert.clear_cache()
+
+    def test_sbert_duplicates(self):
+        sbert = SBERT(server_url=self.server.url)
+        try:
+            result = sbert(['a', 'b', 'a', 'a'])
+            self.assertEqual(self.server.stats['items'], 2)
+            self.assertEqual(sbert.n_duplicates, 2)
+            self.assertEqual(result[0], result[2])
+            self.assertNotEqual(result[0], result[1])
+        finally:
+            sbert.clear_cache()
+
+    def test_sbert_store_per_server(self):
+        self.assertIsNot(SBERT(server_url=self.server.url)._store,
+                         SBERT()._store)
+
+    def test_server_url(self):
+        sbert = SBERT(server_url=self.server.url)
+        communicator = sbert._server_communicator
+        self.assertEqual(communicator.server_url, self.server.url)
+        search = SemanticSearch(server_url=self.server.url)
+        self.assertEqual(search._server_communicator.server_url,
+                         self.server.url)
+        self.assertIsNot(search._store, SemanticSearch()._store)
+
+    def test_document_embedder(self):
+        embedder = DocumentEmbedder(server_url=self.server.url)
+        try:
+            result = embedder._embedder.embedd_data(
+                [list(t) for t in self.corpus.tokens[:3]])
+            self.assertEqual(np.array(result).shape, (3, FASTTEXT_DIM))
+        finally:
+            embedder.clear_cache()
+
+    def test_semantic_search(self):
+        search = SemanticSearch(server_url=self.server.url)
+        try:
+            result = search(['First sentence. Second one.', 'Third'],
+                            ['query'])
+            self.assertEqual([m[0] for m in result[0]], [[0, 15], [15, 27]])
+            self.assertEqual(len(result[1]), 1)
+
+            # matches are stored for each document and queries
+            self.server.reset_stats()
+            stored = search(['Third', 'First sentence. Second one.'],
+                            ['query'])
+            self.assertEqual(self.server.stats['requests'], 0)
+            self.assertEqual([m[0] for m in stored[1]], [[0, 15], [15, 27]])
+            np.testing.assert_almost_equal(
+                [m[1] for m in stored[1]], [m[1] for m in result[0]])
+
+            search(['Third', 'Fourth'], ['query'])
+            self.assertEqual(self.server.stats['items'], 1)
+            search(['Third'], ['another query'])
+            self.assertEqual(self.server.stats['items'], 2)
+        finally:
+            search.clear_cache()
+
+    def test_single_cache(self):
+        sbert = SBERT(server_url=self.server.url)
+        search = SemanticSearch(server_url=self.server.url)
+        embedder = DocumentEmbedder(server_url=self.server.url)
+        try:
+            sbert(self.corpus.documents)
+            search(self.corpus.documents, ['query'])
+            embedder._embedder.embedd_data(
+                [list(t) for t in self.corpus.tokens[:3]])
+            # results are kept only in the embedding store
+            self.assertEqual(len(sbert._store), len(self.corpus))
+            self.assertGreater(len(search._store), len(self.corpus))
+            self.assertEqual(
+                [f for f in os.listdir(self.cache_dir)
+                 if f.endswith('_embeddings.pickle')], [])
+        finally:
+            sbert.clear_cache()
+            search.clear_cache()
+
+    def test_tweet_profiler(self):
+        profiler = TweetProfiler(server=self.server.url)
+        self.assertTrue(profiler.model_names)
+        corpus = profiler.transform(self.corpus, self.corpus.domain.metas[0],
+                                    'Multilabel', 'Probabilities')
+        self.assertEqual(len(corpus.domain.attributes), 6)
+
+    def test_errors(self):
+        self.server.error_rate = 1
+        sbert = SBERT(server_url=self.server.url)
+        try:
+            self.assertEqual(sbert(['a', 'b']), [None, None])
+            # every request is repeated before giving up
+            self.assertEqual(self.server.stats['errors'],
+                             self.server.stats['requests'])
+            self.assertGreater(self.server.stats['requests'], 2)
+        finally:
+            sbert.clear_cache()
+
+    def test_timeouts(self):
+        self.server.timeout_rate = 1
+        self.server.timeout = 1
+        sbert = SBERT(server_url=self.server.url)
+        sbert._server_communicator.timeout = 0.1
+        try:
+            # repeated timeouts mean that the server is down
+            with self.assertRaises(EmbeddingConnectionError):
+                sbert(['a'])
+            self.assertGreater(self.server.stats['timeouts'], 0)
+        finally:
+            sbert.clear_cache()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,115 @@
+import unittest
+
+import numpy as np
+from scipy.cluster.hierarchy import fcluster, linkage
+from scipy.sparse.csgraph import connected_components
+from scipy.spatial.distance import squareform
+
+from orangecontrib.text.corpus import Corpus
+from orangecontrib.text.vectorization import SimhashVectorizer
+from orangecontrib.text.vectorization.near_duplicates import \
+    NearDuplicateIndex
+from orangecontrib.text.vectorization.simhash import hamming_distances
+
+
+class TestNearDuplicateIndex(unittest.TestCase):
+    def setUp(self):
+        self.corpus = Corpus.from_file('book-excerpts')
+        self.tokens = [doc.lower().split() for doc in self.corpus.documents]
+
+    def test_exact_duplicates(self):
+        tokens = self.tokens[:10] + self.tokens[:3]
+        index = NearDuplicateIndex(threshold=0)
+        index.add(tokens)
+        clusters = index.clusters()
+        self.assertEqual(len(clusters), 13)
+        np.testing.assert_array_equal(clusters[10:], clusters[:3])
+        self.assertEqual(len(set(clusters[:10])), 10)
+        self.assertEqual(index.n_unique, 10)
+        self.assertEqual(index.n_duplicates, 3)
+
+    def test_near_duplicates(self):
+        doc = self.tokens[0]
+        tokens = [doc, doc[:-1], doc[1:], self.tokens[1]]
+        index = NearDuplicateIndex(
+            threshold=10, vectorizer=SimhashVectorizer(shingle_len=3))
+        index.add(tokens)
+        clusters = index.clusters()
+        self.assertEqual(clusters[0], clusters[1])
+        self.assertEqual(clusters[0], clusters[2])
+        self.assertNotEqual(clusters[0], clusters[3])
+
+    def test_matches_pairwise(self):
+        vectorizer = SimhashVectorizer(shingle_len=1, f=64)
+        fingerprints = vectorizer.fingerprints(self.tokens)
+        distances = hamming_distances(fingerprints)
+        for threshold in (0, 5, 15, 25):
+            _, expected = connected_components(distances <= threshold)
+            index = NearDuplicateIndex(threshold, vectorizer=vectorizer)
+            index.add_fingerprints(fingerprints)
+            clusters = index.clusters()
+            # the same partition
+            pairs = set(zip(expected, clusters))
+            self.assertEqual(len(pairs), len(set(expected)))
+            self.assertEqual(len(pairs), len(set(clusters)))
+            self.assertEqual(index.n_unique, len(pairs))
+
+    def test_linkage(self):
+        vectorizer = SimhashVectorizer(shingle_len=1, f=64)
+        fingerprints = vectorizer.fingerprints(self.tokens)
+        condensed = squareform(hamming_distances(fingerprints), checks=False)
+        for method in ('average', 'complete'):
+            expected = fcluster(linkage(condensed, method), 20, 'distance')
+            index = NearDuplicateIndex(20, vectorizer=vectorizer,
+                                       linkage=method)
+            index.add_fingerprints(fingerprints)
+            clusters = index.clusters()
+            pairs = set(zip(expected, clusters))
+            self.assertEqual(len(pairs), len(set(expected)))
+            self.assertEqual(len(pairs), len(set(clusters)))
+        self.assertRaises(ValueError, NearDuplicateIndex, linkage='ward')
+
+    def test_corpus_outputs(self):
+        corpus = self.corpus[[0, 1, 0, 2, 1]]
+        index = NearDuplicateIndex(threshold=0)
+        index.add(corpus.tokens)
+        np.testing.assert_array_equal(index.clusters(), [0, 1, 0, 2, 1])
+
+        annotated = index.annotate(corpus)
+        var = annotated.domain["Duplicates Cluster"]
+        self.assertIn(var, annotated.domain.metas)
+        self.assertEqual(var.values, ("C0", "C1", "C2"))
+        np.testing.assert_array_equal(
+            annotated.get_column_view(var)[0], [0, 1, 0, 2, 1])
+
+        unique = index.without_duplicates(corpus)
+        self.assertEqual(unique.documents, corpus[[0, 1, 3]].documents)
+        duplicates = index.duplicates(corpus, 1)
+        self.assertEqual(duplicates.documents, corpus[[1, 4]].documents)
+
+    def test_incremental(self):
+        vectorizer = SimhashVectorizer(shingle_len=2, f=128)
+        index = NearDuplicateIndex(8, vectorizer=vectorizer)
+        index.add(self.tokens)
+        expected = index.clusters()
+
+        index = NearDuplicateIndex(8, vectorizer=vectorizer)
+        for i in range(0, len(self.tokens), 7):
+            index.add(self.tokens[i:i + 7])
+        np.testing.assert_array_equal(index.clusters(), expected)
+        self.assertEqual(len(index), len(self.tokens))
+        self.assertEqual(index.fingerprints.shape, (len(self.tokens), 2))
+
+    def test_clusters_ordered(self):
+        index = NearDuplicateIndex(threshold=0)
+        index.add([['b'] * 20, ['a'] * 20, ['b'] * 20])
+        np.testing.assert_array_equal(index.clusters(), [0, 1, 0])
+        self.assertEqual(len(NearDuplicateIndex().clusters()), 0)
+
+    def test_invalid_bands(self):
+        self.assertRaises(ValueError, NearDuplicateIndex, 3, None, 0)
+        self.assertRaises(ValueError, NearDuplicateIndex, 3, None, 65)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -3,10 +3,13 @@ from unittest.mock import patch
 from collections.abc import Iterator
 import os
 import asyncio
+import tempfile
 
 import numpy as np
 
 from orangecontrib.text.ontology import Tree, EmbeddingStorage, OntologyHandler, EMB_DIM
+from orangecontrib.text.vectorization.sbert import SBERT
+from orangecontrib.text.tests import isolate_embedding_store
 
 
 RESPONSE = [
@@ -75,6 +78,7 @@ class TestTree(unittest.TestCase):
 class TestEmbeddingStorage(unittest.TestCase):
 
     def setUp(self):
+        isolate_embedding_store(self)
         self.storage = EmbeddingStorage()
 
     def tearDown(self):
@@ -85,13 +89,30 @@ class TestEmbeddingStorage(unittest.TestCase):
         self.assertEqual(len(self.storage.embeddings), 1)
         self.storage.clear_storage()
         self.assertEqual(len(self.storage.embeddings), 0)
-        self.assertEqual(len(os.listdir(self.storage.cache_dir)), 0)
+        self.assertEqual(len(self.storage.store), 0)
+        self.assertIsNone(self.storage.get_embedding("testword"))
+
+    def test_migrate_legacy_cache(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            legacy = os.path.join(tmp, 'ontology')
+            os.makedirs(legacy)
+            np.save(os.path.join(legacy, 'word.npy'), np.ones(EMB_DIM))
+            np.save(os.path.join(legacy, 'short.npy'), np.ones(3))
+            with open(os.path.join(legacy, 'sims.pkl'), 'wb') as file:
+                file.write(b'')
+            with patch('orangecontrib.text.ontology.cache_dir',
+                       return_value=tmp):
+                storage = EmbeddingStorage()
+            self.assertFalse(os.path.exists(legacy))
+            np.testing.assert_array_equal(storage.get_embedding('word'),
+                                          np.ones(EMB_DIM))
+            self.assertIsNone(storage.get_embedding('short'))
 
     def test_save_embedding(self):
         self.storage.save_embedding("testword", np.zeros(3))
         self.storage.save_embedding("testword2", np.zeros(3))
         self.assertEqual(len(self.storage.embeddings), 2)
-        self.assertEqual(len(os.listdir(self.storage.cache_dir)), 2)
+        self.assertEqual(len(self.storage.store), 2)
 
     def test_get_embedding(self):
         self.storage.save_embedding("testword", np.arange(3))
@@ -104,18 +125,16 @@ class TestEmbeddingStorage(unittest.TestCase):
         emb = self.storage.get_embedding("testword")
         self.assertEqual(emb.tolist(), [0, 1, 2])
 
-    def test_similarities(self):
-        self.storage.similarities['a', 'b'] = 0.75
-        self.storage.save_similarities()
-        storage = EmbeddingStorage()
-        self.assertEqual(len(storage.similarities), 1)
-        self.assertTrue(('a', 'b') in storage.similarities)
-        self.assertEqual(storage.similarities['a', 'b'], 0.75)
+    def test_shared_with_sbert(self):
+        self.storage.save_embedding("testword", np.arange(EMB_DIM))
+        emb = SBERT()(["testword"])[0]
+        self.assertEqual(emb, list(range(EMB_DIM)))
 
 
 class TestOntologyHandler(unittest.TestCase):
 
     def setUp(self):
+        isolate_embedding_store(self)
         self.handler = OntologyHandler()
 
     def tearDown(self):
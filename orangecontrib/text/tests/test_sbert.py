@@ -3,13 +3,18 @@ from unittest.mock import patch
 from collections.abc import Iterator
 import asyncio
 
+import numpy as np
+
 from orangecontrib.text.vectorization.sbert import (
     SBERT,
     MIN_CHUNKS,
+    MAX_CHUNK_SIZE,
     MAX_PACKAGE_SIZE,
-    EMB_DIM
+    EMB_DIM,
+    _make_chunks
 )
 from orangecontrib.text import Corpus
+from orangecontrib.text.tests import isolate_embedding_store
 
 PATCH_METHOD = 'httpx.AsyncClient.post'
 RESPONSE = [
@@ -39,6 +44,7 @@ def make_dummy_post(response, sleep=0):
 class TestSBERT(unittest.TestCase):
 
     def setUp(self):
+        isolate_embedding_store(self)
         self.sbert = SBERT()
         self.corpus = Corpus.from_file('deerwester')
 
@@ -46,32 +52,37 @@ class TestSBERT(unittest.TestCase):
         self.sbert.clear_cache()
 
     def test_make_chunks_small(self):
-        chunks = self.sbert._make_chunks(
-            self.corpus.documents, [100] * len(self.corpus.documents)
-        )
-        self.assertEqual(len(chunks), min(len(self.corpus.documents), MIN_CHUNKS))
+        documents = ['a' * 100] * len(self.corpus.documents)
+        _, chunks = _make_chunks(documents)
+        self.assertEqual(len(chunks), min(len(documents), MIN_CHUNKS))
 
     def test_make_chunks_medium(self):
-        num_docs = len(self.corpus.documents)
-        documents = self.corpus.documents
-        if num_docs < MIN_CHUNKS:
-            documents = [documents[0]] * MIN_CHUNKS
-        chunks = self.sbert._make_chunks(
-            documents, [MAX_PACKAGE_SIZE / MIN_CHUNKS - 1] * len(documents)
-        )
+        documents = ['a' * (MAX_PACKAGE_SIZE // MIN_CHUNKS - 1)] * MIN_CHUNKS
+        _, chunks = _make_chunks(documents)
         self.assertEqual(len(chunks), MIN_CHUNKS)
 
     def test_make_chunks_large(self):
-        num_docs = len(self.corpus.documents)
-        documents = self.corpus.documents
-        if num_docs < MIN_CHUNKS:
-            documents = [documents[0]] * MIN_CHUNKS * 100
         mps = MAX_PACKAGE_SIZE
-        chunks = self.sbert._make_chunks(
-            documents,
-            [mps / 100] * (len(documents) - 2) + [0.3 * mps, 0.9 * mps, mps]
-        )
+        documents = ['a' * (mps // 100)] * (MIN_CHUNKS * 100 - 2) + \
+            ['a' * int(0.3 * mps), 'a' * int(0.9 * mps), 'a' * mps]
+        _, chunks = _make_chunks(documents)
         self.assertGreater(len(chunks), MIN_CHUNKS)
+        for chunk in chunks:
+            self.assertTrue(
+                len(chunk) == 1 or
+                sum(len(documents[i]) for i in chunk) <= MAX_CHUNK_SIZE)
+
+    def test_make_chunks_order(self):
+        # incompressible text that is too large to be sent
+        rng = np.random.RandomState(0)
+        large = ''.join(map(chr, rng.randint(0x4e00, 0x9fff, MAX_PACKAGE_SIZE)))
+        documents = ['doc {}'.format(i) for i in range(50)]
+        documents.insert(10, large)
+        encoded, chunks = _make_chunks(documents)
+        self.assertGreaterEqual(len(chunks), MIN_CHUNKS)
+        indices = np.concatenate(chunks)
+        np.testing.assert_equal(indices, np.delete(np.arange(51), 10))
+        self.assertEqual(encoded[3], b'doc 3')
 
     @patch(PATCH_METHOD)
     def test_empty_corpus(self, mock):
@@ -80,10 +91,7 @@ class TestSBERT(unittest.TestCase):
         )
         mock.request.assert_not_called()
         mock.get_response.assert_not_called()
-        self.assertEqual(
-            self.sbert._server_communicator._cache._cache_dict,
-            dict()
-        )
+        self.assertEqual(len(self.sbert._store), 0)
 
     @patch(PATCH_METHOD, make_dummy_post(iter(RESPONSE)))
     def test_success(self):
@@ -3,12 +3,15 @@ from unittest.mock import patch
 from collections.abc import Iterator
 import asyncio
 
-from orangecontrib.text.semantic_search import (
-    SemanticSearch,
-    MIN_CHUNKS,
-    MAX_PACKAGE_SIZE
-)
+import os
+import tempfile
+
+from orangecontrib.text.misc.mock_server import MockServer
+from orangecontrib.text.semantic_search import SemanticSearch, \
+    LocalSemanticSearch
+from orangecontrib.text.vectorization.sbert import MIN_CHUNKS
 from orangecontrib.text import Corpus
+from orangecontrib.text.tests import isolate_embedding_store
 
 PATCH_METHOD = 'httpx.AsyncClient.post'
 QUERIES = ['test query', 'another test query']
@@ -55,40 +58,13 @@ def make_dummy_post(response, sleep=0):
 class SemanticSearchTest(unittest.TestCase):
 
     def setUp(self):
+        isolate_embedding_store(self)
         self.semantic_search = SemanticSearch()
         self.corpus = Corpus.from_file('deerwester')
 
     def tearDown(self):
         self.semantic_search.clear_cache()
 
-    def test_make_chunks_small(self):
-        chunks = self.semantic_search._make_chunks(
-            self.corpus.documents, [100] * len(self.corpus.documents)
-        )
-        self.assertEqual(len(chunks), min(len(self.corpus.documents), MIN_CHUNKS))
-
-    def test_make_chunks_medium(self):
-        num_docs = len(self.corpus.documents)
-        documents = self.corpus.documents
-        if num_docs < MIN_CHUNKS:
-            documents = [documents[0]] * MIN_CHUNKS
-        chunks = self.semantic_search._make_chunks(
-            documents, [MAX_PACKAGE_SIZE / MIN_CHUNKS - 1] * len(documents)
-        )
-        self.assertEqual(len(chunks), MIN_CHUNKS)
-
-    def test_make_chunks_large(self):
-        num_docs = len(self.corpus.documents)
-        documents = self.corpus.documents
-        if num_docs < MIN_CHUNKS:
-            documents = [documents[0]] * MIN_CHUNKS * 100
-        mps = MAX_PACKAGE_SIZE
-        chunks = self.semantic_search._make_chunks(
-            documents,
-            [mps / 100] * (len(documents) - 2) + [0.3 * mps, 0.9 * mps, mps]
-        )
-        self.assertGreater(len(chunks), MIN_CHUNKS)
-
     @patch(PATCH_METHOD)
     def test_empty_corpus(self, mock):
         self.assertEqual(
@@ -96,10 +72,7 @@ class SemanticSearchTest(unittest.TestCase):
         )
         mock.request.assert_not_called()
         mock.get_response.assert_not_called()
-        self.assertEqual(
-            self.semantic_search._server_communicator._cache._cache_dict,
-            dict()
-        )
+        self.assertEqual(len(self.semantic_search._store), 0)
 
     @patch(PATCH_METHOD, make_dummy_post(iter(RESPONSE)))
     def test_success(self):
@@ -128,5 +101,75 @@ class SemanticSearchTest(unittest.TestCase):
         self.assertEqual(len(result), MIN_CHUNKS)
 
 
+class LocalSemanticSearchTest(unittest.TestCase):
+    def setUp(self):
+        isolate_embedding_store(self)
+        self.server = MockServer().start()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.search = LocalSemanticSearch(server_url=self.server.url,
+                                          path=self.tmp.name)
+        self.texts = ['First sentence. Second one! Third?', '', 'Only one']
+
+    def tearDown(self):
+        self.search.clear_cache()
+        self.server.stop()
+        self.tmp.cleanup()
+
+    def test_matches(self):
+        result = self.search(self.texts, QUERIES)
+        self.assertEqual([m[0] for m in result[0]],
+                         [[0, 15], [16, 27], [28, 34]])
+        self.assertEqual(result[1], [])
+        self.assertEqual(result[2][0][0], [0, 8])
+        for matches in result:
+            for _, score in matches:
+                self.assertIsInstance(score, float)
+
+        # only the k most similar sentences are matched by a query
+        self.search.k = 1
+        result = self.search(self.texts, QUERIES[:1])
+        self.assertEqual(sum(map(len, result)), 1)
+
+    def test_sentences_embedded_once(self):
+        self.search(self.texts, QUERIES)
+        self.server.reset_stats()
+        self.search(self.texts, ['new query'])
+        self.assertEqual(self.server.stats['items'], 1)
+
+        # index is reused from disk
+        search = LocalSemanticSearch(server_url=self.server.url,
+                                     path=self.tmp.name)
+        self.server.reset_stats()
+        search(self.texts, ['another query'])
+        self.assertEqual(self.server.stats['items'], 1)
+
+    def test_empty(self):
+        self.assertEqual(self.search([], QUERIES), [])
+        self.assertEqual(self.search(self.texts, []), [None] * 3)
+
+    def test_failed_embedding(self):
+        self.server.error_rate = 1
+        self.assertEqual(self.search(['A sentence.', ''], QUERIES), [None, []])
+        # incomplete index is not saved and sentences are embedded again
+        self.assertFalse(os.path.exists(self.tmp.name)
+                         and os.listdir(self.tmp.name))
+        self.server.error_rate = 0
+        result = self.search(['A sentence.', ''], QUERIES)
+        self.assertEqual(len(result[0]), 1)
+        self.assertEqual(len(os.listdir(self.tmp.name)), 1)
+
+    def test_saved_indices_limited(self):
+        with patch('orangecontrib.text.semantic_search.MAX_SAVED_INDICES', 2):
+            for text in ['First.', 'Second.', 'Third.']:
+                self.search([text], QUERIES)
+        self.assertEqual(len(os.listdir(self.tmp.name)), 2)
+
+    def test_set_cancelled(self):
+        communicator = self.search._embedder._server_communicator
+        with patch.object(communicator, 'set_cancelled', create=True) as mock:
+            self.search.set_cancelled()
+        mock.assert_called_once()
+
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
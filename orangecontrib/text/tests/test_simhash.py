@@ -1,7 +1,12 @@
 import unittest
 
+import numpy as np
+from simhash import Simhash
+
 from orangecontrib.text.corpus import Corpus
 from orangecontrib.text.vectorization import SimhashVectorizer
+from orangecontrib.text.vectorization.simhash import hamming_distance, \
+    hamming_distances, unpack_fingerprints, corpus_fingerprints
 
 
 class TestSimhash(unittest.TestCase):
@@ -13,8 +18,113 @@ class TestSimhash(unittest.TestCase):
         result = vect.transform(self.corpus)
         self.assertIsInstance(result, Corpus)
         self.assertEqual(len(result), len(self.corpus))
+        self.assertEqual(result.X.shape, (len(self.corpus), 0))
+        np.testing.assert_array_equal(
+            corpus_fingerprints(result),
+            vect.fingerprints(self.corpus.tokens))
+
+        vect = SimhashVectorizer(shingle_len=10, f=64, expand_bits=True)
+        result = vect.transform(self.corpus)
         self.assertEqual(result.X.shape, (len(self.corpus), 64))
 
+    def test_stored_fingerprints(self):
+        for f in (8, 64, 100, 128):
+            vect = SimhashVectorizer(shingle_len=2, f=f, fast=True)
+            result = vect.transform(self.corpus)
+            fp = vect.fingerprints(self.corpus.tokens)
+            np.testing.assert_array_equal(corpus_fingerprints(result), fp)
+            np.testing.assert_array_equal(
+                corpus_fingerprints(result[2:5]), fp[2:5])
+        self.assertRaises(ValueError, corpus_fingerprints, self.corpus)
+
     def test_report(self):
         vect = SimhashVectorizer()
         self.assertGreater(len(vect.report()), 0)
+
+    def test_fingerprints(self):
+        # the simhash package requires multiples of 8 bits
+        for f, fast in [(8, False), (64, False), (128, False), (1, True),
+                        (8, True), (64, True), (100, True), (128, True)]:
+            vect = SimhashVectorizer(shingle_len=2, f=f, fast=fast)
+            fp = vect.fingerprints(self.corpus.tokens)
+            self.assertEqual(fp.dtype, np.uint64)
+            self.assertEqual(fp.shape, (len(self.corpus), -(-f // 64)))
+            if f % 64:
+                self.assertTrue(np.all(fp[:, -1] >> np.uint64(f % 64) == 0))
+
+    def test_fingerprints_deterministic(self):
+        tokens = [['a', 'b', 'c', 'd'], ['a', 'b', 'c', 'd'], ['x'], []]
+        vect = SimhashVectorizer(shingle_len=2, fast=True)
+        fp = vect.fingerprints(tokens)
+        np.testing.assert_array_equal(fp[0], fp[1])
+        # documents shorter than a shingle have an empty fingerprint
+        np.testing.assert_array_equal(fp[2:], 0)
+        # independent of chunking
+        vect.chunk_size = 1
+        np.testing.assert_array_equal(vect.fingerprints(tokens), fp)
+
+    def test_similar_documents(self):
+        doc = 'the quick brown fox jumps over the lazy dog again and again'
+        tokens = [doc.split(), (doc + ' today').split(),
+                  'completely different words are in this one sentence'.split()]
+        for fast in (False, True):
+            fp = SimhashVectorizer(shingle_len=1, fast=fast).fingerprints(tokens)
+            d = hamming_distances(fp)
+            self.assertLess(d[0, 1], d[0, 2])
+
+    def test_default_hash(self):
+        # fingerprints of the simhash package are kept by default
+        vect = SimhashVectorizer(shingle_len=2, f=64)
+        fp = vect.fingerprints(self.corpus.tokens)
+        expected = [Simhash(vect.get_shingles(doc, 2)).value
+                    for doc in self.corpus.tokens]
+        self.assertListEqual([int(v) for v in fp[:, 0]], expected)
+
+    def test_fast_hash(self):
+        vect = SimhashVectorizer(shingle_len=2, f=64, fast=True)
+        fp = vect.fingerprints([['a', 'b', 'c', 'd'], ['foo', 'bar', 'baz'],
+                                ['x']])
+        self.assertListEqual([int(v) for v in fp[:, 0]],
+                             [6758506155285639344, 4615345495521035520, 0])
+        self.assertIn(('Hash function', 'FNV-1a (fast)'), vect.report())
+
+    def test_hashfunc(self):
+        vect = SimhashVectorizer(shingle_len=2, f=64,
+                                 hashfunc=lambda x: len(x))
+        fp = vect.fingerprints(self.corpus.tokens)
+        expected = [vect.compute_hash(doc) for doc in self.corpus.tokens]
+        self.assertListEqual([int(v) for v in fp[:, 0]], expected)
+        self.assertEqual(
+            expected[0],
+            Simhash(vect.get_shingles(self.corpus.tokens[0], 2),
+                    hashfunc=lambda x: len(x)).value
+        )
+
+    def test_unpack(self):
+        vect = SimhashVectorizer(shingle_len=2, f=70, fast=True)
+        fp = vect.fingerprints(self.corpus.tokens)
+        bits = unpack_fingerprints(fp, 70)
+        self.assertEqual(bits.shape, (len(self.corpus), 70))
+        value = int(fp[0, 0]) | (int(fp[0, 1]) << 64)
+        self.assertListEqual(bits[0].astype(int).tolist(),
+                             vect.int2binarray(value))
+
+        vect.expand_bits = True
+        result = vect.transform(self.corpus)
+        np.testing.assert_array_equal(result.X, bits)
+
+    def test_hamming(self):
+        vect = SimhashVectorizer(shingle_len=2, f=128)
+        fp = vect.fingerprints(self.corpus.tokens)
+        bits = unpack_fingerprints(fp, 128)
+        expected = (bits[:, None, :] != bits[None, :, :]).sum(axis=2)
+        np.testing.assert_array_equal(hamming_distances(fp), expected)
+        np.testing.assert_array_equal(
+            hamming_distances(fp, max_block_size=1), expected)
+        np.testing.assert_array_equal(
+            hamming_distance(fp[0], fp[1:]), expected[0, 1:])
+        self.assertEqual(hamming_distance(fp[0], fp[0]), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
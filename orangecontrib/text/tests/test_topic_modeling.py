@@ -1,9 +1,21 @@
+import json
+import os
+import tempfile
+import threading
 import unittest
+from multiprocessing.context import BaseContext
+from unittest.mock import patch
 
 import numpy as np
+from gensim import models
+from gensim.models import ldamulticore
 
 from orangecontrib.text import vectorization
-from orangecontrib.text.topics import LdaWrapper, HdpWrapper, LsiWrapper
+from orangecontrib.text.topics import LdaWrapper, HdpWrapper, LsiWrapper, \
+    NmfWrapper
+from orangecontrib.text.topics.lda import LdaMulticoreProxy
+from orangecontrib.text.topics.lsi import RandomizedLsiModel, randomized_svd
+from orangecontrib.text.topics.topics import GensimWrapper, MANIFEST
 from orangecontrib.text.corpus import Corpus
 from orangecontrib.text import preprocess
 
@@ -72,6 +84,116 @@ class BaseTests:
         np.testing.assert_allclose(marg_prob, [[0.37777778], [0.31111111], [0.31111111]])
         self.assertEqual(9, num_tokens)
 
+    def test_partial_fit(self):
+        if not self.model.supports_online:
+            self.assertRaises(NotImplementedError,
+                              self.model.partial_fit, self.corpus)
+            return
+        old, new = self.corpus[:5], self.corpus[5:]
+        self.model.fit(old)
+        n_words = len(self.model.model.id2word)
+        self.model.partial_fit(new, decay=0.7)
+        id2word = self.model.model.id2word
+        self.assertEqual(len(id2word), len(self.corpus.dictionary))
+        self.assertGreater(len(id2word), n_words)
+        self.assertEqual(self.model.model.get_topics().shape[1], len(id2word))
+        topics = self.model.transform(new)
+        self.assertEqual(len(topics), len(new))
+        self.assertFalse(np.isnan(topics.X).any())
+        table = self.model.get_all_topics_table()
+        self.assertEqual(len(table.domain.attributes), len(id2word))
+
+    def test_partial_fit_decay(self):
+        if not self.model.supports_online:
+            return
+        self.model.fit(self.corpus[:5])
+        decay = self.model.model.decay
+        self.model.partial_fit(self.corpus[5:7], decay=0.7)
+        # decay of a single update does not change the model's default
+        self.assertEqual(self.model.model.decay, decay)
+        self.model.partial_fit(self.corpus[7:])
+        self.assertEqual(self.model.model.decay, decay)
+
+    def test_partial_fit_unfitted(self):
+        if self.model.supports_online:
+            self.model.partial_fit(self.corpus)
+            self.assertIsNotNone(self.model.model)
+
+    def test_topic_terms(self):
+        self.model.fit_transform(self.corpus)
+        shown = self.model.model.show_topics(self.model.num_topics, 10,
+                                             formatted=False)
+        weights = self.model._topics_weights(10)
+        for (_, topic), w in zip(shown, weights):
+            np.testing.assert_allclose(w, [x for _, x in topic])
+        all_topics = self.model.get_all_topics_table()
+        for i, (_, topic) in enumerate(shown):
+            columns = [all_topics.domain.index(word) for word, _ in topic]
+            np.testing.assert_allclose(all_topics.X[i, columns],
+                                       [x for _, x in topic])
+
+        # topic-word matrix is computed once per fit
+        with patch.object(self.model.model, "get_topics") as get_topics:
+            self.model.get_topics_table_by_id(0)
+            self.model.get_top_words_by_id(0)
+            get_topics.assert_not_called()
+        self.model.fit(self.corpus)
+        self.assertIsNone(self.model._terms)
+
+    def test_save_load(self):
+        self.model.fit_transform(self.corpus)
+        with tempfile.TemporaryDirectory() as path:
+            self.model.save(path)
+            loaded = GensimWrapper.load(path)
+        self.assertIs(type(loaded), type(self.model))
+        self.assertIs(type(loaded.model), type(self.model.model))
+        self.assertEqual(loaded.topic_names, self.model.topic_names)
+        np.testing.assert_array_equal(loaded.doc_topic, self.model.doc_topic)
+        np.testing.assert_array_equal(
+            loaded.get_all_topics_table().metas,
+            self.model.get_all_topics_table().metas)
+        topics = loaded.add_topics(self.corpus)
+        np.testing.assert_array_equal(topics.X, self.model.doc_topic)
+        self.assertEqual(len(loaded.transform(self.corpus)), len(self.corpus))
+
+    def test_batched_transform(self):
+        corpus = self.corpus.copy()
+        corpus.store_tokens(corpus.tokens)
+        topics = self.model.fit_transform(corpus)
+        self.assertTrue(np.shares_memory(topics.X, self.model.doc_topic))
+        self.assertEqual(self.model.doc_topic.shape,
+                         (len(corpus), self.model.actual_topics))
+        self.assertEqual(self.model.doc_topic.dtype, np.float64)
+        doc_topic = self.model.doc_topic
+        # documents the model was fit on are not converted again
+        with patch.object(self.model.model.id2word, "doc2bow") as doc2bow:
+            np.testing.assert_allclose(self.model.transform(corpus[:3]).X,
+                                       doc_topic[:3], atol=1e-3)
+            doc2bow.assert_not_called()
+        # same weights as the per-document transformation of the model
+        expected = np.zeros_like(self.model.doc_topic)
+        for i, doc in enumerate(self.model.model[list(corpus[:3].ngrams_corpus)]):
+            for topic, weight in doc:
+                expected[i, topic] = weight
+        np.testing.assert_allclose(self.model.doc_topic, expected, atol=1e-3)
+
+    def test_save_unfitted(self):
+        with tempfile.TemporaryDirectory() as path:
+            self.assertRaises(ValueError, self.model.save, path)
+
+    def test_load_unknown_wrapper(self):
+        self.model.fit(self.corpus)
+        with tempfile.TemporaryDirectory() as path:
+            self.model.save(path)
+            with open(os.path.join(path, MANIFEST)) as f:
+                manifest = json.load(f)
+            manifest['wrapper'] = 'os:system'
+            with open(os.path.join(path, MANIFEST), 'w') as f:
+                json.dump(manifest, f)
+            with patch('importlib.import_module') as import_module:
+                self.assertRaises(ValueError, GensimWrapper.load, path)
+                import_module.assert_not_called()
+
     def test_existing_attributes(self):
         """ doc_topic should not include existing X of corpus, just topics """
         corpus = Corpus.from_file('election-tweets-2016')[:100]
@@ -96,17 +218,117 @@ class LDATests(unittest.TestCase, BaseTests):
         self.assertEqual(corpus.X.shape, (len(self.corpus), 5))
         self.assertEqual(corpus.X.dtype, np.float64)
 
+    def test_update_decay(self):
+        self.model.fit(self.corpus[:5])
+        with patch.object(models.LdaModel, "update") as update:
+            self.model.partial_fit(self.corpus[5:7], decay=0.7)
+            self.model.partial_fit(self.corpus[7:])
+        self.assertEqual([call[1]["decay"] for call in update.call_args_list],
+                         [0.7, None])
+
     def test_random_seed(self):
         corpus1 = self.model.fit_transform(self.corpus)
         corpus2 = self.model.fit_transform(self.corpus)
         np.testing.assert_array_equal(corpus1.X, corpus2.X)
 
+    def test_warm_start(self):
+        self.model.fit(self.corpus[:7])
+        previous = self.model.model.get_topics()
+        old_words = self.model.model.id2word.token2id
+
+        model = LdaWrapper(num_topics=5)
+        model.kwargs["passes"] = 0  # keep topics of the previous model
+        model.fit(self.corpus, warm_start=self.model)
+        token2id = model.model.id2word.token2id
+        self.assertEqual(len(token2id), len(self.corpus.dictionary))
+        new = model.model.get_topics()
+        words = list(old_words)
+        # topic-word distributions are renormalized over the larger vocabulary
+        np.testing.assert_array_equal(
+            np.argsort(new[:, [token2id[w] for w in words]], axis=1),
+            np.argsort(previous[:, [old_words[w] for w in words]], axis=1))
+
+        self.assertRaises(ValueError, LdaWrapper(num_topics=3).fit,
+                          self.corpus, warm_start=self.model)
+        self.assertRaises(NotImplementedError, LsiWrapper(num_topics=5).fit,
+                          self.corpus, warm_start=self.model)
+
+
+class LDAMulticoreTests(unittest.TestCase, BaseTests):
+    def setUp(self):
+        self.corpus = Corpus.from_file('deerwester')
+        self.model = LdaWrapper(num_topics=5, workers=2)
+
+    def test_model(self):
+        self.model.fit(self.corpus)
+        self.assertIsInstance(self.model.model, LdaMulticoreProxy)
+        self.assertEqual(self.model.model.workers, 2)
+
+        model = LdaWrapper(num_topics=5, workers=1)
+        model.fit(self.corpus)
+        self.assertIs(type(model.model), models.LdaModel)
+
+    def test_report_all_passes(self):
+        progress = []
+        self.model.fit(self.corpus, on_progress=progress.append)
+        self.assertEqual(progress, [0.2, 0.4, 0.6, 0.8, 1])
+
+    def test_update_decay(self):
+        self.model.fit(self.corpus[:5])
+        default = self.model.model.decay
+        decays = []
+        do_mstep = LdaMulticoreProxy.do_mstep
+
+        def record_decay(model, *args, **kwargs):
+            decays.append(model.decay)
+            return do_mstep(model, *args, **kwargs)
+
+        with patch.object(LdaMulticoreProxy, "do_mstep", record_decay):
+            self.model.partial_fit(self.corpus[5:7], decay=0.7)
+            self.assertEqual(set(decays), {0.7})
+            decays.clear()
+            self.model.partial_fit(self.corpus[7:])
+            self.assertEqual(set(decays), {default})
+
+    def test_workers_not_forked(self):
+        start_methods = []
+        pool = BaseContext.Pool
+        gensim_pool = ldamulticore.Pool
+
+        def context_pool(context, *args, **kwargs):
+            start_methods.append(context.get_start_method())
+            return pool(context, *args, **kwargs)
+
+        # train from a thread as OWTopicModeling does
+        with patch.object(BaseContext, "Pool", context_pool):
+            thread = threading.Thread(target=self.model.fit,
+                                      args=(self.corpus,))
+            thread.start()
+            thread.join(timeout=300)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(self.model.model.workers, 2)
+        self.assertEqual(self.model.model.state.numdocs, len(self.corpus))
+        self.assertEqual(len(start_methods), 1)
+        self.assertNotEqual(start_methods[0], "fork")
+        # gensim's pool is restored
+        self.assertEqual(ldamulticore.Pool, gensim_pool)
+
 
 class HdpTest(unittest.TestCase, BaseTests):
     def setUp(self):
         self.corpus = Corpus.from_file('deerwester')
         self.model = HdpWrapper()
 
+    def test_batched_inference(self):
+        self.model.fit(self.corpus)
+        with patch.object(models.HdpModel, "inference",
+                          side_effect=self.model.model.inference,
+                          autospec=False) as inference:
+            self.model.transform(self.corpus)
+        # all documents are inferred in a single call
+        inference.assert_called_once()
+        self.assertEqual(len(inference.call_args[0][0]), len(self.corpus))
+
 
 class LsiTest(unittest.TestCase, BaseTests):
     def setUp(self):
@@ -114,5 +336,72 @@ class LsiTest(unittest.TestCase, BaseTests):
         self.model = LsiWrapper(num_topics=5)
 
 
+class RandomizedLsiTest(unittest.TestCase, BaseTests):
+    def setUp(self):
+        self.corpus = Corpus.from_file('deerwester')
+        self.model = LsiWrapper(num_topics=5, randomized=True)
+
+    def test_randomized_svd(self):
+        matrix = self.corpus.ngrams_corpus.sparse
+        u, s = randomized_svd(matrix, 3, random_state=np.random.RandomState(0))
+        _, expected, _ = np.linalg.svd(matrix.toarray())
+        np.testing.assert_allclose(s, expected[:3])
+        self.assertEqual(u.shape, (matrix.shape[0], 3))
+        np.testing.assert_allclose(np.einsum('ij,ik->jk', u, u), np.eye(3),
+                                   atol=1e-10)
+
+    def test_same_topics(self):
+        self.model.fit_transform(self.corpus)
+        self.assertIsInstance(self.model.model, RandomizedLsiModel)
+        lsi = LsiWrapper(num_topics=5)
+        lsi.fit_transform(self.corpus)
+        np.testing.assert_allclose(self.model.model.projection.s,
+                                   lsi.model.projection.s)
+        # singular vectors are unique up to the sign
+        np.testing.assert_allclose(np.abs(self.model.model.get_topics()),
+                                   np.abs(lsi.model.get_topics()), atol=1e-8)
+        np.testing.assert_allclose(np.abs(self.model.doc_topic),
+                                   np.abs(lsi.doc_topic), atol=1e-8)
+
+    def test_save_load_randomized(self):
+        self.model.fit_transform(self.corpus)
+        with tempfile.TemporaryDirectory() as path:
+            self.model.save(path)
+            self.assertTrue(GensimWrapper.load(path).randomized)
+            lsi = LsiWrapper()
+            lsi.restore(path)
+            self.assertTrue(lsi.randomized)
+
+
+class NmfTest(unittest.TestCase, BaseTests):
+    def setUp(self):
+        self.corpus = Corpus.from_file('deerwester')
+        self.model = NmfWrapper(num_topics=5)
+
+    def test_solvers(self):
+        for solver in ('cd', 'mu'):
+            model = NmfWrapper(num_topics=3, solver=solver)
+            model.fit_transform(self.corpus)
+            topics = model.model.get_topics()
+            self.assertEqual(topics.shape, (3, len(self.corpus.dictionary)))
+            self.assertTrue(np.all(topics >= 0))
+            self.assertTrue(np.all(model.doc_topic >= 0))
+            # the reconstruction approximates the document-term matrix
+            X = self.corpus.ngrams_corpus.sparse.T.toarray()
+            error = np.linalg.norm(X - np.einsum('ij,jk->ik', model.doc_topic, topics))
+            self.assertLess(error, np.linalg.norm(X))
+
+    def test_inference(self):
+        self.model.fit(self.corpus)
+        model = self.model.model
+        bow = self.corpus.ngrams_corpus
+        weights = model.inference(bow)
+        self.assertEqual(weights.shape, (len(self.corpus), 5))
+        # documents as gensim bag-of-words give the same topics
+        np.testing.assert_allclose(model.inference(list(bow)), weights)
+        self.assertEqual(model[list(bow)[0]],
+                         [(i, w) for i, w in enumerate(weights[0]) if w])
+
+
 if __name__ == "__main__":
     unittest.main()
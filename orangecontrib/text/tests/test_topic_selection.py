@@ -0,0 +1,92 @@
+import unittest
+
+import numpy as np
+import scipy.sparse as sp
+
+from orangecontrib.text.corpus import Corpus
+from orangecontrib.text.topics import LdaWrapper, LsiWrapper, select_num_topics
+from orangecontrib.text.topics.selection import CooccurrenceIndex, \
+    perplexity, _executor
+
+# term-document matrix: terms 0 and 1 always appear together, term 2 never
+# appears with them
+BOW = sp.csc_matrix(np.array([
+    [1, 2, 0, 0],
+    [1, 1, 0, 0],
+    [0, 0, 3, 1],
+]))
+
+
+class TestCooccurrenceIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = CooccurrenceIndex(BOW)
+
+    def test_counts(self):
+        df, co_df = self.index.counts(np.array([0, 2]))
+        np.testing.assert_array_equal(df, [2, 2])
+        np.testing.assert_array_equal(co_df, [[2, 0], [0, 2]])
+
+    def test_u_mass(self):
+        scores = self.index.coherence(np.array([[0, 1], [0, 2], [2, 0]]))
+        np.testing.assert_almost_equal(
+            scores, [np.log(3 / 2), np.log(1 / 2), np.log(1 / 2)])
+
+    def test_npmi(self):
+        scores = self.index.coherence(np.array([[0, 1], [0, 2]]), 'c_npmi')
+        self.assertAlmostEqual(scores[0], 1)
+        self.assertLess(scores[1], -0.9)
+        self.assertRaises(ValueError, self.index.coherence,
+                          np.array([[0, 1]]), 'c_v')
+
+
+class TestSelectNumTopics(unittest.TestCase):
+    def setUp(self):
+        self.corpus = Corpus.from_file('deerwester')
+
+    def test_select(self):
+        progress = []
+        table, best = select_num_topics(
+            self.corpus, LdaWrapper, [3, 2], n_jobs=1, holdout=0.2,
+            on_progress=progress.append)
+        np.testing.assert_array_equal(table.X[:, 0], [2, 3])
+        self.assertEqual(progress, [0.5, 1])
+        self.assertTrue(np.all(np.isfinite(table.X)))
+        self.assertTrue(np.all(table.X[:, 3] > 1))
+        self.assertIn(best.num_topics, (2, 3))
+        self.assertEqual(best.num_topics,
+                         table.X[np.argmax(table.X[:, 2]), 0])
+        topics = best.fit_transform(self.corpus)
+        self.assertEqual(len(topics), len(self.corpus))
+
+    def test_parallel(self):
+        serial, _ = select_num_topics(self.corpus, LdaWrapper, [2, 3], n_jobs=1)
+        parallel, best = select_num_topics(self.corpus, LdaWrapper, [2, 3],
+                                           n_jobs=2, criterion='perplexity')
+        np.testing.assert_almost_equal(serial.X, parallel.X)
+        self.assertEqual(best.num_topics,
+                         parallel.X[np.argmin(parallel.X[:, 3]), 0])
+        best.transform(self.corpus)
+
+    def test_workers_not_forked(self):
+        with _executor(2, None) as executor:
+            self.assertNotEqual(
+                executor._mp_context.get_start_method(), 'fork')
+
+    def test_lsi(self):
+        table, best = select_num_topics(self.corpus, LsiWrapper, [2, 3],
+                                        n_jobs=1, criterion='u_mass')
+        self.assertTrue(np.all(np.isnan(table.X[:, 3])))
+        self.assertIsNotNone(best)
+        self.assertRaises(ValueError, select_num_topics, self.corpus,
+                          LsiWrapper, [2], criterion='perplexity')
+
+    def test_perplexity(self):
+        model = LdaWrapper(num_topics=2)
+        model.fit(self.corpus)
+        value = perplexity(model, self.corpus.ngrams_corpus)
+        self.assertGreater(value, 1)
+        self.assertLess(value, len(self.corpus.ngrams_dictionary) * 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
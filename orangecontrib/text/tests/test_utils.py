@@ -5,7 +5,8 @@ import scipy.sparse as sp
 from numpy.testing import assert_array_equal
 from scipy.sparse import csc_matrix
 
-from orangecontrib.text.util import chunks, np_sp_sum, Sparse2CorpusSliceable
+from orangecontrib.text.util import chunks, np_sp_sum, Sparse2CorpusSliceable, \
+    deduplicate, expand_duplicates
 
 
 class ChunksTest(unittest.TestCase):
@@ -32,6 +33,23 @@ class TestNpSpSum(unittest.TestCase):
             np.testing.assert_equal(np_sp_sum(data, axis=0), np.ones(10))
 
 
+class TestDeduplicate(unittest.TestCase):
+    def test_deduplicate(self):
+        keys = ['a', 'b', 'a', 'c', 'b', 'a']
+        unique, inverse = deduplicate(keys)
+        self.assertListEqual(unique, [0, 1, 3])
+        self.assertListEqual(inverse, [0, 1, 0, 2, 1, 0])
+        self.assertListEqual([[keys[i] for i in unique][j] for j in inverse],
+                             keys)
+        self.assertEqual(deduplicate([]), ([], []))
+
+    def test_expand_duplicates(self):
+        res = expand_duplicates([[1], None, [2]], [0, 1, 0, 2, 1])
+        self.assertListEqual(res, [[1], None, [1], [2], None])
+        self.assertIsNot(res[0], res[2])
+        self.assertEqual(expand_duplicates([], []), [])
+
+
 class TestSparse2CorpusSliceable(unittest.TestCase):
     def setUp(self) -> None:
         self.orig_array = np.array([[1, 2, 3], [4, 5, 6]])
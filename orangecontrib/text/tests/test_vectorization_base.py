@@ -32,3 +32,25 @@ class BaseVectorizationTest(unittest.TestCase):
 
         for a in c2.domain.attributes:
             self.assertIn('foo', a.attributes)
+
+    def test_add_features_order(self):
+        corpus = Corpus.from_file('deerwester')
+        X = sp.csr_matrix(np.tile(np.arange(4), (len(corpus), 1)))
+        dictionary = {0: 'd', 1: 'c', 2: 'b', 3: 'a'}
+
+        corpus = BaseVectorizer.add_features(corpus, X, dictionary)
+        self.assertListEqual(
+            [a.name for a in corpus.domain.attributes], ['a', 'b', 'c', 'd'])
+        np.testing.assert_array_equal(
+            corpus.X.toarray(), np.tile([3, 2, 1, 0], (len(corpus), 1)))
+        # values are not copied, only column indices are remapped
+        self.assertTrue(np.shares_memory(corpus.X.data, X.data))
+
+    def test_add_features_shares_arrays(self):
+        c1 = Corpus.from_file('deerwester')
+        X = sp.csr_matrix(np.ones((len(c1), 2)))
+        c2 = BaseVectorizer.add_features(c1, X, {0: 'a', 1: 'b'})
+
+        self.assertIs(c2.X, X)
+        self.assertTrue(np.shares_memory(c1.metas, c2.metas))
+        self.assertTrue(np.shares_memory(c1.Y, c2.Y))
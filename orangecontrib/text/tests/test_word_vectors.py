@@ -0,0 +1,139 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+from numpy.testing import assert_array_almost_equal
+
+from Orange.misc.utils.embedder_utils import EmbeddingCancelledException
+from orangecontrib.text import Corpus
+from orangecontrib.text.vectorization.document_embedder import DocumentEmbedder
+from orangecontrib.text.vectorization.word_vectors import LocalEmbedder, \
+    WordVectors
+
+
+class TestWordVectors(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = os.path.join(self.tmp.name, 'cache')
+        self.words = ['human', 'computer', 'system', 'user', 'graph']
+        self.vectors = np.arange(15, dtype=float).reshape(5, 3) - 7
+        self.path = os.path.join(self.tmp.name, 'vectors.vec')
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.write('5 3\n')
+            for w, v in zip(self.words, self.vectors):
+                f.write(w + ' ' + ' '.join(map(str, v)) + ' \n')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_load_vec(self):
+        wv = WordVectors.load(self.path, cache=self.cache)
+        self.assertEqual(len(wv), 5)
+        self.assertEqual(wv.dim, 3)
+        self.assertListEqual(wv.words, self.words)
+        assert_array_almost_equal(wv.vectors, self.vectors)
+        self.assertIsInstance(wv.vectors, np.memmap)
+        self.assertEqual(len(os.listdir(self.cache)), 2)
+
+        # the second load reuses converted files
+        wv = WordVectors.load(self.path, cache=self.cache)
+        assert_array_almost_equal(wv.vectors, self.vectors)
+        self.assertEqual(len(os.listdir(self.cache)), 2)
+
+    def test_load_vec_words_with_spaces(self):
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.write('2 3\n')
+            f.write('new york 1 2 3 \n')
+            f.write('a b  c 4 5 6\n')
+        wv = WordVectors.load(self.path, cache=self.cache)
+        self.assertListEqual(wv.words, ['new york', 'a b  c'])
+        assert_array_almost_equal(wv.vectors, [[1, 2, 3], [4, 5, 6]])
+
+    def test_load_vec_invalid(self):
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.write('3 3\n')
+            f.write('human 1 2 3\n')
+            f.write('user 4 5 6\n')
+        self.assertRaises(ValueError, WordVectors.load, self.path,
+                          cache=self.cache)
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.write('2 3\n')
+            f.write('human 1 2 3\n')
+            f.write('user 4 5\n')
+        self.assertRaises(ValueError, WordVectors.load, self.path,
+                          cache=self.cache)
+        # nothing is left in the cache
+        self.assertListEqual(os.listdir(self.cache), [])
+
+    def test_load_bin(self):
+        from gensim.models import FastText
+        from gensim.models.fasttext import save_facebook_model
+
+        model = FastText(vector_size=4, min_count=1)
+        sentences = [['human', 'computer'], ['graph', 'user', 'system']]
+        model.build_vocab(sentences)
+        model.train(sentences, total_examples=2, epochs=1)
+        path = os.path.join(self.tmp.name, 'vectors.bin')
+        save_facebook_model(model, path)
+
+        with self.assertWarns(ResourceWarning):
+            wv = WordVectors.load(path, cache=self.cache)
+        self.assertEqual(wv.dim, 4)
+        self.assertSetEqual(set(wv.words), set(self.words))
+        assert_array_almost_equal(
+            wv.vectors[wv.index['graph']], model.wv['graph'], decimal=5)
+
+    def test_lookup(self):
+        wv = WordVectors(self.vectors, self.words)
+        np.testing.assert_array_equal(
+            wv.lookup(['user', 'foo', 'human']), [3, -1, 0])
+
+    def test_embed(self):
+        wv = WordVectors(self.vectors, self.words)
+        docs = [['human', 'foo', 'user', 'user'], ['foo'], [], ['graph']]
+        v = self.vectors
+        expected = {
+            'sum': v[0] + 2 * v[3],
+            'mean': (v[0] + 2 * v[3]) / 3,
+            'max': np.maximum(v[0], v[3]),
+            'min': np.minimum(v[0], v[3]),
+        }
+        for aggregator, emb in expected.items():
+            res = wv.embed(docs, aggregator)
+            self.assertEqual(len(res), 4)
+            assert_array_almost_equal(res[0], emb)
+            self.assertIsNone(res[1])
+            self.assertIsNone(res[2])
+            assert_array_almost_equal(res[3], v[4])
+
+        self.assertListEqual(wv.embed([['foo']], 'max'), [None])
+        self.assertRaises(ValueError, wv.embed, docs, 'median')
+
+    def test_local_embedder(self):
+        embedder = LocalEmbedder(WordVectors(self.vectors, self.words),
+                                 'mean', batch_size=2)
+        calls = []
+        res = embedder.embedd_data([['human']] * 5,
+                                   processed_callback=calls.append)
+        self.assertEqual(len(res), 5)
+        self.assertListEqual(calls, [True] * 5)
+
+        # cancelled after the first batch
+        self.assertRaises(EmbeddingCancelledException, embedder.embedd_data,
+                          [['human']] * 5, lambda _: embedder.set_cancelled())
+
+    def test_document_embedder(self):
+        corpus = Corpus.from_file('deerwester')
+        embedder = DocumentEmbedder(model_path=self.path, aggregator='Max')
+        with self.assertWarns(RuntimeWarning):
+            embeddings, skipped = embedder(corpus)
+        self.assertEqual(embeddings.X.shape[1], 3)
+        self.assertEqual(len(embeddings) + len(skipped), len(corpus))
+        self.assertIn(('Model', 'vectors.vec'), embedder.report())
+
+        self.assertEqual(len(embedder([['human'], ['foo']])), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
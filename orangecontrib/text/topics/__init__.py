@@ -2,3 +2,5 @@ from .topics import Topic, Topics
 from .lda import LdaWrapper
 from .lsi import LsiWrapper
 from .hdp import HdpWrapper
+from .nmf import NmfWrapper
+from .selection import select_num_topics
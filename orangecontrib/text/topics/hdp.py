@@ -1,3 +1,4 @@
+import numpy as np
 from gensim import models
 
 from .topics import GensimWrapper
@@ -10,3 +11,13 @@ class HdpWrapper(GensimWrapper):
     @property
     def num_topics(self):
         return self.model.m_lambda.shape[0] if self.model else 0
+
+    def _infer(self, bow_corpus):
+        # inference of all documents in one call; as in HdpModel.__getitem__,
+        # weights are normalized and topics below 0.01 are removed
+        gamma = self.model.inference(list(bow_corpus))
+        sums = gamma.sum(axis=1, keepdims=True)
+        doc_topic = np.divide(gamma, sums, out=np.zeros_like(gamma),
+                              where=sums != 0)
+        doc_topic[doc_topic < 0.01] = 0
+        return doc_topic[:, :self.actual_topics]
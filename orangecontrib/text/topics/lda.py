@@ -1,14 +1,154 @@
+import multiprocessing
+import threading
+from contextlib import contextmanager
+
+import numpy as np
 from numpy import float64
 from gensim import models
+from gensim.models import ldamulticore
+
+from .topics import GensimWrapper, GensimProgressCallback
+
+# LdaMulticore.update creates its pool and queues with module globals of
+# ldamulticore; they are replaced while one model at a time is updated
+_pool_lock = threading.Lock()
+
+
+@contextmanager
+def _worker_context():
+    """ Start LdaMulticore workers with forkserver (or spawn). """
+    # forking a process with running threads (Qt, BLAS) may deadlock
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context(
+        'forkserver' if 'forkserver' in methods else 'spawn')
+    with _pool_lock:
+        pool, queue = ldamulticore.Pool, ldamulticore.Queue
+        ldamulticore.Pool, ldamulticore.Queue = context.Pool, context.Queue
+        try:
+            yield
+        finally:
+            ldamulticore.Pool, ldamulticore.Queue = pool, queue
+
+
+class LdaMulticoreProxy(models.LdaMulticore):
+    """
+    LdaMulticore which reports progress to callbacks after every pass.
+
+    LdaMulticore does not accept callbacks; progress is computed from the
+    number of documents merged into the model in M-steps. Only callbacks
+    that do not need evaluation data (e.g. GensimProgressCallback) are
+    supported.
+    """
+    def __init__(self, corpus=None, callbacks=None, **kwargs):
+        # update is called from the constructor - set callbacks before
+        self._progress_callbacks = callbacks or []
+        self._docs_total = self._docs_seen = self._epochs = 0
+        super().__init__(corpus=corpus, **kwargs)
 
-from .topics import GensimWrapper
+    def __getstate__(self):
+        # the model is sent to worker processes; callbacks may not pickle
+        state = self.__dict__.copy()
+        state['_progress_callbacks'] = []
+        return state
+
+    def update(self, corpus, chunks_as_numpy=False):
+        self._docs_total = len(corpus) if hasattr(corpus, '__len__') else 0
+        self._docs_seen = self._epochs = 0
+        with _worker_context():
+            super().update(corpus, chunks_as_numpy=chunks_as_numpy)
+        # the last M-step of a pass is skipped when the final results arrive
+        # in the same merge; report passes that were not reported yet
+        while self._epochs < self.passes:
+            self._epoch_end()
+
+    def do_mstep(self, rho, other, extra_pass=False):
+        self._docs_seen += other.numdocs
+        super().do_mstep(rho, other, extra_pass)
+        while self._docs_total and self._epochs < self.passes - 1 and \
+                self._docs_seen >= (self._epochs + 1) * self._docs_total:
+            self._epoch_end()
+
+    def _epoch_end(self):
+        self._epochs += 1
+        for callback in self._progress_callbacks:
+            callback.get_value(model=self)
 
 
 class LdaWrapper(GensimWrapper):
     name = 'Latent Dirichlet Allocation'
     Model = models.LdaModel
+    supports_online = True
+    supports_warm_start = True
+    workers = 1
 
-    def __init__(self, **kwargs):
+    def __init__(self, workers=1, **kwargs):
+        """
+        Args:
+            workers (int): Number of worker processes. A single worker trains
+                with LdaModel and results are reproducible; with more workers
+                LdaMulticore is used and results depend on the order in which
+                workers finish.
+        """
+        if workers > 1:
+            self.Model = LdaMulticoreProxy
+            kwargs["workers"] = workers
         # with 200 iterations on pass (default) is usually not enough for all
         # documents to converge - with 5 it converged in all my cases
         super().__init__(random_state=0, **kwargs, dtype=float64, iterations=200, passes=5)
+        self.workers = workers
+
+    def _extend_vocabulary(self, num_terms):
+        model = self.model
+        n_new = num_terms - model.num_terms
+        if n_new <= 0:
+            return
+        # new words get the average prior and a random initialization of
+        # topic-word statistics as in LdaModel.__init__
+        eta = model.eta
+        new_eta = np.repeat(eta.mean(axis=-1, keepdims=True), n_new, axis=-1) \
+            if eta.ndim == 2 else np.full(n_new, eta.mean())
+        model.eta = model.state.eta = \
+            np.concatenate((eta, new_eta), axis=-1).astype(model.dtype)
+        sstats = model.random_state.gamma(100., 1. / 100., (model.num_topics, n_new))
+        model.state.sstats = np.hstack((model.state.sstats, sstats.astype(model.dtype)))
+        model.num_terms = num_terms
+        model.sync_state()
+
+    def _update_model(self, bow_corpus, decay, on_progress):
+        model = self.model
+        callbacks = [GensimProgressCallback(on_progress)]
+        if isinstance(model, LdaMulticoreProxy):
+            model._progress_callbacks = callbacks
+            # LdaMulticore.update has no decay argument; the model's decay is
+            # changed only for this update
+            default_decay = model.decay
+            if decay is not None:
+                model.decay = decay
+            try:
+                model.update(bow_corpus)
+            finally:
+                model.decay = default_decay
+        else:
+            model.callbacks = callbacks
+            model.update(bow_corpus, decay=decay)
+
+    def _infer(self, bow_corpus):
+        # a single E-step over all documents instead of one per document;
+        # small probabilities are removed as in LdaModel.get_document_topics
+        model = self.model
+        gamma, _ = model.inference(list(bow_corpus))
+        doc_topic = gamma / gamma.sum(axis=1, keepdims=True)
+        doc_topic[doc_topic < max(model.minimum_probability, 1e-8)] = 0
+        return doc_topic
+
+    def _warm_start(self, model):
+        if model.num_topics != self.model.num_topics:
+            raise ValueError("Warm start requires the same number of topics.")
+        # copy topic-word statistics of words known to both models; other
+        # words keep the random initialization
+        token2id = model.id2word.token2id
+        pairs = np.array([(i, token2id[w]) for w, i in self.model.id2word.token2id.items()
+                          if w in token2id], dtype=int).reshape(-1, 2)
+        sstats = self.model.state.sstats
+        sstats[:, pairs[:, 0]] = model.state.sstats[:, pairs[:, 1]]
+        self.model.sync_state()
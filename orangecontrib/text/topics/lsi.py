@@ -1,5 +1,9 @@
+import numpy as np
+import scipy.sparse as sp
 from numpy import float64
+from gensim import matutils
 from gensim.models import LsiModel
+from gensim.models.lsimodel import Projection, clip_spectrum
 
 from .topics import GensimWrapper
 
@@ -18,10 +22,114 @@ class LsiModelProxy(LsiModel):
         self.update(corpus, chunksize, decay)
 
 
+def randomized_svd(matrix, k, oversampling=10, power_iterations=2,
+                   random_state=None):
+    """
+    Left singular vectors and singular values of the k largest singular
+    values computed with the randomized algorithm of Halko, Martinsson and
+    Tropp (2011).
+
+    Args:
+        matrix (sp.spmatrix): A matrix of shape (m, n).
+        k (int): Number of singular values.
+        oversampling (int): Number of random samples in addition to k.
+        power_iterations (int): Number of power iterations; they improve
+            accuracy when singular values decay slowly.
+        random_state (np.random.RandomState): Random generator of samples.
+
+    Returns:
+        tuple: Singular vectors of shape (m, k) and singular values.
+    """
+    m, n = matrix.shape
+    k = min(k, m, n)
+    samples = min(k + oversampling, m, n)
+    random_state = random_state or np.random.RandomState()
+    omega = random_state.normal(size=(n, samples)).astype(matrix.dtype)
+    # orthonormalize between multiplications to keep small singular
+    # values from vanishing in rounding errors
+    q, _ = np.linalg.qr(matrix @ omega)
+    for _ in range(power_iterations):
+        q, _ = np.linalg.qr(matrix.T @ q)
+        q, _ = np.linalg.qr(matrix @ q)
+    u, s, _ = np.linalg.svd((matrix.T @ q).T, full_matrices=False)
+    return q @ u[:, :k], s[:k]
+
+
+class RandomizedLsiModel(LsiModelProxy):
+    """
+    LsiModel which decomposes the whole term-document matrix with randomized
+    truncated SVD instead of merging decompositions of chunks of documents.
+
+    Oversampling and the number of power iterations are set with LsiModel's
+    `extra_samples` and `power_iters`. Topics, document transformation and
+    saving are those of LsiModel; new documents are decomposed separately
+    and merged into the model as in LsiModel.
+    """
+    def __init__(self, corpus=None, extra_samples=10, **kwargs):
+        super().__init__(corpus=corpus, extra_samples=extra_samples, **kwargs)
+
+    def update(self, corpus, chunksize=None, decay=None):
+        if isinstance(corpus, matutils.Sparse2Corpus):
+            matrix = corpus.sparse
+        elif sp.issparse(corpus):
+            matrix = corpus
+        else:
+            matrix = matutils.corpus2csc(corpus, num_terms=self.num_terms)
+        matrix = sp.csc_matrix(matrix, dtype=self.dtype)
+        if not matrix.shape[1]:
+            return
+        u, s = randomized_svd(matrix, self.num_topics, self.extra_samples,
+                              self.power_iters,
+                              np.random.RandomState(self.random_seed))
+        # discard factors with a negligible share of energy as LsiModel
+        keep = clip_spectrum(s ** 2, len(s)) if s.any() else 0
+        projection = Projection(self.num_terms, self.num_topics,
+                                dtype=self.dtype)
+        projection.u, projection.s = u[:, :keep], s[:keep]
+        self.projection.merge(
+            projection, decay=self.decay if decay is None else decay)
+        self.docs_processed += matrix.shape[1]
+
+
 class LsiWrapper(GensimWrapper):
     name = 'Latent Semantic Indexing'
     Model = LsiModelProxy
     has_negative_weights = True
+    supports_online = True
+    wrapper_params = ('randomized',)
 
-    def __init__(self, **kwargs):
+    def __init__(self, randomized=False, **kwargs):
+        """
+        Args:
+            randomized (bool): Decompose the whole term-document matrix with
+                randomized truncated SVD (RandomizedLsiModel), which is
+                faster on large corpora than gensim's decomposition of
+                chunks. Its accuracy is set with `extra_samples`
+                (oversampling) and `power_iters`.
+        """
+        if randomized:
+            self.Model = RandomizedLsiModel
+            kwargs.setdefault("random_seed", 0)
         super().__init__(**kwargs, dtype=float64)
+        self.randomized = randomized
+
+    def _infer(self, bow_corpus):
+        # projection of all documents with a single sparse-dense product
+        u = self.model.projection.u[:, :self.actual_topics]
+        return np.asarray(bow_corpus.sparse.T @ u)
+
+    def _extend_vocabulary(self, num_terms):
+        model = self.model
+        n_new = num_terms - model.num_terms
+        if n_new <= 0:
+            return
+        # unseen words have no weight in existing topics
+        projection = model.projection
+        projection.u = np.vstack(
+            (projection.u, np.zeros((n_new, projection.u.shape[1]),
+                                    dtype=projection.u.dtype)))
+        projection.m = model.num_terms = num_terms
+
+    def _update_model(self, bow_corpus, decay, on_progress):
+        self.model.add_documents(bow_corpus, decay=decay)
+        on_progress(1)
@@ -0,0 +1,104 @@
+import numpy as np
+import scipy.sparse as sp
+from gensim import matutils, utils
+from sklearn.decomposition import NMF
+
+from .topics import GensimWrapper
+
+
+class NmfModel(utils.SaveLoad):
+    """
+    Non-negative matrix factorization of the document-term matrix with the
+    interface of gensim topic models used by GensimWrapper.
+
+    Unlike gensim models, which stream documents as lists of tuples, it
+    factorizes the sparse matrix at once; documents (rows) are
+    approximated by non-negative combinations of topics (rows of
+    `components`).
+    """
+    def __init__(self, corpus=None, id2word=None, num_topics=10, solver='cd',
+                 max_iter=200, tol=1e-4, random_state=0, dtype=np.float64):
+        """
+        Args:
+            corpus (Sparse2Corpus or list): Documents in the bag-of-words
+                format; a Sparse2Corpus is factorized without conversion.
+            id2word (Dictionary): An ngram to id mapper.
+            num_topics (int): Number of topics.
+            solver (str): 'cd' for coordinate descent or 'mu' for
+                multiplicative updates.
+            max_iter (int): Maximal number of iterations.
+            tol (float): Tolerance of the stopping condition.
+        """
+        self.id2word = id2word
+        self.num_topics = num_topics
+        self.num_terms = len(id2word) if id2word is not None else 0
+        self.dtype = dtype
+        self.nmf = NMF(n_components=num_topics, solver=solver,
+                       max_iter=max_iter, tol=tol, random_state=random_state)
+        self.components = np.zeros((num_topics, self.num_terms), dtype=dtype)
+        if corpus is not None:
+            self.update(corpus)
+
+    def _matrix(self, corpus):
+        """ Document-term matrix in CSR format. """
+        if isinstance(corpus, matutils.Sparse2Corpus):
+            return sp.csr_matrix(corpus.sparse.T, dtype=self.dtype)
+        return matutils.corpus2csc(corpus, num_terms=self.num_terms,
+                                   dtype=self.dtype).T.tocsr()
+
+    def update(self, corpus):
+        """ Factorize documents; the previous factorization is discarded. """
+        X = self._matrix(corpus)
+        # NNDSVD initialization requires at most min(X.shape) topics
+        self.nmf.set_params(
+            init='nndsvda' if self.num_topics <= min(X.shape) else 'random')
+        self.nmf.fit(X)
+        self.components = self.nmf.components_.astype(self.dtype)
+
+    def inference(self, corpus):
+        """ Topic weights of documents, shape (n_docs, num_topics). """
+        X = self._matrix(corpus)
+        if not X.shape[0]:
+            return np.zeros((0, self.num_topics), dtype=self.dtype)
+        return self.nmf.transform(X)
+
+    def get_topics(self):
+        """ Topic-word weights, shape (num_topics, num_terms). """
+        return self.components
+
+    def show_topics(self, num_topics=10, num_words=10, formatted=True):
+        """ Top words of topics as in gensim models: a list of (topic id,
+        words) where words are a formatted string or (word, weight) pairs. """
+        topics = []
+        for i, weights in enumerate(self.components[:num_topics]):
+            top = matutils.argsort(weights, num_words, reverse=True)
+            words = [(self.id2word[w], float(weights[w])) for w in top]
+            if formatted:
+                words = ' + '.join('{:.3f}*"{}"'.format(v, w) for w, v in words)
+            topics.append((i, words))
+        return topics
+
+    def __getitem__(self, bow):
+        """ Topics of a document or of every document in a corpus as lists
+        of (topic id, weight) with non-zero weights. """
+        is_corpus, bow = utils.is_corpus(bow)
+        weights = self.inference(bow if is_corpus else [bow])
+        topics = [[(int(i), float(w[i])) for i in np.flatnonzero(w)]
+                  for w in weights]
+        return topics if is_corpus else topics[0]
+
+
+class NmfWrapper(GensimWrapper):
+    name = 'Non-negative Matrix Factorization'
+    Model = NmfModel
+
+    def __init__(self, solver='cd', **kwargs):
+        """
+        Args:
+            solver (str): 'cd' for coordinate descent or 'mu' for
+                multiplicative updates.
+        """
+        super().__init__(solver=solver, random_state=0, **kwargs)
+
+    def _infer(self, bow_corpus):
+        return self.model.inference(bow_corpus)
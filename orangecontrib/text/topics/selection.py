@@ -0,0 +1,258 @@
+""" Selection of the number of topics.
+
+Models of one type are trained for every number of topics in a grid, in
+parallel processes, and scored with
+
+- UMass and NPMI coherence of their top words, computed from document
+  co-occurrences of words in training documents, and
+- per-word perplexity of held-out documents.
+
+    >>> table, best = select_num_topics(corpus, LdaWrapper, [5, 10, 20])
+
+The bag-of-words matrix, dictionary and co-occurrence index are sent to
+every worker once. Workers are started from a fresh server process
+(forkserver) or spawned, never forked from the calling process, which may
+run Qt and BLAS threads. They return only scores; the best model is fit
+again in the calling process.
+"""
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import scipy.sparse as sp
+from gensim import matutils
+
+from Orange.data import ContinuousVariable, Domain, Table
+from Orange.util import dummy_callback
+
+from orangecontrib.text.util import Sparse2CorpusSliceable
+from .lda import LdaWrapper
+
+EPSILON = 1e-12
+COHERENCES = ('u_mass', 'c_npmi')
+# criterion: whether larger scores are better
+CRITERIA = {'u_mass': True, 'c_npmi': True, 'perplexity': False}
+
+# bag-of-words data shared by worker processes; see _init_worker
+_shared = None
+
+
+class CooccurrenceIndex:
+    """ Document frequencies and document co-occurrences of terms.
+
+    Attributes:
+        occurrences (sp.csr_matrix): Whether a term (row) appears in a
+            document (column).
+        document_frequency (np.ndarray): Number of documents with a term.
+        n_docs (int): Number of documents.
+    """
+    def __init__(self, bow):
+        """
+        Args:
+            bow (sp.spmatrix): Term-document matrix, e.g.
+                `Corpus.ngrams_corpus.sparse`.
+        """
+        occurrences = sp.csr_matrix(bow, copy=True)
+        occurrences.eliminate_zeros()
+        occurrences.data = np.ones(len(occurrences.data), dtype=np.int32)
+        self.occurrences = occurrences
+        self.document_frequency = np.diff(occurrences.indptr)
+        self.n_docs = occurrences.shape[1]
+
+    def counts(self, ids):
+        """ Document frequencies of terms and numbers of documents with both
+        terms of every pair.
+
+        Args:
+            ids (np.ndarray): Term ids.
+
+        Returns:
+            tuple: Frequencies of shape (n,) and co-occurrences of shape (n, n).
+        """
+        rows = self.occurrences[ids]
+        return self.document_frequency[ids], (rows @ rows.T).toarray()
+
+    def coherence(self, top_words, measure='u_mass'):
+        """ Coherence of topics given by their top words.
+
+        UMass is the mean of log((D(w_i, w_j) + 1) / D(w_j)) over pairs of
+        top words where w_j is ranked above w_i; D is the number of documents
+        with the given words. NPMI is the mean normalized pointwise mutual
+        information of pairs with probabilities estimated from document
+        co-occurrences (not from sliding windows).
+
+        Args:
+            top_words (np.ndarray): Ids of top words of every topic ordered
+                by decreasing weight, shape (n_topics, n_words).
+            measure (str): 'u_mass' or 'c_npmi'.
+
+        Returns:
+            np.ndarray: Coherence of every topic.
+        """
+        if measure not in COHERENCES:
+            raise ValueError("{} is not a valid measure.".format(measure))
+        # co-occurrences of all top words are computed at once
+        ids, positions = np.unique(top_words, return_inverse=True)
+        positions = positions.reshape(top_words.shape)
+        df, co_df = self.counts(ids)
+        n_words = top_words.shape[1]
+        i, j = np.tril_indices(n_words, -1)   # w_j is ranked above w_i
+        pair_df = co_df[positions[:, i], positions[:, j]]
+        df_i, df_j = df[positions[:, i]], df[positions[:, j]]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            if measure == 'u_mass':
+                scores = np.log((pair_df + 1) / df_j)
+            else:
+                p_ij = pair_df / self.n_docs + EPSILON
+                pmi = np.log(p_ij * self.n_docs ** 2 / (df_i * df_j))
+                scores = pmi / -np.log(p_ij)
+        scores[~np.isfinite(scores)] = np.nan
+        return np.nanmean(scores, axis=1) if len(i) else \
+            np.full(len(top_words), np.nan)
+
+
+def perplexity(wrapper, bow_corpus):
+    """ Per-word perplexity of documents.
+
+    LDA uses gensim's variational bound. Other models with non-negative
+    weights estimate the probability of a word in a document with
+    normalized document-topic and topic-word weights. Perplexity is not
+    defined for models with negative weights (LSI) and it is nan.
+
+    Args:
+        wrapper (GensimWrapper): A fitted model.
+        bow_corpus (Sparse2CorpusSliceable): Documents, e.g. held-out ones.
+    """
+    model = wrapper.model
+    counts = sp.csc_matrix(bow_corpus.sparse)
+    if wrapper.has_negative_weights or not counts.sum():
+        return np.nan
+    if hasattr(model, 'log_perplexity'):
+        return float(np.exp2(-model.log_perplexity(list(bow_corpus))))
+
+    topics = model.get_topics()
+    doc_topic = matutils.corpus2dense(
+        model[bow_corpus], num_terms=len(topics), num_docs=counts.shape[1]).T
+    with np.errstate(divide='ignore', invalid='ignore'):
+        topics = topics / topics.sum(axis=1, keepdims=True)
+        doc_topic = doc_topic / doc_topic.sum(axis=1, keepdims=True)
+    terms = counts.indices
+    docs = np.repeat(np.arange(counts.shape[1]), np.diff(counts.indptr))
+    proba = np.einsum('ij,ji->i', np.nan_to_num(doc_topic[docs]),
+                      np.nan_to_num(topics[:, terms]))
+    log_likelihood = counts.data @ np.log(np.maximum(proba, EPSILON))
+    return float(np.exp(-log_likelihood / counts.data.sum()))
+
+
+def _init_worker(shared):
+    global _shared
+    _shared = shared
+
+
+def _fit(shared, wrapper, kwargs, num_topics):
+    train, _, id2word, _, n_words = shared
+    model = wrapper(num_topics=num_topics, **kwargs)
+    model._fit_bow(train, id2word)
+    model.n_words = n_words
+    return model
+
+
+def _score(shared, model, top_n):
+    _, test, _, index, _ = shared
+    top = model._topics_top(top_n)[2]
+    scores = [np.nanmean(index.coherence(top, measure))
+              for measure in COHERENCES]
+    return scores + [perplexity(model, test)]
+
+
+def _fit_and_score(wrapper, kwargs, num_topics, top_n):
+    """ Scores of a model fit in a worker; the model is not sent back """
+    model = _fit(_shared, wrapper, kwargs, num_topics)
+    return num_topics, _score(_shared, model, top_n)
+
+
+def _executor(n_jobs, shared):
+    # forking a process with running threads (Qt, BLAS) may deadlock
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context(
+        'forkserver' if 'forkserver' in methods else 'spawn')
+    return ProcessPoolExecutor(n_jobs, mp_context=context,
+                               initializer=_init_worker, initargs=(shared,))
+
+
+def select_num_topics(corpus, wrapper=LdaWrapper, num_topics=(5, 10, 20),
+                      criterion='c_npmi', holdout=0.1, top_n=10, n_jobs=None,
+                      random_state=0, on_progress=dummy_callback, **kwargs):
+    """ Train models for every number of topics and select the best one.
+
+    Args:
+        corpus (Corpus): A corpus to learn topics from.
+        wrapper (type): A GensimWrapper whose models take `num_topics`,
+            e.g. LdaWrapper or LsiWrapper.
+        num_topics (list of int): Numbers of topics to try.
+        criterion (str): Score used to select the best model: 'u_mass',
+            'c_npmi' (the larger the better) or 'perplexity' (the smaller
+            the better).
+        holdout (float): Proportion of documents excluded from training and
+            used to compute perplexity.
+        top_n (int): Number of top words of a topic used for coherence.
+        n_jobs (int): Number of processes; one process per number of topics
+            (at most the number of CPUs) if None. Models are trained in
+            this process if 1.
+        random_state (int): Seed for choosing held-out documents.
+        kwargs: Other arguments of the wrapper.
+
+    Returns:
+        tuple: A table with scores for every number of topics and the best
+        model, which can transform the corpus.
+    """
+    if criterion not in CRITERIA:
+        raise ValueError("{} is not a valid criterion.".format(criterion))
+    if criterion == 'perplexity' and wrapper.has_negative_weights:
+        raise ValueError("Perplexity is not defined for {}.".format(wrapper.name))
+    num_topics = sorted(set(num_topics))
+    if not num_topics or not len(corpus.dictionary):
+        return None, None
+
+    bow = corpus.ngrams_corpus.sparse
+    order = np.random.RandomState(random_state).permutation(bow.shape[1])
+    n_test = int(round(holdout * bow.shape[1]))
+    train = Sparse2CorpusSliceable(sp.csc_matrix(bow[:, np.sort(order[n_test:])]))
+    test = Sparse2CorpusSliceable(sp.csc_matrix(bow[:, np.sort(order[:n_test])]))
+    shared = (train, test, corpus.ngrams_dictionary,
+              CooccurrenceIndex(train.sparse), len(corpus.dictionary))
+
+    if n_jobs is None:
+        n_jobs = min(len(num_topics), os.cpu_count() or 1)
+    results, models = [], {}
+    if n_jobs == 1:
+        for k in num_topics:
+            models[k] = _fit(shared, wrapper, kwargs, k)
+            results.append((k, _score(shared, models[k], top_n)))
+            on_progress(len(results) / len(num_topics))
+    else:
+        with _executor(n_jobs, shared) as executor:
+            futures = [executor.submit(_fit_and_score, wrapper, kwargs, k, top_n)
+                       for k in num_topics]
+            for future in as_completed(futures):
+                results.append(future.result())
+                on_progress(len(results) / len(num_topics))
+    results.sort(key=lambda r: r[0])
+
+    scores = np.array([[k] + s for k, s in results], dtype=float)
+    column = scores[:, 1 + list(CRITERIA).index(criterion)]
+    if np.all(np.isnan(column)):
+        best = None
+    else:
+        k = results[int(np.nanargmax(column) if CRITERIA[criterion]
+                        else np.nanargmin(column))][0]
+        best = models[k] if k in models else _fit(shared, wrapper, kwargs, k)
+
+    domain = Domain([ContinuousVariable('Topics', number_of_decimals=0),
+                     ContinuousVariable('UMass coherence'),
+                     ContinuousVariable('NPMI coherence'),
+                     ContinuousVariable('Perplexity')])
+    table = Table.from_numpy(domain, scores)
+    table.name = 'Number of topics'
+    return table, best
@@ -1,7 +1,11 @@
 import inspect
+import json
+import os
 from collections import Counter
+from copy import deepcopy
 from warnings import warn
 
+import gensim
 from gensim import matutils
 import numpy as np
 from gensim.corpora import Dictionary
@@ -12,9 +16,11 @@ from Orange.data.table import Table
 from Orange.util import dummy_callback
 
 from orangecontrib.text.corpus import Corpus
-from orangecontrib.text.util import chunkable
+from orangecontrib.text.util import Sparse2CorpusSliceable, chunkable
 
 MAX_WORDS = 1000
+MANIFEST = 'manifest.json'
+FORMAT_VERSION = 1
 
 
 class Topic(Table):
@@ -57,12 +63,27 @@ class GensimProgressCallback(Metric):
         return self.epochs / model.passes
 
 
+def _wrapper_name(cls):
+    return '{}:{}'.format(cls.__module__, cls.__qualname__)
+
+
 class GensimWrapper:
     name = NotImplemented
     Model = NotImplemented
     num_topics = NotImplemented
     has_negative_weights = False    # whether words can negatively contribute
     # to a topic
+    supports_online = False     # whether partial_fit can update the model
+    supports_warm_start = False     # whether fit can start from another model
+    # parameters of a subclass' constructor that are not passed to the model;
+    # they are saved with the model
+    wrapper_params = ()
+    # wrapper classes by their names in the manifest of saved models
+    _wrappers = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        GensimWrapper._wrappers[_wrapper_name(cls)] = cls
 
     def __init__(self, **kwargs):
         for k, v in kwargs.items():
@@ -72,14 +93,19 @@ class GensimWrapper:
         self.topic_names = []
         self.n_words = 0
         self.doc_topic = None
+        self.doc_lengths = None
         self.tokens = None
         self.actual_topics = None
+        self._terms = None  # cached topic-word weights of the model
 
-    def fit(self, corpus, on_progress=dummy_callback, **kwargs):
+    def fit(self, corpus, on_progress=dummy_callback, warm_start=None, **kwargs):
         """ Train the model with the corpus.
 
         Args:
             corpus (Corpus): A corpus to learn topics from.
+            warm_start (GensimWrapper): A fitted model of the same type and
+                number of topics, e.g. fit on a slightly different corpus.
+                Training starts from its topics instead of a random state.
         """
         if "chunk_number" in kwargs:
             warn(
@@ -88,6 +114,21 @@ class GensimWrapper:
             )
         if not len(corpus.dictionary):
             return None
+        # the dictionary and the matrix are cached on the corpus; the dictionary
+        # is copied before the model extends it in partial_fit
+        self._fit_bow(corpus.ngrams_corpus, corpus.ngrams_dictionary,
+                      on_progress=on_progress, warm_start=warm_start)
+        self.n_words = len(corpus.dictionary)
+
+    def _fit_bow(self, bow_corpus, id2word, on_progress=dummy_callback,
+                 warm_start=None):
+        """ Train the model with documents in the bag-of-words format.
+
+        Args:
+            bow_corpus (Sparse2CorpusSliceable): Documents; term ids are
+                given by id2word.
+            id2word (Dictionary): An ngram to id mapper.
+        """
         model_kwars = self.kwargs
         if "callbacks" in inspect.getfullargspec(self.Model).args:
             # if method support callbacks use progress callback to report progress
@@ -96,13 +137,62 @@ class GensimWrapper:
                 model_kwars, callbacks=[GensimProgressCallback(on_progress)]
             )
 
-        id2word = Dictionary(corpus.ngrams_iterator(include_postags=True), prune_at=None)
-        self.model = self.Model(
-            corpus=corpus.ngrams_corpus, id2word=id2word, **model_kwars
-        )
-        self.n_words = len(corpus.dictionary)
+        if warm_start is not None:
+            if not self.supports_warm_start:
+                raise NotImplementedError(
+                    "{} does not support warm start.".format(self.name))
+            self.model = self.Model(id2word=id2word, **model_kwars)
+            self._warm_start(warm_start.model)
+            self.model.update(bow_corpus)
+        else:
+            self.model = self.Model(
+                corpus=bow_corpus, id2word=id2word, **model_kwars
+            )
+        self._terms = None
         self.topic_names = ['Topic {}'.format(i+1) for i in range(self.num_topics)]
 
+    def partial_fit(self, corpus, decay=None, on_progress=dummy_callback):
+        """ Update the fitted model with new documents without retraining on
+        documents it was already trained on. Words that the model has not
+        seen yet are added to its dictionary. A model is fit if there is none
+        yet.
+
+        Args:
+            corpus (Corpus): New documents.
+            decay (float): Weight of the existing model relatively to new
+                documents; model's default if None. For LDA it is the
+                exponent of the learning rate (in (0.5, 1]) and for LSI the
+                weight of existing observations (in [0, 1]).
+        """
+        if not self.supports_online:
+            raise NotImplementedError(
+                "{} does not support online updates.".format(self.name))
+        if self.model is None:
+            return self.fit(corpus, on_progress=on_progress)
+        if not len(corpus.dictionary):
+            return None
+        documents = list(corpus.ngrams_iterator(include_postags=True))
+        id2word = deepcopy(self.model.id2word)
+        id2word.add_documents(documents, prune_at=None)
+        self.model.id2word = id2word
+        self._extend_vocabulary(len(id2word))
+        self._update_model([id2word.doc2bow(doc) for doc in documents],
+                           decay, on_progress)
+        self._terms = None
+        self.n_words = len(id2word)
+
+    def _warm_start(self, model):
+        """ Initialize the untrained model from topics of another model. """
+        raise NotImplementedError
+
+    def _extend_vocabulary(self, num_terms):
+        """ Resize the model for words appended to its dictionary. """
+        raise NotImplementedError
+
+    def _update_model(self, bow_corpus, decay, on_progress):
+        """ Train the model on new documents in the bag-of-words format. """
+        raise NotImplementedError
+
     def dummy_method(self, *args, **kwargs):
         pass
 
@@ -119,6 +209,7 @@ class GensimWrapper:
         self.model = self.Model(corpus=corpus,
                                 id2word=self.id2word, **self.kwargs)
         self.Model.update = _update
+        self._terms = None
 
     @chunkable
     def update(self, documents):
@@ -126,39 +217,178 @@ class GensimWrapper:
             "update is deprecated and will be removed in orange3-text 1.7.",
             FutureWarning)
         self.model.update(documents)
+        self._terms = None
 
     def transform(self, corpus):
         """ Create a table with topics representation. """
-        topics = self.model[corpus.ngrams_corpus]
-        self.actual_topics = self.model.get_topics().shape[0]
-        matrix = matutils.corpus2dense(
-            topics, num_docs=len(corpus), num_terms=self.num_topics
-        ).T.astype(np.float64)
+        corpus = self._with_tokens(corpus)
+        self.actual_topics = len(self._topic_terms()[1])
+        self.doc_topic = self._infer(self._bow_corpus(corpus))
+        self.doc_lengths = np.fromiter((len(t) for t in corpus.tokens),
+                                       dtype=int, count=len(corpus))
+        return self.add_topics(corpus)
+
+    def _bow_corpus(self, corpus):
+        """ Documents of the corpus indexed by the model's dictionary. """
+        id2word = self.model.id2word
+        if corpus._cached_ngrams_dictionary() is id2word:
+            # the corpus the model was fit on (or its subset or copy)
+            return corpus.ngrams_corpus
+        # corpus's own ngrams are indexed by its dictionary which differs from
+        # the model's one for documents the model was not fit on
+        return Sparse2CorpusSliceable(matutils.corpus2csc(
+            (id2word.doc2bow(doc)
+             for doc in corpus.ngrams_iterator(include_postags=True)),
+            num_terms=len(id2word), num_docs=len(corpus), dtype=float))
+
+    def _infer(self, bow_corpus):
+        """ Topic weights of all documents at once, an array of shape
+        (n_docs, actual_topics).
+
+        Wrappers override it with a batched inference of their model; this
+        per-document transformation is only a fallback for models without
+        one. Weights are float64 and not float32: Orange stores attributes
+        in float64 arrays, so a float32 block would be copied by
+        `extend_attributes` instead of shared with the corpus. """
+        doc_topic = np.zeros((len(bow_corpus), self.actual_topics))
+        for i, topics in enumerate(self.model[bow_corpus]):
+            for topic, weight in topics:
+                if topic < self.actual_topics:
+                    doc_topic[i, topic] = weight
+        return doc_topic
+
+    @staticmethod
+    def _with_tokens(corpus):
+        """ The corpus with stored tokens; base tokens are computed at most
+        once. """
+        if corpus.has_tokens():
+            return corpus
+        corpus = corpus.copy()
+        corpus.store_tokens(*corpus._base_tokens())
+        return corpus
+
+    def add_topics(self, corpus):
+        """ Add topics of documents computed by the last transform (or
+        restored with the model) to the corpus. """
+        corpus = self._with_tokens(corpus)
+        # tokens and the dictionary are retained by extend_attributes; the
+        # document-topic matrix is shared with the corpus when it has no
+        # other attributes
         corpus = corpus.extend_attributes(
-            matrix[:, :self.actual_topics],
-            self.topic_names[:self.actual_topics]
+            self.doc_topic, self.topic_names[:self.actual_topics]
         )
-        self.doc_topic = matrix[:, :self.actual_topics]
         self.tokens = corpus.tokens
-        corpus.store_tokens(self.tokens)
         return corpus
 
+    def save(self, path):
+        """ Save the fitted model to a directory.
+
+        The gensim model is stored in its native format, the document-topic
+        matrix in .npy files and parameters of the wrapper in a JSON
+        manifest.
+
+        Args:
+            path (str): Path of the directory.
+        """
+        if self.model is None:
+            raise ValueError("Model is not fitted.")
+        os.makedirs(path, exist_ok=True)
+        # progress callbacks may not pickle and are useless after loading
+        callbacks = getattr(self.model, 'callbacks', None)
+        if callbacks is not None:
+            self.model.callbacks = None
+        try:
+            self.model.save(os.path.join(path, 'model'))
+        finally:
+            if callbacks is not None:
+                self.model.callbacks = callbacks
+        if self.doc_topic is not None:
+            np.save(os.path.join(path, 'doc_topic.npy'), self.doc_topic)
+            np.save(os.path.join(path, 'doc_lengths.npy'), self.doc_lengths)
+        manifest = {
+            'format': FORMAT_VERSION,
+            'wrapper': _wrapper_name(type(self)),
+            'gensim': gensim.__version__,
+            'kwargs': {k: np.dtype(v).name if k == 'dtype' else v
+                       for k, v in self.kwargs.items()},
+            'params': {k: getattr(self, k) for k in self.wrapper_params},
+            'topic_names': self.topic_names,
+            'n_words': self.n_words,
+            'actual_topics': self.actual_topics,
+        }
+        # the manifest is written last - a directory without it is incomplete
+        with open(os.path.join(path, MANIFEST), 'w') as f:
+            json.dump(manifest, f)
+
+    def restore(self, path):
+        """ Replace the model with the one saved to a directory; the model
+        must be saved by a wrapper of the same type.
+
+        Args:
+            path (str): Path of the directory.
+        """
+        with open(os.path.join(path, MANIFEST)) as f:
+            manifest = json.load(f)
+        if manifest['format'] != FORMAT_VERSION:
+            raise ValueError("Unsupported format {}.".format(manifest['format']))
+        if manifest['wrapper'] != _wrapper_name(type(self)):
+            raise ValueError("Model was saved by {}.".format(manifest['wrapper']))
+        kwargs = manifest['kwargs']
+        if 'dtype' in kwargs:
+            kwargs['dtype'] = np.dtype(kwargs['dtype']).type
+        GensimWrapper.__init__(self, **kwargs)
+        for k, v in manifest.get('params', {}).items():
+            if k in self.wrapper_params:
+                setattr(self, k, v)
+        self.model = self.Model.load(os.path.join(path, 'model'))
+        self.Model = type(self.model)
+        self.topic_names = manifest['topic_names']
+        self.n_words = manifest['n_words']
+        self.actual_topics = manifest['actual_topics']
+        if os.path.exists(os.path.join(path, 'doc_topic.npy')):
+            self.doc_topic = np.load(os.path.join(path, 'doc_topic.npy'))
+            self.doc_lengths = np.load(os.path.join(path, 'doc_lengths.npy'))
+
+    @staticmethod
+    def load(path):
+        """ Load a model saved with save.
+
+        Only models saved by known wrappers (subclasses of GensimWrapper) are
+        loaded; no module named in the manifest is imported.
+
+        Args:
+            path (str): Path of the directory.
+
+        Returns:
+            GensimWrapper: A wrapper of the type that saved the model.
+        """
+        with open(os.path.join(path, MANIFEST)) as f:
+            name = json.load(f)['wrapper']
+        wrapper = GensimWrapper._wrappers.get(name)
+        if wrapper is None:
+            raise ValueError("{} is not a topic model.".format(name))
+        model = wrapper.__new__(wrapper)
+        model.restore(path)
+        return model
+
     def fit_transform(self, corpus, **kwargs):
+        # tokens are stored before fitting so transform reuses ngrams
+        corpus = self._with_tokens(corpus)
         self.fit(corpus, **kwargs)
         return self.transform(corpus)
 
     def get_topics_table_by_id(self, topic_id):
         """ Transform topics from gensim model to table. """
-        words = self._topics_words(MAX_WORDS)
-        weights = self._topics_weights(MAX_WORDS)
-        if topic_id >= len(words):
+        words, weights, top = self._topic_terms()
+        if topic_id >= len(weights):
             raise ValueError("Too large topic ID.")
 
-        num_words = len(words[topic_id])
+        top = top[topic_id]
+        num_words = len(top)
 
         data = np.zeros((num_words, 2), dtype=object)
-        data[:, 0] = words[topic_id]
-        data[:, 1] = weights[topic_id]
+        data[:, 0] = words[top]
+        data[:, 1] = weights[topic_id, top]
 
         metas = [StringVariable(self.topic_names[topic_id]),
                  ContinuousVariable("Topic {} weights".format(topic_id + 1))]
@@ -183,24 +413,23 @@ class GensimWrapper:
         :return: np.array of marginal topic probabilities
         :return: number of tokens
         """
-        doc_length = [len(i) for i in tokens]
-        num_tokens = sum(doc_length)
-        doc_length[:] = [x / num_tokens for x in doc_length]
+        return GensimWrapper._marginal_probability_of_lengths(
+            np.array([len(i) for i in tokens]), doc_topic)
+
+    @staticmethod
+    def _marginal_probability_of_lengths(doc_lengths, doc_topic):
+        num_tokens = int(np.sum(doc_lengths))
+        doc_length = doc_lengths / num_tokens
         return np.reshape(np.sum(doc_topic.T * doc_length, axis=1), (-1, 1)),\
             num_tokens
 
     def get_all_topics_table(self):
         """ Transform all topics from gensim model to table. """
-        all_words = self._topics_words(self.n_words)
-        all_weights = self._topics_weights(self.n_words)
-        sorted_words = sorted(all_words[0])
-        n_topics = len(all_words)
-
-        X = []
-        for words, weights in zip(all_words, all_weights):
-            weights = [we for wo, we in sorted(zip(words, weights))]
-            X.append(weights)
-        X = np.array(X)
+        words, weights, _ = self._topic_terms()
+        order = np.argsort(words)
+        sorted_words = words[order]
+        X = weights[:, order]
+        n_topics = len(weights)
 
         # take only first n_topics; e.g. when user requested 10, but gensim
         # returns only 9 — when the rank is lower than num_topics requested
@@ -210,8 +439,8 @@ class GensimWrapper:
         metas = [StringVariable('Topics'),
                  ContinuousVariable('Marginal Topic Probability')]
 
-        marg_proba, num_tokens = self._marginal_probability(self.tokens,
-                                                            self.doc_topic)
+        marg_proba, num_tokens = self._marginal_probability_of_lengths(
+            self.doc_lengths, self.doc_topic)
         topic_proba = np.array(marg_proba, dtype=object)
 
         t = Topics.from_numpy(Domain(attrs, metas=metas), X=X,
@@ -231,17 +460,45 @@ class GensimWrapper:
             return [], []
         return topics[topic_id], weights[topic_id]
 
+    def _topic_terms(self):
+        """
+        Words, topic-word weights (topics x words) and indices of MAX_WORDS
+        top words of every topic ordered by decreasing weight. They are
+        computed from the topic-word matrix once per fitted model.
+        """
+        if self._terms is None:
+            weights = self.model.get_topics()
+            id2word = self.model.id2word
+            words = np.array([id2word[i] for i in range(weights.shape[1])],
+                             dtype=object)
+            self._terms = words, weights, self._top_words(weights, MAX_WORDS)
+        return self._terms
+
+    def _top_words(self, weights, num_of_words):
+        """ Indices of top words of every topic ordered by decreasing weight;
+        words with negative weights are ranked by the absolute weight. """
+        key = np.abs(weights) if self.has_negative_weights else weights
+        num_of_words = min(num_of_words, key.shape[1])
+        if num_of_words < key.shape[1]:
+            top = np.argpartition(-key, num_of_words - 1, axis=1)[:, :num_of_words]
+        else:
+            top = np.tile(np.arange(key.shape[1]), (len(key), 1))
+        order = np.argsort(-np.take_along_axis(key, top, axis=1), axis=1,
+                           kind='stable')
+        return np.take_along_axis(top, order, axis=1)
+
+    def _topics_top(self, num_of_words):
+        words, weights, top = self._topic_terms()
+        if num_of_words > top.shape[1]:
+            top = self._top_words(weights, num_of_words)
+        return words, weights, top[:, :num_of_words]
+
     def _topics_words(self, num_of_words):
         """ Returns list of list of topic words. """
-        x = self.model.show_topics(self.num_topics, num_of_words, formatted=False)
-        # `show_topics` method return a list of `(topic_number, topic)` tuples,
-        # where `topic` is a list of `(word, probability)` tuples.
-        return [[i[0] for i in topic[1]] for topic in x]
+        words, _, top = self._topics_top(num_of_words)
+        return [words[t].tolist() for t in top]
 
     def _topics_weights(self, num_of_words):
         """ Returns list of list of topic weights. """
-        topics = self.model.show_topics(self.num_topics, num_of_words,
-                                        formatted=False)
-        # `show_topics` method return a list of `(topic_number, topic)` tuples,
-        # where `topic` is a list of `(word, probability)` tuples.
-        return [[i[1] for i in t[1]] for t in topics]
+        _, weights, top = self._topics_top(num_of_words)
+        return np.take_along_axis(weights, top, axis=1).tolist()
@@ -1,6 +1,7 @@
+import hashlib
 from functools import wraps
 from math import ceil
-from typing import Union, List
+from typing import Union, List, Optional, Hashable, Sequence, Tuple
 
 import numpy as np
 import scipy.sparse as sp
@@ -89,3 +90,120 @@ class Sparse2CorpusSliceable(Sparse2Corpus):
         """
         sparse = self.sparse.__getitem__((slice(None, None, None), key))
         return Sparse2CorpusSliceable(sparse)
+
+
+def pack_chunks(
+    sizes: Union[List[float], np.ndarray],
+    max_chunk_size: float,
+    min_chunks: int = 1,
+) -> List[np.ndarray]:
+    """Split items into consecutive chunks by their sizes in a single pass.
+
+    The budget of a chunk is an equal share of the total size for
+    `min_chunks` chunks, but at most `max_chunk_size`. Items are added to a
+    chunk until its budget is exceeded; an item larger than the budget
+    forms a chunk of its own.
+
+    Parameters
+    ----------
+    sizes
+        Sizes of items (e.g. in bytes).
+    max_chunk_size
+        Maximal size of a chunk with more than one item.
+    min_chunks
+        Minimal number of chunks (when there are enough items).
+
+    Returns
+    -------
+    Indices of items in each chunk; concatenated they give all indices in
+    order.
+    """
+    sizes = np.asarray(sizes, dtype=float)
+    if not len(sizes):
+        return []
+    budget = min(max_chunk_size, sizes.sum() / min_chunks)
+    bounds = [0]
+    total = 0
+    for i, size in enumerate(sizes.tolist()):
+        if total + size > budget and i > bounds[-1]:
+            bounds.append(i)
+            total = 0
+        total += size
+    return np.split(np.arange(len(sizes)), bounds[1:])
+
+
+def server_cache_name(model_name: str, server_url: Optional[str]) -> str:
+    """Name under which results of a model on a server are cached.
+
+    Results of other servers (e.g. a local mock server) are cached apart
+    from results of the default server.
+
+    Parameters
+    ----------
+    model_name
+        Name of the model on the server.
+    server_url
+        Url of the server; None for the default server.
+
+    Returns
+    -------
+    Name of the cache.
+    """
+    if server_url is None:
+        return model_name
+    return '{}-{}'.format(
+        model_name, hashlib.md5(server_url.encode('utf-8')).hexdigest()[:8])
+
+
+def deduplicate(keys: Sequence[Hashable]) -> Tuple[List[int], List[int]]:
+    """Find unique items so that each of them is processed only once.
+
+    Parameters
+    ----------
+    keys
+        Hashable keys of items (e.g. texts).
+
+    Returns
+    -------
+    Indices of the first occurrence of every unique key and, for every
+    item, the index of its key among unique keys. Results for unique items
+    are scattered back with `expand_duplicates(results, inverse)`.
+    """
+    first, unique, inverse = {}, [], []
+    for i, key in enumerate(keys):
+        j = first.setdefault(key, len(unique))
+        if j == len(unique):
+            unique.append(i)
+        inverse.append(j)
+    return unique, inverse
+
+
+def expand_duplicates(
+    results: Sequence[Optional[List]], inverse: Sequence[int]
+) -> List[Optional[List]]:
+    """Scatter results of unique items back to all items.
+
+    Every repeated item gets its own copy of the result, so that results
+    of duplicates can be modified independently.
+
+    Parameters
+    ----------
+    results
+        Results (lists or None) of unique items.
+    inverse
+        Index of every item's key among unique keys, as returned by
+        `deduplicate`.
+
+    Returns
+    -------
+    Results of all items.
+    """
+    seen = set()
+    expanded = []
+    for j in inverse:
+        res = results[j]
+        if res is not None and j in seen:
+            res = list(res)
+        seen.add(j)
+        expanded.append(res)
+    return expanded
@@ -0,0 +1,162 @@
+"""This module contains an approximate nearest neighbour index for cosine
+similarity of embeddings.
+
+The index is an inverted file (IVF): vectors are clustered with spherical
+k-means and a query is compared only to vectors in the `n_probe` clusters
+whose centroids are the most similar to it. Arrays are stored as .npy files
+and memory-mapped when the index is loaded.
+
+    >>> index = IVFIndex(embeddings)
+    >>> index.save(path)
+    >>> ids, scores = IVFIndex.load(path).search(query, k=10)
+
+"""
+import os
+from typing import Optional, Tuple
+
+import numpy as np
+import scipy.sparse as sp
+
+DTYPE = np.float32
+# number of vectors assigned to centroids at once
+BLOCK_SIZE = 65536
+
+
+def normalize(x: np.ndarray) -> np.ndarray:
+    """Scale rows to unit length; zero rows stay zero."""
+    x = np.asarray(x, dtype=DTYPE)
+    norms = np.linalg.norm(x, axis=-1, keepdims=True)
+    return x / np.where(norms > 0, norms, 1)
+
+
+class IVFIndex:
+    """Inverted file index over L2-normalized vectors.
+
+    Attributes
+    ----------
+    centroids : np.ndarray
+        Unit centroids of clusters, shape (n_lists, dim).
+    vectors : np.ndarray
+        Unit vectors ordered by clusters, shape (n, dim).
+    ids : np.ndarray
+        Original index of every row of `vectors`.
+    offsets : np.ndarray
+        Vectors of cluster i are in rows offsets[i]:offsets[i + 1].
+    """
+    FILES = ('centroids', 'vectors', 'ids', 'offsets')
+
+    def __init__(self, vectors: Optional[np.ndarray] = None,
+                 n_lists: Optional[int] = None, n_iter: int = 10,
+                 seed: int = 0) -> None:
+        """
+        Parameters
+        ----------
+        vectors
+            Vectors to index, shape (n, dim).
+        n_lists
+            Number of clusters; sqrt(n) if None.
+        n_iter
+            Number of k-means iterations.
+        seed
+            Seed for choosing initial centroids.
+        """
+        self.centroids = self.vectors = self.ids = self.offsets = None
+        if vectors is not None:
+            self._build(normalize(vectors), n_lists, n_iter, seed)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _build(self, x, n_lists, n_iter, seed):
+        n = len(x)
+        if not n:
+            self.centroids, self.vectors = x, x
+            self.ids = np.zeros(0, dtype=np.int64)
+            self.offsets = np.zeros(1, dtype=np.int64)
+            return
+        n_lists = n_lists or max(1, int(np.sqrt(n)))
+        n_lists = max(1, min(n_lists, n))
+        rng = np.random.RandomState(seed)
+        # centroids are trained on a sample - the index only needs
+        # a coarse partition
+        sample = x[rng.choice(n, min(n, 256 * n_lists), replace=False)]
+        centroids = sample[rng.choice(len(sample), n_lists, replace=False)]
+        for _ in range(n_iter if n_lists > 1 else 0):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            membership = sp.csr_matrix(
+                (np.ones(len(sample), dtype=DTYPE),
+                 (labels, np.arange(len(sample)))),
+                shape=(n_lists, len(sample)))
+            sums = membership @ sample
+            nonempty = np.bincount(labels, minlength=n_lists) > 0
+            centroids[nonempty] = normalize(sums[nonempty])
+
+        labels = np.concatenate([
+            np.argmax(x[i:i + BLOCK_SIZE] @ centroids.T, axis=1)
+            for i in range(0, n, BLOCK_SIZE)
+        ]) if n_lists > 1 else np.zeros(n, dtype=np.int64)
+        order = np.argsort(labels, kind='stable')
+        self.centroids = centroids
+        self.vectors = x[order]
+        self.ids = order
+        self.offsets = np.concatenate(
+            ([0], np.cumsum(np.bincount(labels, minlength=n_lists))))
+
+    def search(self, queries: np.ndarray, k: int = 10, n_probe: int = 8) \
+            -> Tuple[np.ndarray, np.ndarray]:
+        """Find vectors most similar to queries.
+
+        Parameters
+        ----------
+        queries
+            A vector or a matrix of shape (n_queries, dim).
+        k
+            Number of neighbours of each query.
+        n_probe
+            Number of clusters searched; more is slower but more accurate.
+
+        Returns
+        -------
+        Ids and cosine similarities of neighbours, sorted by decreasing
+        similarity, shape (n_queries, k). When fewer than k vectors are
+        found, rows are padded with id -1 and similarity -inf.
+        """
+        single = np.ndim(queries) == 1
+        queries = normalize(np.atleast_2d(queries))
+        n_probe = min(n_probe, len(self.centroids))
+        ids = np.full((len(queries), k), -1, dtype=np.int64)
+        scores = np.full((len(queries), k), -np.inf, dtype=DTYPE)
+        if not len(self):
+            return (ids[0], scores[0]) if single else (ids, scores)
+        centroid_sims = queries @ self.centroids.T
+        for qi, (query, sims) in enumerate(zip(queries, centroid_sims)):
+            lists = np.argpartition(-sims, n_probe - 1)[:n_probe] \
+                if n_probe < len(sims) else np.arange(len(sims))
+            rows = np.concatenate([np.arange(self.offsets[c],
+                                             self.offsets[c + 1])
+                                   for c in lists])
+            similarities = self.vectors[rows] @ query
+            if len(rows) > k:
+                top = np.argpartition(-similarities, k - 1)[:k]
+            else:
+                top = np.arange(len(rows))
+            top = top[np.argsort(-similarities[top], kind='stable')]
+            ids[qi, :len(top)] = self.ids[rows[top]]
+            scores[qi, :len(top)] = similarities[top]
+        return (ids[0], scores[0]) if single else (ids, scores)
+
+    def save(self, path: str) -> None:
+        """Save the index to directory path."""
+        os.makedirs(path, exist_ok=True)
+        for name in self.FILES:
+            np.save(os.path.join(path, name + '.npy'), getattr(self, name))
+
+    @classmethod
+    def load(cls, path: str) -> "IVFIndex":
+        """Load the index saved to directory path; vectors are
+        memory-mapped."""
+        index = cls()
+        for name in cls.FILES:
+            setattr(index, name, np.load(os.path.join(path, name + '.npy'),
+                                         mmap_mode='r'))
+        return index
@@ -1,4 +1,5 @@
 import numpy as np
+import scipy.sparse as sp
 
 from Orange.data.util import SharedComputeValue
 from orangecontrib.text.util import Sparse2CorpusSliceable
@@ -38,16 +39,38 @@ class BaseVectorizer:
 
         feature_names = [dictionary[i] for i in order]
         corpus = corpus.extend_attributes(
-            X[:, order],
+            BaseVectorizer._permute_columns(X, order),
             feature_names=feature_names,
             var_attrs=variable_attrs,
             compute_values=compute_values,
             sparse=True,
-            rename_existing=True
+            rename_existing=True,
+            # Y, metas and W are left untouched - share them with the source
+            copy_arrays=False,
         )
         corpus.ngrams_corpus = Sparse2CorpusSliceable(X.T)
+        corpus.ngrams_dictionary = dictionary
         return corpus
 
+    @staticmethod
+    def _permute_columns(X, order):
+        """
+        Reorder columns of X such that the i-th column of the result is the
+        order[i]-th column of X. For sparse matrices only column indices are
+        remapped; data and indptr are shared with X.
+        """
+        if np.array_equal(order, np.arange(len(order))):
+            return X
+        if not sp.issparse(X):
+            return X[:, order]
+        X = X.tocsr()
+        inverse = np.empty_like(order)
+        inverse[order] = np.arange(len(order))
+        return sp.csr_matrix(
+            (X.data, inverse[X.indices].astype(X.indices.dtype), X.indptr),
+            shape=X.shape
+        )
+
 
 class SharedTransform:
     """ Shared computation for transforming new data sets.
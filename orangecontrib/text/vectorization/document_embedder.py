@@ -4,6 +4,7 @@ into a vector space.
 import zlib
 import base64
 import json
+import os
 import sys
 import warnings
 from typing import Tuple, Any, Optional, Union, List
@@ -11,6 +12,12 @@ import numpy as np
 
 from Orange.misc.server_embedder import ServerEmbedderCommunicator
 from orangecontrib.text import Corpus
+from orangecontrib.text.util import deduplicate, expand_duplicates, \
+    server_cache_name
+from orangecontrib.text.vectorization.embedding_store import EmbeddingStore, \
+    NoCache
+from orangecontrib.text.vectorization.word_vectors import LocalEmbedder, \
+    WordVectors
 
 
 AGGREGATORS = ['Mean', 'Sum', 'Max', 'Min']
@@ -65,6 +72,10 @@ class DocumentEmbedder:
         - Slovenian (sl)
         - German (de)
 
+    When `model_path` is given, embedding is performed locally with word
+    vectors from a fastText .vec or .bin file (e.g. cc.en.300.vec) instead.
+    Documents without any word in the model's vocabulary are skipped.
+
     Attributes
     ----------
     language : str
@@ -73,10 +84,20 @@ class DocumentEmbedder:
         Aggregator which creates document embedding (single
         vector) from word embeddings (multiple vectors).
         Allowed values are Mean, Sum, Max, Min.
+    model_path : str, optional
+        Path to local fastText word vectors. Use the server if None.
+    server_url : str, optional
+        Url of the embedding server (e.g. a local mock server). The default
+        server if None.
+    n_duplicates : int
+        Number of documents in the last call that were not embedded since
+        they are equal to another document.
     """
 
     def __init__(self, language: str = 'en',
-                 aggregator: str = 'Mean') -> None:
+                 aggregator: str = 'Mean',
+                 model_path: Optional[str] = None,
+                 server_url: Optional[str] = None) -> None:
         lang_error = '{} is not a valid language. Allowed values: {}'
         agg_error = '{} is not a valid aggregator. Allowed values: {}'
         if language.lower() not in LANGUAGES:
@@ -85,12 +106,25 @@ class DocumentEmbedder:
         if aggregator.lower() not in AGGREGATORS_L:
             raise ValueError(agg_error.format(aggregator, ', '.join(AGGREGATORS)))
         self.aggregator = aggregator.lower()
-
-        self._embedder = _ServerEmbedder(self.aggregator,
-                                         model_name='fasttext-'+self.language,
-                                         max_parallel_requests=100,
-                                         server_url='https://apiv2.garaza.io',
-                                         embedder_type='text')
+        self.model_path = model_path
+        self.n_duplicates = 0
+
+        if model_path is not None:
+            self._embedder = LocalEmbedder(WordVectors.load(model_path),
+                                           self.aggregator)
+            # local embedding is as fast as a lookup - do not store results
+            self._store = None
+        else:
+            model = 'fasttext-' + self.language
+            self._embedder = _ServerEmbedder(
+                self.aggregator,
+                model_name=model,
+                max_parallel_requests=100,
+                server_url=server_url or 'https://apiv2.garaza.io',
+                embedder_type='text'
+            )
+            self._store = EmbeddingStore.for_model('{}-{}'.format(
+                server_cache_name(model, server_url), self.aggregator))
 
     def __call__(
         self, corpus: Union[Corpus, List[List[str]]], processed_callback=None
@@ -116,9 +150,9 @@ class DocumentEmbedder:
         """
         if not isinstance(corpus, (Corpus, list)):
             raise ValueError("Input should be instance of Corpus or list.")
-        embs = self._embedder.embedd_data(
+        embs = self._embed(
             list(corpus.ngrams) if isinstance(corpus, Corpus) else corpus,
-            processed_callback=processed_callback)
+            processed_callback)
 
         if isinstance(corpus, list):
             return embs
@@ -163,7 +197,54 @@ class DocumentEmbedder:
 
         return new_corpus, skipped_corpus
 
-    def report(self) -> Tuple[Tuple[str, str], Tuple[str, str]]:
+    def _embed(
+        self, data: List[List[str]], processed_callback=None
+    ) -> List[Optional[List[float]]]:
+        """Embed each distinct document once; documents which are already
+        in the embedding store are not embedded again."""
+        keys = [json.dumps(list(doc)) for doc in data]
+        unique, inverse = deduplicate(keys)
+        self.n_duplicates = len(data) - len(unique)
+        counts = np.bincount(inverse, minlength=len(unique)).tolist()
+        if self._store is None:
+            embs = self._embedder.embedd_data(
+                [data[i] for i in unique],
+                processed_callback=_count_duplicates(
+                    processed_callback, counts))
+        else:
+            embs = self._embed_missing([data[i] for i in unique],
+                                       [keys[i] for i in unique],
+                                       counts, processed_callback)
+        return expand_duplicates(embs, inverse)
+
+    def _embed_missing(
+        self, data: List[List[str]], keys: List[str], counts: List[int],
+        processed_callback=None
+    ) -> List[Optional[List[float]]]:
+        """Embed documents missing in the store; progress of each document
+        is reported for each of its `counts` occurrences."""
+        embs = [None if emb is None else emb.tolist()
+                for emb in self._store.lookup(keys)]
+        missing = [i for i, emb in enumerate(embs) if emb is None]
+        if processed_callback:
+            for emb, count in zip(embs, counts):
+                if emb is not None:
+                    for _ in range(count):
+                        processed_callback(True)
+        if missing:
+            new_embs = self._embedder.embedd_data(
+                [data[i] for i in missing],
+                processed_callback=_count_duplicates(
+                    processed_callback, [counts[i] for i in missing]))
+            embedded = [(i, emb) for i, emb in zip(missing, new_embs)
+                        if emb is not None]
+            self._store.insert([keys[i] for i, _ in embedded],
+                               [emb for _, emb in embedded])
+            for i, emb in embedded:
+                embs[i] = emb
+        return embs
+
+    def report(self) -> Tuple[Tuple[str, str], ...]:
         """Reports on current parameters of DocumentEmbedder.
 
         Returns
@@ -171,8 +252,11 @@ class DocumentEmbedder:
         tuple
             Tuple of parameters.
         """
-        return (('Language', self.language),
-                ('Aggregator', self.aggregator))
+        report = (('Language', self.language),
+                  ('Aggregator', self.aggregator))
+        if self.model_path is not None:
+            report += (('Model', os.path.basename(self.model_path)),)
+        return report
 
     def set_cancelled(self):
         """Cancels current embedding process"""
@@ -183,6 +267,8 @@ class DocumentEmbedder:
         """Clears embedder cache"""
         if self._embedder:
             self._embedder.clear_cache()
+        if self._store is not None:
+            self._store.clear()
 
     def __enter__(self):
         return self
@@ -194,11 +280,30 @@ class DocumentEmbedder:
         self.__exit__(None, None, None)
 
 
+def _count_duplicates(processed_callback, counts):
+    """Wrap a callback called once for every processed distinct item so that
+    it is called for each of the item's `counts` occurrences.
+
+    Items are assumed to be reported in order; when they are embedded in
+    parallel, a count may belong to another item, but the total is exact."""
+    if not processed_callback or all(count == 1 for count in counts):
+        return processed_callback
+    counts = iter(counts)
+
+    def callback(success=True):
+        for _ in range(next(counts, 1)):
+            processed_callback(success)
+
+    return callback
+
+
 class _ServerEmbedder(ServerEmbedderCommunicator):
     def __init__(self, aggregator: str, *args, **kwargs) -> None:
         super().__init__(*args, **kwargs)
         self.content_type = 'application/json'
         self.aggregator = aggregator
+        # results are kept in the embedding store
+        self._cache = NoCache()
 
     async def _encode_data_instance(self, data_instance: Any) -> Optional[bytes]:
         data_string = json.dumps(list(data_instance))
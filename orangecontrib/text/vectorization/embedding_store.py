@@ -0,0 +1,332 @@
+"""This module contains a persistent, content-addressed store of embeddings
+shared by all embedders (DocumentEmbedder, SBERT, ontology, ...).
+
+Embeddings of each model are kept in an append-only float32 matrix on disk
+which is memory-mapped for reading. Rows are addressed by the MD5 hash of
+the embedded text, so unchanged documents are never embedded twice.
+
+    >>> store = EmbeddingStore.for_model('sbert')
+    >>> store.insert(['a text'], [np.ones(384)])
+    >>> store.lookup(['a text', 'another text'])
+    [array([1., 1., ...]), None]
+
+"""
+import hashlib
+import json
+import os
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Sequence, Union
+
+import numpy as np
+
+from Orange.misc.environ import cache_dir
+from Orange.misc.utils.embedder_utils import EmbedderCache
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+DTYPE = np.float32
+KEY_SIZE = 16  # bytes of MD5 digest
+
+
+def text_key(text: Union[str, bytes]) -> bytes:
+    """Key of a text in the store."""
+    if isinstance(text, str):
+        text = text.encode('utf-8', 'replace')
+    return hashlib.md5(text).digest()
+
+
+def _lock_file(f):
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+    else:
+        f.seek(0)
+        while True:
+            try:
+                # retries for 10 seconds before it raises
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                return
+            except OSError:
+                pass
+
+
+def _unlock_file(f):
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class EmbeddingStore:
+    """Persistent embedding store of a single model.
+
+    The store may be used by several processes (e.g. two Orange instances)
+    at once. Every operation holds an exclusive lock on the store's lock
+    file and first reloads the index if another process changed the files.
+
+    Attributes
+    ----------
+    model : str
+        Name of the model; embeddings of different models are kept apart.
+    max_size : int
+        Maximal number of stored embeddings. When exceeded, embeddings least
+        recently used in this session (or the oldest) are evicted.
+    """
+    DEFAULT_MAX_SIZE = 1000000
+    _stores: Dict[str, "EmbeddingStore"] = {}
+    _stores_lock = threading.Lock()
+
+    def __init__(self, model: str, max_size: int = DEFAULT_MAX_SIZE,
+                 path: Optional[str] = None) -> None:
+        self.model = model
+        self.max_size = max_size
+        self.path = path or os.path.join(
+            cache_dir(), 'embeddings', model.replace(os.sep, '_'))
+        self._lock = threading.RLock()
+        self._lock_file = None
+        self._lock_depth = 0
+        self._reset()
+        if os.path.exists(self._meta_path):
+            with self._locked():
+                pass
+
+    @classmethod
+    def for_model(cls, model: str) -> "EmbeddingStore":
+        """Return the store of the model shared within the process."""
+        with cls._stores_lock:
+            if model not in cls._stores:
+                cls._stores[model] = cls(model)
+            return cls._stores[model]
+
+    @property
+    def _vectors_path(self):
+        return os.path.join(self.path, 'vectors.bin')
+
+    @property
+    def _keys_path(self):
+        return os.path.join(self.path, 'keys.bin')
+
+    @property
+    def _meta_path(self):
+        return os.path.join(self.path, 'meta.json')
+
+    @property
+    def _lock_path(self):
+        return os.path.join(self.path, 'lock')
+
+    @contextmanager
+    def _locked(self):
+        """Hold the thread and the file lock and bring the index up to
+        date with the files."""
+        with self._lock:
+            if self._lock_depth == 0:
+                os.makedirs(self.path, exist_ok=True)
+                self._lock_file = open(self._lock_path, 'a+b')
+                _lock_file(self._lock_file)
+            self._lock_depth += 1
+            try:
+                if self._lock_depth == 1:
+                    self._refresh()
+                yield
+            finally:
+                self._lock_depth -= 1
+                if self._lock_depth == 0:
+                    _unlock_file(self._lock_file)
+                    self._lock_file.close()
+                    self._lock_file = None
+
+    def _files_state(self):
+        """Identity and size of the key file; it changes whenever any
+        process appends embeddings or rewrites the files."""
+        try:
+            stat = os.stat(self._keys_path)
+        except OSError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def _reset(self):
+        self.dim = None
+        self._index: Dict[bytes, int] = {}
+        self._vectors = None  # memory map of vectors
+        self._clock = 0
+        self._last_used = np.zeros(0, dtype=np.int64)
+        self._state = None
+
+    def _refresh(self):
+        if self._files_state() != self._state:
+            self._load()
+
+    def _load(self):
+        # embeddings used in this session remain recently used
+        old_index, old_last_used = self._index, self._last_used
+        clock = self._clock
+        self._reset()
+        self._clock = clock
+        if not os.path.exists(self._meta_path):
+            return
+        try:
+            with open(self._meta_path) as f:
+                self.dim = json.load(f)['dim']
+            with open(self._keys_path, 'rb') as f:
+                raw = f.read()
+            # vectors are written before keys, but the last row may be partial
+            n_vectors = os.path.getsize(self._vectors_path) \
+                // (self.dim * np.dtype(DTYPE).itemsize)
+        except (OSError, ValueError, KeyError):
+            self.clear()
+            return
+        n_keys = len(raw) // KEY_SIZE
+        if n_vectors > n_keys:
+            # interrupted while appending - drop vectors without a key
+            os.truncate(self._vectors_path, n_keys * self.dim
+                        * np.dtype(DTYPE).itemsize)
+        n = min(n_keys, n_vectors)
+        self._index = {raw[i * KEY_SIZE:(i + 1) * KEY_SIZE]: i
+                       for i in range(n)}
+        self._last_used = np.zeros(n, dtype=np.int64)
+        for key, i in self._index.items():
+            j = old_index.get(key)
+            if j is not None:
+                self._last_used[i] = old_last_used[j]
+        self._state = self._files_state()
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def _map(self):
+        n = len(self._last_used)
+        if self._vectors is None or len(self._vectors) != n:
+            self._vectors = np.memmap(self._vectors_path, dtype=DTYPE,
+                                      mode='r', shape=(n, self.dim)) \
+                if n else np.zeros((0, self.dim or 0), dtype=DTYPE)
+        return self._vectors
+
+    def lookup(self, texts: Sequence[Union[str, bytes]]) \
+            -> List[Optional[np.ndarray]]:
+        """Return stored embeddings of texts; None for missing texts."""
+        keys = [text_key(t) for t in texts]
+        if not self._index and not os.path.exists(self._meta_path):
+            return [None] * len(keys)
+        with self._locked():
+            rows = np.fromiter((self._index.get(k, -1) for k in keys),
+                               dtype=np.int64, count=len(keys))
+            found = np.flatnonzero(rows >= 0)
+            result = [None] * len(keys)
+            if len(found):
+                self._clock += 1
+                self._last_used[rows[found]] = self._clock
+                vectors = np.asarray(self._map()[rows[found]], dtype=float)
+                for i, v in zip(found, vectors):
+                    result[i] = v
+            return result
+
+    def insert(self, texts: Sequence[Union[str, bytes]],
+               embeddings: Sequence[np.ndarray]) -> None:
+        """Store embeddings of texts; texts already in the store are skipped.
+
+        Raises
+        ------
+        ValueError
+            If the embedding dimension differs from stored embeddings.
+        """
+        with self._locked():
+            new_keys, new_rows, seen = [], [], set()
+            for text, emb in zip(texts, embeddings):
+                key = text_key(text)
+                if key not in self._index and key not in seen:
+                    seen.add(key)
+                    new_keys.append(key)
+                    new_rows.append(emb)
+            if not new_keys:
+                return
+            vectors = np.array(new_rows, dtype=DTYPE)
+            if vectors.ndim != 2:
+                raise ValueError('Embeddings must be vectors of equal length.')
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+                with open(self._meta_path, 'w') as f:
+                    json.dump({'dim': self.dim}, f)
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(
+                    'Embedding dimension {} does not match the store ({}).'
+                    .format(vectors.shape[1], self.dim))
+
+            # rows are appended after rows of all keys in the (reloaded)
+            # key file; drop vectors of an interrupted append first
+            start = len(self._last_used)
+            row_size = self.dim * np.dtype(DTYPE).itemsize
+            if os.path.exists(self._vectors_path) and \
+                    os.path.getsize(self._vectors_path) != start * row_size:
+                os.truncate(self._vectors_path, start * row_size)
+            with open(self._vectors_path, 'ab') as f:
+                f.write(vectors.tobytes())
+            with open(self._keys_path, 'ab') as f:
+                f.write(b''.join(new_keys))
+            self._clock += 1
+            self._index.update((k, start + i) for i, k in enumerate(new_keys))
+            self._last_used = np.concatenate(
+                (self._last_used, np.full(len(new_keys), self._clock)))
+            self._state = self._files_state()
+            if len(self._last_used) > self.max_size:
+                self._evict()
+
+    def _evict(self):
+        """Keep the most recently used 3/4 of max_size embeddings. Called
+        with the lock held."""
+        n_keep = max(self.max_size * 3 // 4, 1)
+        keep = np.sort(np.argsort(self._last_used, kind='stable')[-n_keep:])
+        keys = [None] * len(self._last_used)
+        for k, i in self._index.items():
+            keys[i] = k
+        vectors = np.array(self._map()[keep])
+        self._vectors = None
+        for path, content in ((self._vectors_path, vectors.tobytes()),
+                              (self._keys_path,
+                               b''.join(keys[i] for i in keep))):
+            with open(path + '.tmp', 'wb') as f:
+                f.write(content)
+            os.replace(path + '.tmp', path)
+        self._index = {keys[i]: j for j, i in enumerate(keep)}
+        self._last_used = self._last_used[keep]
+        self._state = self._files_state()
+
+    def clear(self) -> None:
+        """Remove all embeddings of the model."""
+        with self._lock:
+            if not os.path.exists(self.path):
+                self._reset()
+                return
+            with self._locked():
+                self._vectors = None
+                for path in (self._vectors_path, self._keys_path,
+                             self._meta_path):
+                    if os.path.exists(path):
+                        os.remove(path)
+                self._reset()
+
+
+class NoCache(EmbedderCache):
+    """Cache of a server communicator which keeps nothing.
+
+    Communicators of embedders get this cache since their results are kept
+    in an EmbeddingStore; Orange's per-model cache would store (and write to
+    disk) every result again.
+    """
+    # pylint: disable=super-init-not-called
+    def __init__(self) -> None:
+        self._cache_file_path = None
+        self._cache_dict = {}
+
+    def persist_cache(self) -> None:
+        pass
+
+    def get_cached_result_or_none(self, cache_key):
+        return None
+
+    def add(self, cache_key, value) -> None:
+        pass
@@ -0,0 +1,248 @@
+""" Near-duplicate detection with locality sensitive hashing (LSH).
+
+Documents are represented by simhash fingerprints which are split into bands.
+Two documents whose fingerprints differ in at most `threshold` bits are
+guaranteed to agree on at least one of `threshold + 1` bands, so only
+documents sharing a band are compared. Detection thus takes roughly linear
+time instead of computing all pairwise distances.
+
+    >>> from orangecontrib.text import Corpus
+    >>> from orangecontrib.text.vectorization.near_duplicates import \\
+    ...     NearDuplicateIndex
+    >>> corpus = Corpus.from_file('book-excerpts')
+    >>> index = NearDuplicateIndex(threshold=3)
+    >>> index.add(corpus.tokens)
+    >>> clusters = index.clusters()
+    >>> unique = index.without_duplicates(corpus, clusters)
+
+"""
+import numpy as np
+import scipy.sparse as sp
+from scipy.cluster.hierarchy import fcluster, linkage
+from scipy.sparse.csgraph import connected_components
+from scipy.spatial.distance import squareform
+
+from Orange.data import DiscreteVariable, Domain
+
+from orangecontrib.text.vectorization.simhash import SimhashVectorizer, \
+    WORD_BITS, hamming_distance, hamming_distances, _mix
+
+CLUSTER_VARIABLE = 'Duplicates Cluster'
+
+
+class NearDuplicateIndex:
+    """
+    Incremental LSH index over banded simhash fingerprints.
+
+    Documents within `threshold` bits of each other are near-duplicates.
+    With single linkage, clusters are closed under this relation, which
+    matches single-linkage clustering in the Duplicate Detection widget.
+    With other linkages, every single-linkage cluster is further clustered
+    hierarchically and cut at `threshold`; the result equals clustering of
+    all documents since such clusters never span two single-linkage clusters.
+    """
+    LINKAGES = ('single', 'average', 'complete', 'weighted')
+
+    def __init__(self, threshold=3, vectorizer=None, bands=None,
+                 linkage='single'):
+        """
+        Args:
+            threshold (int): Maximal Hamming distance (in bits) between
+                fingerprints of near-duplicate documents.
+            vectorizer (SimhashVectorizer): Vectorizer computing fingerprints.
+                Default SimhashVectorizer(fast=True) if None.
+            bands (int): Number of bands fingerprints are split in. Must be
+                greater than threshold for exact detection; threshold + 1
+                if None.
+            linkage (str): 'single', 'average', 'complete' or 'weighted'.
+        """
+        if linkage not in self.LINKAGES:
+            raise ValueError("{} is not a valid linkage.".format(linkage))
+        self.vectorizer = vectorizer or SimhashVectorizer(fast=True)
+        self.threshold = threshold
+        self.linkage = linkage
+        self.bands = threshold + 1 if bands is None else bands
+        f = self.vectorizer.f
+        if not 0 < self.bands <= f:
+            raise ValueError("Number of bands must be between 1 and {}."
+                             .format(f))
+
+        bounds = np.linspace(0, f, self.bands + 1).astype(int)
+        self._bands = list(zip(bounds[:-1], bounds[1:]))
+        self._tables = [{} for _ in self._bands]    # band key -> doc ids
+        self._exact = {}        # fingerprint -> first document with it
+        self._fingerprints = np.zeros((0, -(-f // WORD_BITS)), dtype=np.uint64)
+        self._pairs = []        # arrays of pairs of near-duplicates
+
+    def __len__(self):
+        return len(self._fingerprints)
+
+    @property
+    def fingerprints(self):
+        """ np.ndarray: Packed fingerprints of indexed documents. """
+        return self._fingerprints
+
+    def add(self, tokens):
+        """
+        Add documents to the index.
+
+        Args:
+            tokens (list): List of lists containing tokens.
+        """
+        self.add_fingerprints(self.vectorizer.fingerprints(tokens))
+
+    def add_fingerprints(self, fingerprints):
+        """
+        Add documents represented by packed simhash fingerprints computed with
+        `vectorizer.fingerprints`. Documents get consecutive indices.
+        """
+        start = len(self)
+        self._fingerprints = np.vstack((self._fingerprints, fingerprints))
+        keys = [self._band_keys(fingerprints, lo, hi)
+                for lo, hi in self._bands]
+
+        exact_pairs = []
+        for i, fp in enumerate(fingerprints, start=start):
+            exact = self._exact.setdefault(fp.tobytes(), i)
+            if exact != i:
+                # neighbours of identical documents are the same - skip bands
+                exact_pairs.append((i, exact))
+                continue
+            candidates = set()
+            for table, band_keys in zip(self._tables, keys):
+                bucket = table.setdefault(band_keys[i - start], [])
+                candidates.update(bucket)
+                bucket.append(i)
+            if candidates:
+                self._join_close(i, np.fromiter(candidates, dtype=np.int64))
+        if exact_pairs:
+            self._pairs.append(np.array(exact_pairs, dtype=np.int64))
+
+    def _join_close(self, i, candidates):
+        distances = hamming_distance(self._fingerprints[i],
+                                     self._fingerprints[candidates])
+        close = candidates[distances <= self.threshold]
+        if len(close):
+            self._pairs.append(
+                np.column_stack((np.full(len(close), i), close)))
+
+    @staticmethod
+    def _band_keys(fingerprints, lo, hi):
+        """ Hash of bits lo:hi of every fingerprint. """
+        keys = np.zeros(len(fingerprints), dtype=np.uint64)
+        for w in range(lo // WORD_BITS, (hi - 1) // WORD_BITS + 1):
+            first = max(lo - w * WORD_BITS, 0)
+            last = min(hi - w * WORD_BITS, WORD_BITS)
+            mask = np.uint64((1 << (last - first)) - 1)
+            piece = (fingerprints[:, w] >> np.uint64(first)) & mask
+            keys = _mix(keys ^ piece, w)
+        return keys.tolist()
+
+    def _split(self, labels):
+        """ Cluster members of every single-linkage cluster with the
+        selected linkage and cut the dendrogram at the threshold. """
+        order = np.argsort(labels, kind='stable')
+        bounds = np.flatnonzero(np.diff(labels[order])) + 1
+        new_labels = np.empty_like(labels)
+        n_clusters = 0
+        for members in np.split(order, bounds):
+            if len(members) > 1:
+                distances = hamming_distances(self._fingerprints[members])
+                tree = linkage(squareform(distances, checks=False),
+                               self.linkage)
+                sub = fcluster(tree, self.threshold, 'distance') - 1
+            else:
+                sub = np.zeros(1, dtype=int)
+            new_labels[members] = n_clusters + sub
+            n_clusters += sub.max() + 1
+        return new_labels
+
+    def clusters(self):
+        """
+        Cluster index for every document. Clusters are numbered in order of
+        their first document.
+
+        Returns:
+            np.ndarray: 1D array of clusters
+        """
+        n = len(self)
+        pairs = np.vstack(self._pairs) if self._pairs \
+            else np.zeros((0, 2), dtype=np.int64)
+        graph = sp.coo_matrix(
+            (np.ones(len(pairs), dtype=bool), (pairs[:, 0], pairs[:, 1])),
+            shape=(n, n))
+        _, labels = connected_components(graph, directed=False)
+        if self.linkage != 'single' and len(pairs):
+            labels = self._split(labels)
+        _, first, inverse = np.unique(labels, return_index=True,
+                                      return_inverse=True)
+        rank = np.empty(len(first), dtype=int)
+        rank[np.argsort(first)] = np.arange(len(first))
+        return rank[inverse]
+
+    @property
+    def n_unique(self):
+        """ int: Number of clusters. """
+        return len(np.unique(self.clusters()))
+
+    @property
+    def n_duplicates(self):
+        """ int: Number of documents that duplicate another document. """
+        return len(self) - self.n_unique
+
+    def annotate(self, corpus, clusters=None):
+        """
+        Add a meta attribute with clusters of documents ('C0', 'C1', ...) as
+        the Duplicate Detection widget does.
+
+        Args:
+            corpus (Corpus): Indexed documents in the order they were added.
+            clusters (np.ndarray): Result of `clusters()`; computed if None.
+
+        Returns:
+            Corpus: A corpus with the 'Duplicates Cluster' meta attribute.
+        """
+        clusters = self.clusters() if clusters is None else clusters
+        cluster_var = DiscreteVariable(
+            CLUSTER_VARIABLE,
+            values=['C{}'.format(i) for i in range(clusters.max(initial=-1) + 1)])
+        d = corpus.domain
+        domain = Domain(d.attributes, d.class_vars, d.metas + (cluster_var,))
+        corpus = corpus.transform(domain)
+        with corpus.unlocked(corpus.metas):
+            corpus.get_column_view(cluster_var)[0][:] = clusters
+        return corpus
+
+    def without_duplicates(self, corpus, clusters=None):
+        """
+        The first document of every cluster.
+
+        Args:
+            corpus (Corpus): Indexed documents in the order they were added.
+            clusters (np.ndarray): Result of `clusters()`; computed if None.
+
+        Returns:
+            Corpus: Documents without duplicates.
+        """
+        clusters = self.clusters() if clusters is None else clusters
+        _, first = np.unique(clusters, return_index=True)
+        c = corpus[np.sort(first)]
+        c.name = '{} (Without Duplicates)'.format(corpus.name)
+        return c
+
+    def duplicates(self, corpus, cluster, clusters=None):
+        """
+        Documents of a cluster.
+
+        Args:
+            corpus (Corpus): Indexed documents in the order they were added.
+            cluster (int): Index of a cluster.
+            clusters (np.ndarray): Result of `clusters()`; computed if None.
+
+        Returns:
+            Corpus: Documents of the cluster.
+        """
+        clusters = self.clusters() if clusters is None else clusters
+        c = corpus[np.flatnonzero(clusters == cluster)]
+        c.name = '{} C{}'.format(CLUSTER_VARIABLE, cluster)
+        return c
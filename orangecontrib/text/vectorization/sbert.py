@@ -1,14 +1,18 @@
 import json
 import base64
 import zlib
-import sys
-from typing import Any, List, Optional, Callable
+from typing import Any, List, Optional, Callable, Tuple
 
 import numpy as np
 
 from Orange.misc.server_embedder import ServerEmbedderCommunicator
 from Orange.util import dummy_callback
 
+from orangecontrib.text.util import deduplicate, expand_duplicates, \
+    pack_chunks, server_cache_name
+from orangecontrib.text.vectorization.embedding_store import EmbeddingStore, \
+    NoCache
+
 # maximum document size that we still send to the server
 MAX_PACKAGE_SIZE = 3000000
 # maximum size of a chunk - when one document is longer send is as a chunk with
@@ -16,16 +20,28 @@ MAX_PACKAGE_SIZE = 3000000
 MAX_CHUNK_SIZE = 50000
 MIN_CHUNKS = 20
 EMB_DIM = 384
+SERVER_URL = 'https://apiv2.garaza.io'
 
 
 class SBERT:
-    def __init__(self) -> None:
+    def __init__(self, server_url: Optional[str] = None) -> None:
+        """
+        Parameters
+        ----------
+        server_url
+            Url of the server (e.g. a local mock server). The default server
+            if None.
+        """
         self._server_communicator = _ServerCommunicator(
             model_name='sbert',
             max_parallel_requests=100,
-            server_url='https://apiv2.garaza.io',
+            server_url=server_url or SERVER_URL,
             embedder_type='text',
         )
+        self._store = EmbeddingStore.for_model(
+            server_cache_name('sbert', server_url))
+        # number of texts in the last call equal to another text
+        self.n_duplicates = 0
 
     def __call__(
         self, texts: List[str], callback: Callable = dummy_callback
@@ -45,64 +61,52 @@ class SBERT:
         if len(texts) == 0:
             return []
 
-        skipped = list()
-
-        encoded_texts = list()
-        sizes = list()
-        chunks = list()
-        for i, text in enumerate(texts):
-            encoded = base64.b64encode(zlib.compress(
-                text.encode('utf-8', 'replace'), level=-1)
-            ).decode('utf-8', 'replace')
-            size = sys.getsizeof(encoded)
-            if size > MAX_PACKAGE_SIZE:
-                skipped.append(i)
-                continue
-            encoded_texts.append(encoded)
-            sizes.append(size)
-
-        chunks = self._make_chunks(encoded_texts, sizes)
-
-        result_ = self._server_communicator.embedd_data(chunks, callback=callback)
-        if result_ is None:
-            return [None] * len(texts)
-
-        result = list()
-        assert len(result_) == len(chunks)
-        for res_chunk, orig_chunk in zip(result_, chunks):
-            if res_chunk is None:
-                # when embedder fails (Timeout or other error) result will be None
-                result.extend([None] * len(orig_chunk))
-            else:
-                result.extend(res_chunk)
-
-        results = list()
-        idx = 0
-        for i in range(len(texts)):
-            if i in skipped:
-                results.append(None)
-            else:
-                results.append(result[idx])
-                idx += 1
-
+        unique, inverse = deduplicate(texts)
+        self.n_duplicates = len(texts) - len(unique)
+        texts = [texts[i] for i in unique]
+        embeddings = [None if emb is None else emb.tolist()
+                      for emb in self._store.lookup(texts)]
+        missing = [i for i, emb in enumerate(embeddings) if emb is None]
+        if missing:
+            new_embeddings = self._embed([texts[i] for i in missing], callback)
+            embedded = [(i, emb) for i, emb in zip(missing, new_embeddings)
+                        if emb is not None]
+            self._store.insert([texts[i] for i, _ in embedded],
+                               [emb for _, emb in embedded])
+            for i, emb in embedded:
+                embeddings[i] = emb
+        return expand_duplicates(embeddings, inverse)
+
+    def _embed(
+        self, texts: List[str], callback: Callable
+    ) -> List[Optional[List[float]]]:
+        encoded, chunks = _make_chunks(texts)
+        # texts are compressed by the communicator's workers while other
+        # chunks are already being embedded
+        result = self._server_communicator.embedd_data(
+            [[encoded[i] for i in chunk] for chunk in chunks],
+            callback=callback
+        )
+        results = [None] * len(texts)
+        if result is None:
+            return results
+
+        assert len(result) == len(chunks)
+        for res_chunk, chunk in zip(result, chunks):
+            # when embedder fails (Timeout or other error) result will be None
+            if res_chunk is not None:
+                for i, emb in zip(chunk.tolist(), res_chunk):
+                    results[i] = emb
         return results
 
-    def _make_chunks(self, encoded_texts, sizes, depth=0):
-        chunks = np.array_split(encoded_texts, MIN_CHUNKS if depth == 0 else 2)
-        chunk_sizes = np.array_split(sizes, MIN_CHUNKS if depth == 0 else 2)
-        result = list()
-        for i in range(len(chunks)):
-            # checking that more than one text in chunk prevent recursion to infinity
-            # when one text is bigger than MAX_CHUNK_SIZE
-            if len(chunks[i]) > 1 and np.sum(chunk_sizes[i]) > MAX_CHUNK_SIZE:
-                result.extend(self._make_chunks(chunks[i], chunk_sizes[i], depth + 1))
-            else:
-                result.append(chunks[i])
-        return [list(r) for r in result if len(r) > 0]
+    def set_cancelled(self):
+        if hasattr(self, '_server_communicator'):
+            self._server_communicator.set_cancelled()
 
     def clear_cache(self):
         if self._server_communicator:
             self._server_communicator.clear_cache()
+        self._store.clear()
 
     def __enter__(self):
         return self
@@ -113,6 +117,43 @@ class _ServerCommunicator(ServerEmbedderCommunicator):
     def __init__(self, *args, **kwargs) -> None:
         super().__init__(*args, **kwargs)
         self.content_type = 'application/json'
+        # results are kept in the embedding store
+        self._cache = NoCache()
 
     async def _encode_data_instance(self, data_instance: Any) -> Optional[bytes]:
-        return json.dumps(data_instance).encode('utf-8', 'replace')
+        return json.dumps(
+            [encode_text(text) for text in data_instance]
+        ).encode('utf-8', 'replace')
+
+
+def encode_text(text: bytes) -> str:
+    """Compress and base64-encode an UTF-8 encoded text for the server."""
+    return base64.b64encode(zlib.compress(text, level=-1)).decode('ascii')
+
+
+def _max_encoded_size(size: int) -> int:
+    """Upper bound of the size of encode_text's result for a text of size
+    bytes; zlib adds at most a few bytes per 16 kB block."""
+    return 4 * ((size + size // 1000 + 64) // 3 + 1)
+
+
+def _make_chunks(texts: List[str]) -> Tuple[List[bytes], List[np.ndarray]]:
+    """Encode texts to UTF-8 and pack them into chunks that are sent to the
+    server in separate requests.
+
+    Texts are packed by their size in a single pass. Texts whose encoded
+    size exceeds MAX_PACKAGE_SIZE are left out; compressing is postponed
+    to sending except for texts that may be too large.
+
+    Returns
+    -------
+    UTF-8 encoded texts and indices of texts in every chunk.
+    """
+    encoded = [text.encode('utf-8', 'replace') for text in texts]
+    sizes = np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded))
+    keep = np.ones(len(encoded), dtype=bool)
+    for i in np.flatnonzero(_max_encoded_size(sizes) > MAX_PACKAGE_SIZE):
+        keep[i] = len(encode_text(encoded[i])) <= MAX_PACKAGE_SIZE
+    kept = np.flatnonzero(keep)
+    chunks = pack_chunks(sizes[kept], MAX_CHUNK_SIZE, MIN_CHUNKS)
+    return encoded, [kept[chunk] for chunk in chunks]
@@ -2,25 +2,173 @@ import nltk
 from simhash import Simhash
 import numpy as np
 
+from Orange.data import StringVariable
+from Orange.data.util import get_unique_names
+
 from orangecontrib.text.vectorization.base import BaseVectorizer
 
+WORD_BITS = 64
+# name of the meta variable with packed fingerprints
+FINGERPRINT_VAR = 'Simhash'
+FNV_OFFSET = np.uint64(0xcbf29ce484222325)
+FNV_PRIME = np.uint64(0x100000001b3)
+_MASK64 = (1 << WORD_BITS) - 1
+# number of set bits for every byte value
+_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def _fnv1a(strings):
+    """ Vectorized 64-bit FNV-1a hash of a list of strings. """
+    h = np.full(len(strings), FNV_OFFSET, dtype=np.uint64)
+    if not len(strings):
+        return h
+    data = np.array([s.encode('utf-8') for s in strings], dtype=bytes)
+    lengths = np.char.str_len(data)
+    octets = data.view(np.uint8).reshape(len(data), data.itemsize)
+    for j in range(data.itemsize):
+        h = np.where(j < lengths, (h ^ octets[:, j]) * FNV_PRIME, h)
+    return h
+
+
+def _mix(h, seed):
+    """ SplitMix64 finalizer; derives an independent 64-bit hash per seed. """
+    z = h + np.uint64((seed * 0x9e3779b97f4a7c15) & _MASK64)
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xbf58476d1ce4e5b9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94d049bb133111eb)
+    return z ^ (z >> np.uint64(31))
+
+
+def n_words(f):
+    """ Number of uint64 words needed to store an f-bit fingerprint. """
+    return -(-f // WORD_BITS)
+
+
+def int2words(value, f):
+    """ Split a Python integer fingerprint into uint64 words (low bits first). """
+    return np.array([(value >> (WORD_BITS * w)) & _MASK64
+                     for w in range(n_words(f))], dtype=np.uint64)
+
+
+def fingerprints_to_strings(fingerprints):
+    """
+    Encode packed fingerprints as hexadecimal strings, most significant word
+    first, so they can be stored in a table without loss.
+    """
+    words = np.ascontiguousarray(fingerprints[:, ::-1], dtype='>u8')
+    data = words.view(np.uint8).reshape(len(words), -1)
+    return np.array([row.tobytes().hex() for row in data], dtype=object)
+
+
+def strings_to_fingerprints(strings, f):
+    """ Decode fingerprints encoded by `fingerprints_to_strings`. """
+    data = b''.join(bytes.fromhex(s) for s in strings)
+    words = np.frombuffer(data, dtype='>u8').reshape(len(strings), n_words(f))
+    return words[:, ::-1].astype(np.uint64)
+
+
+def corpus_fingerprints(corpus):
+    """
+    Packed fingerprints stored in a corpus by `SimhashVectorizer`.
+
+    Args:
+        corpus (Corpus): Output of `SimhashVectorizer.transform`.
+
+    Returns:
+        np.ndarray: uint64 array of shape (len(corpus), ceil(f / 64))
+
+    Raises:
+        ValueError: if the corpus has no fingerprints.
+    """
+    variables = [var for var in corpus.domain.metas
+                 if 'simhash-bits' in var.attributes]
+    if not variables:
+        raise ValueError("Corpus has no simhash fingerprints.")
+    var = variables[-1]
+    strings = corpus.get_column_view(var)[0]
+    return strings_to_fingerprints(strings, var.attributes['simhash-bits'])
+
+
+def unpack_fingerprints(fingerprints, f):
+    """
+    Expand packed fingerprints into a binary matrix.
+
+    Args:
+        fingerprints (np.ndarray): uint64 array of shape (n, ceil(f / 64))
+        f (int): length of fingerprints in bits
+
+    Returns:
+        float array of shape (n, f) with the most significant bit first
+    """
+    bits = np.arange(f)[::-1]
+    words = fingerprints[:, bits // WORD_BITS]
+    shifts = (bits % WORD_BITS).astype(np.uint64)
+    return ((words >> shifts) & np.uint64(1)).astype(float)
+
+
+def hamming_distance(a, b):
+    """
+    Number of differing bits between packed fingerprints. Arrays are
+    broadcast against each other; the last axis holds fingerprint words.
+    """
+    x = np.ascontiguousarray(np.bitwise_xor(a, b), dtype=np.uint64)
+    counts = _POPCOUNT[x.view(np.uint8)]
+    return counts.reshape(x.shape[:-1] + (-1,)).sum(axis=-1, dtype=np.int64)
+
+
+def hamming_distances(fp1, fp2=None, max_block_size=2 ** 24):
+    """
+    Pairwise Hamming distances between two sets of packed fingerprints.
+
+    Args:
+        fp1 (np.ndarray): uint64 array of shape (n1, words)
+        fp2 (np.ndarray): uint64 array of shape (n2, words); fp1 if None
+        max_block_size (int): maximal number of words processed at once
+
+    Returns:
+        int array of shape (n1, n2)
+    """
+    fp2 = fp1 if fp2 is None else fp2
+    distances = np.empty((len(fp1), len(fp2)), dtype=np.int64)
+    step = max(1, max_block_size // max(1, fp2.size))
+    for start in range(0, len(fp1), step):
+        block = fp1[start:start + step, None, :]
+        distances[start:start + step] = hamming_distance(block, fp2[None])
+    return distances
+
 
 class SimhashVectorizer(BaseVectorizer):
     name = "Simhash"
     max_f = 1024
+    chunk_size = 10000  # documents hashed at once
 
-    def __init__(self, shingle_len=10, f=64, hashfunc=None):
+    def __init__(self, shingle_len=10, f=64, hashfunc=None, fast=False,
+                 expand_bits=False):
         """
         Args:
             shingle_len(int): Length of a shingle.
             f(int): Length of a document fingerprints
             hashfunc(callable): A function that accepts a string and returns
                 a unsigned integer
+            fast(bool): If True and `hashfunc` is None, shingle hashes are
+                computed with NumPy from 64-bit FNV-1a hashes of tokens.
+                Fingerprints then differ from those of the simhash package
+                (md5 of shingles), which are used by default.
+            expand_bits(bool): If True, `transform` also appends a feature
+                for every bit of a fingerprint.
         """
         self.f = f
         self._bin_format = '{:0%db}' % self.f
         self.hashfunc = hashfunc
         self.ngram_len = shingle_len
+        self.fast = fast
+        self.expand_bits = expand_bits
+
+    @property
+    def hash_function(self):
+        """ str: Name of the function shingles are hashed with. """
+        if self.hashfunc is not None:
+            return 'Custom'
+        return 'FNV-1a (fast)' if self.fast else 'MD5 (simhash)'
 
     @staticmethod
     def get_shingles(tokens, n):
@@ -36,27 +184,99 @@ class SimhashVectorizer(BaseVectorizer):
     def int2binarray(self, num):
         return [int(x) for x in self._bin_format.format(num)]
 
+    def fingerprints(self, tokens):
+        """ Computes packed simhash fingerprints.
+
+        Args:
+            tokens (list): List of lists containing tokens.
+
+        Returns:
+            np.ndarray: uint64 array of shape (len(tokens), ceil(f / 64));
+                bit i of a fingerprint is bit i % 64 of word i // 64
+        """
+        tokens = list(tokens)
+        if self.hashfunc is not None or not self.fast:
+            return np.array(
+                [int2words(self.compute_hash(doc), self.f) for doc in tokens],
+                dtype=np.uint64
+            ).reshape(len(tokens), n_words(self.f))
+
+        chunks = [self._fingerprints(tokens[i:i + self.chunk_size])
+                  for i in range(0, len(tokens), self.chunk_size)]
+        if not chunks:
+            return np.zeros((0, n_words(self.f)), dtype=np.uint64)
+        return np.vstack(chunks)
+
+    def _fingerprints(self, tokens):
+        # hash every distinct token once; shingle hashes are then combined
+        # from token hashes without constructing shingle strings
+        vocabulary = {}
+        ids = np.fromiter(
+            (vocabulary.setdefault(t, len(vocabulary))
+             for doc in tokens for t in doc), dtype=np.int64)
+        token_hashes = _fnv1a(list(vocabulary))[ids]
+
+        lengths = np.fromiter(map(len, tokens), dtype=np.int64,
+                              count=len(tokens))
+        counts = np.maximum(lengths - self.ngram_len + 1, 0)
+        fingerprints = np.zeros((len(tokens), n_words(self.f)),
+                                dtype=np.uint64)
+        nonempty = counts > 0
+        if not nonempty.any():
+            return fingerprints
+
+        # positions of the first token of every shingle
+        offsets = np.cumsum(lengths) - lengths
+        starts = np.cumsum(counts) - counts
+        positions = np.arange(counts.sum()) + np.repeat(offsets - starts,
+                                                        counts)
+        hashes = np.zeros(len(positions), dtype=np.uint64)
+        for k in range(self.ngram_len):
+            hashes = hashes * FNV_PRIME + token_hashes[positions + k]
+
+        for w in range(n_words(self.f)):
+            n_bits = min(WORD_BITS, self.f - WORD_BITS * w)
+            octets = _mix(hashes, w).astype('<u8').view(np.uint8)
+            bits = np.unpackbits(octets.reshape(-1, 8), axis=1,
+                                 bitorder='little')[:, :n_bits]
+            ones = np.add.reduceat(bits, starts[nonempty], axis=0,
+                                   dtype=np.int64)
+            # same rule as Simhash: a bit is set when more shingles have it
+            # set than unset
+            is_set = 2 * ones > counts[nonempty, None]
+            shifts = np.arange(n_bits, dtype=np.uint64)
+            fingerprints[nonempty, w] = np.bitwise_or.reduce(
+                is_set.astype(np.uint64) << shifts, axis=1)
+        return fingerprints
+
     def _transform(self, corpus, source_dict):
         """ Computes simhash values from the given corpus
-        and creates a new one with a simhash attribute.
+        and creates a new one with a simhash meta attribute.
 
         Args:
             corpus (Corpus): a corpus with tokens.
 
         Returns:
-            Corpus with `simhash` variable
+            Corpus with `Simhash` meta variable holding packed fingerprints
+            (see `corpus_fingerprints`) and, if `expand_bits` is set,
+            `simhash_*` features
         """
-
-        X = np.array([self.int2binarray(self.compute_hash(doc)) for doc in corpus.tokens], dtype=np.float)
-        corpus = corpus.extend_attributes(
-            X,
-            feature_names=[
-                'simhash_{}'.format(int(i) + 1) for i in range(self.f)
-            ],
-            var_attrs={'hidden': True}
-        )
-        return corpus
+        fingerprints = self.fingerprints(corpus.tokens)
+        if self.expand_bits:
+            corpus = corpus.extend_attributes(
+                unpack_fingerprints(fingerprints, self.f),
+                feature_names=[
+                    'simhash_{}'.format(int(i) + 1) for i in range(self.f)
+                ],
+                var_attrs={'hidden': True}
+            )
+        var = StringVariable(get_unique_names(corpus.domain, FINGERPRINT_VAR))
+        var.attributes.update({'hidden': True, 'simhash-bits': self.f})
+        return corpus.add_column(var, fingerprints_to_strings(fingerprints),
+                                 to_metas=True)
 
     def report(self):
         return (('Hash length', self.f),
-                ('Shingle length', self.ngram_len))
+                ('Shingle length', self.ngram_len),
+                ('Hash function', self.hash_function),
+                ('Bit features', 'Yes' if self.expand_bits else 'No'))
@@ -0,0 +1,255 @@
+"""This module contains a local (offline) backend for document embedding
+with pretrained fastText word vectors.
+
+Vectors are converted once to a NumPy matrix which is then memory-mapped,
+so loading a model is fast and only vectors of words that appear in the
+documents are read from disk.
+"""
+import hashlib
+import os
+import warnings
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+import scipy.sparse as sp
+
+from Orange.misc.environ import cache_dir
+from Orange.misc.utils.embedder_utils import EmbeddingCancelledException
+
+
+class WordVectors:
+    """Word vectors stored in a (memory-mapped) matrix with a vocabulary
+    index.
+
+    Attributes
+    ----------
+    vectors : np.ndarray
+        Matrix of shape (n_words, dim) - one row for every word.
+    words : list of str
+        Words in order of rows in `vectors`.
+    """
+
+    def __init__(self, vectors: np.ndarray, words: Sequence[str]) -> None:
+        if len(vectors) != len(words):
+            raise ValueError("Number of vectors and words do not match.")
+        self.vectors = vectors
+        self.words = list(words)
+        self.index: Dict[str, int] = {w: i for i, w in enumerate(self.words)}
+
+    @property
+    def dim(self) -> int:
+        return self.vectors.shape[1]
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+    @classmethod
+    def load(cls, path: str, cache: Optional[str] = None) -> "WordVectors":
+        """Load fastText vectors from a .vec (text) or .bin (binary) file.
+
+        The first time a file is loaded it is converted to a .npy matrix and
+        a vocabulary file in `cache`; later loads memory-map the matrix.
+
+        Parameters
+        ----------
+        path : str
+            Path to .vec or .bin file.
+        cache : str, optional
+            Directory for converted files. Orange's cache directory if None.
+
+        Returns
+        -------
+        WordVectors
+        """
+        cache = cache or os.path.join(cache_dir(), 'word_vectors')
+        os.makedirs(cache, exist_ok=True)
+        stat = os.stat(path)
+        key = hashlib.sha1('{}|{}|{}'.format(
+            os.path.abspath(path), stat.st_size, stat.st_mtime_ns
+        ).encode('utf-8')).hexdigest()
+        matrix_path = os.path.join(cache, key + '.npy')
+        vocab_path = os.path.join(cache, key + '.vocab')
+
+        if not (os.path.exists(matrix_path) and os.path.exists(vocab_path)):
+            if path.endswith('.bin'):
+                words = cls._convert_bin(path, matrix_path)
+            else:
+                words = cls._convert_vec(path, matrix_path)
+            with open(vocab_path + '.tmp', 'w', encoding='utf-8') as f:
+                f.writelines(w + '\n' for w in words)
+            os.replace(vocab_path + '.tmp', vocab_path)
+
+        with open(vocab_path, encoding='utf-8') as f:
+            words = f.read().split('\n')[:-1]
+        return cls(np.load(matrix_path, mmap_mode='r'), words)
+
+    @staticmethod
+    def _convert_vec(path: str, matrix_path: str) -> List[str]:
+        with open(path, encoding='utf-8', errors='replace') as f:
+            n_words, dim = map(int, f.readline().split())
+            matrix = np.lib.format.open_memmap(
+                matrix_path + '.tmp', mode='w+', dtype=np.float32,
+                shape=(n_words, dim))
+            words = []
+            try:
+                for i, line in enumerate(f):
+                    if i == n_words:
+                        break
+                    # words may contain spaces; vectors are the last fields
+                    parts = line.rstrip().rsplit(' ', dim)
+                    if len(parts) != dim + 1:
+                        raise ValueError(
+                            'Line {} of {} does not contain a word and {} '
+                            'values.'.format(i + 2, path, dim))
+                    words.append(parts[0])
+                    matrix[i] = np.array(parts[1:], dtype=np.float32)
+                if len(words) < n_words:
+                    raise ValueError(
+                        '{} contains {} vectors instead of {}.'.format(
+                            path, len(words), n_words))
+            except ValueError:
+                del matrix
+                os.remove(matrix_path + '.tmp')
+                raise
+        matrix.flush()
+        del matrix
+        os.replace(matrix_path + '.tmp', matrix_path)
+        return words
+
+    @staticmethod
+    def _convert_bin(path: str, matrix_path: str) -> List[str]:
+        from gensim.models.fasttext import load_facebook_vectors
+
+        # vectors of words are computed from word and subword vectors, so the
+        # whole model is loaded; it takes memory of a few times the file size
+        warnings.warn(
+            'Converting {} loads the whole model ({:.1f} GB) into memory; '
+            'use a .vec file to convert it with little memory.'.format(
+                path, os.path.getsize(path) / 2 ** 30), ResourceWarning)
+        kv = load_facebook_vectors(path)
+        with open(matrix_path + '.tmp', 'wb') as f:
+            np.save(f, kv.vectors.astype(np.float32))
+        os.replace(matrix_path + '.tmp', matrix_path)
+        return list(kv.index_to_key)
+
+    def lookup(self, words: Sequence[str]) -> np.ndarray:
+        """Return row indices of words; -1 for unknown words."""
+        index = self.index
+        return np.fromiter((index.get(w, -1) for w in words),
+                           dtype=np.int64, count=len(words))
+
+    def embed(
+            self, documents: Sequence[Sequence[str]], aggregator: str
+    ) -> List[Optional[np.ndarray]]:
+        """Embed documents by aggregating vectors of their words.
+
+        Parameters
+        ----------
+        documents : list of lists
+            Words of every document.
+        aggregator : str
+            One of mean, sum, max, min.
+
+        Returns
+        -------
+        list
+            Document embeddings; None for documents without known words.
+        """
+        lengths = np.fromiter(map(len, documents), dtype=np.int64,
+                              count=len(documents))
+        rows = self.lookup([w for doc in documents for w in doc])
+        doc_ids = np.repeat(np.arange(len(documents)), lengths)
+        known = rows >= 0
+        rows, doc_ids = rows[known], doc_ids[known]
+        counts = np.bincount(doc_ids, minlength=len(documents))
+
+        # read each needed vector from the (memory-mapped) matrix only once
+        used, inverse = np.unique(rows, return_inverse=True)
+        vectors = np.asarray(self.vectors[used], dtype=float)
+        embedded = counts > 0
+        if aggregator in ('mean', 'sum'):
+            doc_term = sp.csr_matrix(
+                (np.ones(len(rows)), (doc_ids, inverse)),
+                shape=(len(documents), len(used)))
+            embeddings = doc_term @ vectors
+            if aggregator == 'mean':
+                embeddings[embedded] /= counts[embedded, None]
+            embeddings = embeddings[embedded]
+        elif aggregator in ('max', 'min'):
+            # doc_ids are sorted - reduce contiguous segments
+            ufunc = np.maximum if aggregator == 'max' else np.minimum
+            starts = np.cumsum(counts) - counts
+            embeddings = ufunc.reduceat(vectors[inverse], starts[embedded],
+                                        axis=0) if len(rows) else vectors
+        else:
+            raise ValueError('{} is not a valid aggregator.'.format(aggregator))
+
+        result = [None] * len(documents)
+        for i, emb in zip(np.flatnonzero(embedded), embeddings):
+            result[i] = emb
+        return result
+
+
+class LocalEmbedder:
+    """Embeds documents with local word vectors. It follows the interface
+    of the server embedder used by DocumentEmbedder.
+
+    Attributes
+    ----------
+    word_vectors : WordVectors
+        Vectors used for embedding.
+    aggregator : str
+        One of mean, sum, max, min.
+    batch_size : int
+        Number of documents embedded at once.
+    """
+
+    def __init__(self, word_vectors: WordVectors, aggregator: str,
+                 batch_size: int = 1000) -> None:
+        self.word_vectors = word_vectors
+        self.aggregator = aggregator
+        self.batch_size = batch_size
+        self._cancelled = False
+
+    def embedd_data(
+            self, data: List[List[str]],
+            processed_callback: Optional[Callable] = None
+    ) -> List[Optional[np.ndarray]]:
+        """Embed documents in batches.
+
+        Parameters
+        ----------
+        data : list of lists
+            Words of every document.
+        processed_callback : callable, optional
+            Called once for every processed document with a flag telling
+            whether the document was embedded.
+
+        Returns
+        -------
+        list
+            Document embeddings; None for documents without known words.
+
+        Raises
+        ------
+        EmbeddingCancelledException
+            If embedding was cancelled with set_cancelled.
+        """
+        self._cancelled = False
+        result = []
+        for start in range(0, len(data), self.batch_size):
+            if self._cancelled:
+                raise EmbeddingCancelledException
+            batch = data[start:start + self.batch_size]
+            embeddings = self.word_vectors.embed(batch, self.aggregator)
+            result.extend(embeddings)
+            if processed_callback:
+                for emb in embeddings:
+                    processed_callback(emb is not None)
+        return result
+
+    def set_cancelled(self):
+        self._cancelled = True
+
+    def clear_cache(self):
+        """Local embeddings are computed on the fly; nothing to clear."""
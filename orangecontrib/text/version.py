@@ -0,0 +1,10 @@
+
+# THIS FILE IS GENERATED FROM ORANGE3-TEXT SETUP.PY
+short_version = '1.8.2'
+version = '1.8.2'
+full_version = '1.8.2'
+git_revision = 'c0c201e59b48e4142b95695ed7591fa34931410e'
+release = True
+if not release:
+    version = full_version
+    short_version += ".dev"
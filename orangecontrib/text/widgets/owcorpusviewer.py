@@ -2,7 +2,7 @@ import os
 import re
 import sre_constants
 from itertools import chain
-from typing import Set
+from typing import List, Set
 
 from AnyQt.QtCore import (
     Qt, QUrl, QItemSelection, QItemSelectionModel, QItemSelectionRange
@@ -49,6 +49,7 @@ class OWCorpusViewer(OWWidget):
     regexp_filter = ContextSetting("")
 
     show_tokens = Setting(False)
+    rank_matches = Setting(False)
     autocommit = Setting(True)
 
     class Warning(OWWidget.Warning):
@@ -78,6 +79,10 @@ class OWCorpusViewer(OWWidget):
             self.controlArea, self, 'search_indices', 'search_features',
             selectionMode=QListView.ExtendedSelection,
             box='搜索特征', callback=self.search_features_changed)
+        gui.checkBox(self.controlArea, self, 'rank_matches',
+                     '按相关性 (BM25) 排序匹配的文档',
+                     callback=self.refresh_search,
+                     tooltip='按查询中单词的 Okapi BM25 得分对匹配的文档排序。')
 
         # Display features
         display_box = gui.widgetBox(self.controlArea, '显示特征')
@@ -189,17 +194,31 @@ class OWCorpusViewer(OWWidget):
 
         self.doc_list_model.clear()
 
-        for i, (doc, title, content) in enumerate(zip(self.corpus, self.corpus.titles,
-                                                      self.corpus_docs)):
+        rows = []
+        for i, content in enumerate(self.corpus_docs):
             res = len(list(reg.finditer(content))) if self.regexp_filter else 0
             if not self.regexp_filter or res:
                 matches += res
-                item = QStandardItem()
-                item.setData(str(title), Qt.DisplayRole)
-                item.setData(doc, Qt.UserRole)
-                self.doc_list_model.appendRow(item)
+                rows.append(i)
+        if self.rank_matches and self.regexp_filter:
+            rows = self.__rank(rows, search_keyword)
+
+        titles = self.corpus.titles
+        for i in rows:
+            item = QStandardItem()
+            item.setData(str(titles[i]), Qt.DisplayRole)
+            item.setData(self.corpus[i], Qt.UserRole)
+            self.doc_list_model.appendRow(item)
         self.matches = matches
 
+    def __rank(self, rows: List[int], query: str) -> List[int]:
+        """ Sort rows by the BM25 score of words in the query """
+        words = re.findall(r'\w+', query.lower())
+        if not words:
+            return rows
+        scores = self.corpus.inverted_index.bm25(words).sum(axis=1)
+        return sorted(rows, key=lambda i: -scores[i])
+
     def get_selected_documents_from_view(self) -> Set[str]:
         """
         Returns
@@ -1,4 +1,5 @@
 # pylint: disable=missing-docstring
+import os
 from types import SimpleNamespace
 from typing import Optional, Set, List, Tuple, Dict, Any
 
@@ -8,7 +9,7 @@ import pandas as pd
 from AnyQt.QtCore import Qt, QSortFilterProxyModel, QItemSelection, \
     QItemSelectionModel, QModelIndex, Signal
 from AnyQt.QtWidgets import QCheckBox, QLineEdit, QTableView, QGridLayout, \
-    QRadioButton, QButtonGroup
+    QRadioButton, QButtonGroup, QLabel
 
 from Orange.data import Table, Domain, StringVariable, ContinuousVariable
 from Orange.util import wrap_callback
@@ -189,6 +190,7 @@ class OWKeywords(OWWidget, ConcurrentWidgetMixin):
     rake_lang_index: int = Setting(RAKE_LANGUAGES.index("English"))
     embedding_lang_index: int = Setting(EMBEDDING_LANGUAGES.index("English"))
     agg_method: int = Setting(AggregationMethods.MEAN)
+    n_jobs: int = Setting(1)
     sel_method: int = ContextSetting(SelectionMethods.N_BEST)
     n_selected: int = ContextSetting(3)
     sort_column_order: Tuple[int, int] = Setting(DEFAULT_SORTING)
@@ -246,6 +248,13 @@ class OWKeywords(OWWidget, ConcurrentWidgetMixin):
             if method_name == ScoringMethods.EMBEDDING:
                 box.layout().addWidget(embedding_cb, i, 1)
 
+        spin = gui.spin(
+            box, self, "n_jobs", 1, os.cpu_count() or 1, addToLayout=False,
+            tooltip="YAKE! 和 Rake 并行提取关键词的进程数"
+        )
+        box.layout().addWidget(QLabel("并行进程数:"), len(ScoringMethods.ITEMS), 0)
+        box.layout().addWidget(spin, len(ScoringMethods.ITEMS), 1)
+
         box = gui.vBox(self.controlArea, "聚合")
         gui.comboBox(
             box, self, "agg_method", items=AggregationMethods.ITEMS,
@@ -382,11 +391,13 @@ class OWKeywords(OWWidget, ConcurrentWidgetMixin):
         kwargs = {
             ScoringMethods.YAKE: {
                 "language": YAKE_LANGUAGES[self.yake_lang_index],
-                "max_len": self.corpus.ngram_range[1] if self.corpus else 1
+                "max_len": self.corpus.ngram_range[1] if self.corpus else 1,
+                "n_jobs": self.n_jobs
             },
             ScoringMethods.RAKE: {
                 "language": RAKE_LANGUAGES[self.rake_lang_index],
-                "max_len": self.corpus.ngram_range[1] if self.corpus else 1
+                "max_len": self.corpus.ngram_range[1] if self.corpus else 1,
+                "n_jobs": self.n_jobs
             },
             ScoringMethods.EMBEDDING: {
                 "language": EMBEDDING_LANGUAGES[self.embedding_lang_index],
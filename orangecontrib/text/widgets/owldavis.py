@@ -252,6 +252,8 @@ class OWLDAvis(OWWidget):
         self.topic_list = []
         self.term_topic_matrix = None
         self.term_frequency = None
+        self.log_topic = None
+        self.log_lift = None
         self.num_tokens = None
         # should be used later for bar chart
         self.graph: Optional[BarPlotGraph] = None
@@ -288,18 +290,39 @@ class OWLDAvis(OWWidget):
         self.graph = BarPlotGraph(self)
         self.mainArea.layout().addWidget(self.graph)
 
-    def compute_relevance(self, topic: np.ndarray) -> np.ndarray:
+    def compute_relevance(self, topic: int) -> np.ndarray:
         """
         Relevance is defined as lambda*log(topic_probability) + (
         1-lambda)*log(topic_probability/marginal_probability).
         https://nlp.stanford.edu/events/illvi2014/papers/sievert-illvi2014.pdf
+
+        Logarithms are precomputed for all topics when data is set, so only
+        the weighted sum is computed when the relevance changes.
         """
-        nonzero = (topic > 0) & (self.term_frequency > 0)
-        tp, mp = topic[nonzero], self.term_frequency[nonzero]
-        adj_prob = np.zeros(topic.shape)
-        rel = self.relevance
-        adj_prob[nonzero] = rel * np.log(tp) + (1 - rel) * np.log(tp / mp)
-        return adj_prob
+        rel = np.float32(self.relevance)
+        return rel * self.log_topic[topic] + (1 - rel) * self.log_lift[topic]
+
+    @staticmethod
+    def compute_logarithms(
+        topics: np.ndarray, term_frequency: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Logarithms of topic probabilities of terms, log p(w|t), and of their
+        lift, log(p(w|t) / p(w)), as float32 matrices of shape
+        (topics, terms). They are 0 where a probability is 0.
+        """
+        nonzero = (topics > 0) & (term_frequency > 0)
+        log_topic = np.zeros(topics.shape, dtype=np.float32)
+        np.log(topics, out=log_topic, where=nonzero, casting="same_kind")
+        log_marginal = np.log(
+            term_frequency,
+            out=np.zeros(term_frequency.shape),
+            where=term_frequency > 0,
+        ).astype(np.float32)
+        log_lift = np.subtract(
+            log_topic, log_marginal, out=np.zeros_like(log_topic), where=nonzero
+        )
+        return log_topic, log_lift
 
     @staticmethod
     def compute_distributions(data: Topics) -> np.ndarray:
@@ -313,10 +336,14 @@ class OWLDAvis(OWWidget):
     def on_params_change(self):
         if self.data is None:
             return
-        topic = self.data.X[:, self.selected_topic]
-        adj_prob = self.compute_relevance(topic)
+        adj_prob = self.compute_relevance(self.selected_topic)
 
-        idx = np.argsort(adj_prob, axis=None)[::-1][:N_BEST_PLOTTED]
+        n_best = min(N_BEST_PLOTTED, len(adj_prob))
+        if n_best < len(adj_prob):
+            idx = np.argpartition(-adj_prob, n_best - 1)[:n_best]
+        else:
+            idx = np.arange(len(adj_prob))
+        idx = idx[np.argsort(-adj_prob[idx], kind="stable")]
 
         words = self.data.metas[:, 0][idx]
         term_topic_freq = self.term_topic_matrix[self.selected_topic].T[idx]
@@ -343,6 +370,9 @@ class OWLDAvis(OWWidget):
         self.num_tokens = data.attributes.get("Number of tokens", "")
         self.term_topic_matrix = self.compute_distributions(data)
         self.term_frequency = np.sum(self.term_topic_matrix, axis=0)
+        self.log_topic, self.log_lift = self.compute_logarithms(
+            data.X, self.term_frequency
+        )
 
         self.selected_topic = prev_topic if prev_topic < len(self.topic_list) else 0
         self.on_params_change()
@@ -358,6 +388,8 @@ class OWLDAvis(OWWidget):
         self.topic_list = []
         self.term_topic_matrix = None
         self.term_frequency = None
+        self.log_topic = None
+        self.log_lift = None
         self.num_tokens = None
 
     def send_report(self):
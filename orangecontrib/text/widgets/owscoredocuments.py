@@ -1,5 +1,4 @@
 import re
-from collections import Counter
 from contextlib import contextmanager
 from inspect import signature
 from typing import Callable, List, Tuple, Union
@@ -54,25 +53,29 @@ def disconnected(signal, slot, type=Qt.UniqueConnection):
 
 
 def _word_frequency(corpus: Corpus, words: List[str], callback: Callable) -> np.ndarray:
-    res = []
-    tokens = corpus.tokens
-    for i, t in enumerate(tokens):
-        counts = Counter(t)
-        res.append([counts.get(w, 0) for w in words])
-        callback((i + 1) / len(tokens))
-    return np.array(res)
+    scores = corpus.inverted_index.frequency(words)
+    callback(1)
+    return scores
 
 
 def _word_appearance(
     corpus: Corpus, words: List[str], callback: Callable
 ) -> np.ndarray:
-    res = []
-    tokens = corpus.tokens
-    for i, t in enumerate(tokens):
-        t = set(t)
-        res.append([w in t for w in words])
-        callback((i + 1) / len(tokens))
-    return np.array(res)
+    scores = corpus.inverted_index.appearance(words)
+    callback(1)
+    return scores
+
+
+def _bm25(corpus: Corpus, words: List[str], callback: Callable) -> np.ndarray:
+    scores = corpus.inverted_index.bm25(words)
+    callback(1)
+    return scores
+
+
+def _tfidf(corpus: Corpus, words: List[str], callback: Callable) -> np.ndarray:
+    scores = corpus.inverted_index.tfidf(words)
+    callback(1)
+    return scores
 
 
 def _embedding_similarity(
@@ -110,6 +113,16 @@ SCORING_METHODS = {
         _word_appearance,
         "如果单词出现在文档中，则用 1 对单词进行评分，否则为 0。",
     ),
+    "bm25": (
+        "BM25",
+        _bm25,
+        "Okapi BM25 单词对文档的相关性，考虑文档长度和单词的稀有程度。",
+    ),
+    "tfidf": (
+        "TF-IDF",
+        _tfidf,
+        "文档中单词的 TF-IDF 权重。",
+    ),
     "embedding_similarity": (
         "相关性",
         _embedding_similarity,
@@ -338,6 +351,8 @@ class OWScoreDocuments(OWWidget, ConcurrentWidgetMixin):
 
     word_frequency: bool = Setting(True)
     word_appearance: bool = Setting(False)
+    bm25: bool = Setting(False)
+    tfidf: bool = Setting(False)
     embedding_similarity: bool = Setting(False)
     embedding_language: int = Setting(0)
 
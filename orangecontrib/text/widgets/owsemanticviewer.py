@@ -17,7 +17,8 @@ from Orange.widgets.utils.itemmodels import PyTableModel
 from Orange.widgets.widget import Input, Output, OWWidget, Msg
 
 from orangecontrib.text import Corpus
-from orangecontrib.text.semantic_search import SemanticSearch
+from orangecontrib.text.semantic_search import SemanticSearch, \
+    LocalSemanticSearch
 
 IndexRole = next(gui.OrangeUserRole)
 
@@ -65,7 +66,8 @@ class Results(SimpleNamespace):
 def run(
         corpus: Optional[Corpus],
         words: Optional[List],
-        state: TaskState
+        state: TaskState,
+        semantic_search: Optional[LocalSemanticSearch] = None
 ) -> Results:
     results = Results(scores=[])
     if not corpus or not words:
@@ -79,7 +81,8 @@ def run(
             raise Exception
 
     callback(0, "Calculating...")
-    semantic_search = SemanticSearch()
+    if semantic_search is None:
+        semantic_search = SemanticSearch()
     results.scores = semantic_search(corpus.documents, words, callback)
     return results
 
@@ -221,6 +224,7 @@ class OWSemanticViewer(OWWidget, ConcurrentWidgetMixin):
         no_words_column = Msg("Input is missing 'Words' column.")
 
     threshold = Setting(0.5)
+    local_index = Setting(False)
     display_index = Setting(DisplayDocument.Document)
     selection = Setting([], schema_only=True)
 
@@ -230,6 +234,7 @@ class OWSemanticViewer(OWWidget, ConcurrentWidgetMixin):
         self.corpus: Optional[Corpus] = None
         self.words: Optional[List] = None
         self._results: Optional[Results] = None
+        self._local_search: Optional[LocalSemanticSearch] = None
         self.__pending_selection = self.selection
         self._setup_gui()
 
@@ -239,6 +244,11 @@ class OWSemanticViewer(OWWidget, ConcurrentWidgetMixin):
         gui.doubleSpin(box, self, "threshold", 0, 1, 0.01, None,
                        label="Threshold: ", orientation=Qt.Horizontal,
                        callback=self.__on_threshold_changed)
+        gui.checkBox(self.controlArea, self, "local_index",
+                     "Embed documents once (local index)", box="Search",
+                     callback=self.__on_local_index_changed,
+                     tooltip="Embed sentences once and search them locally; "
+                             "changed words are embedded alone.")
 
         box = gui.hBox(self.controlArea, "Display")
         gui.radioButtons(box, self, "display_index", DisplayDocument.ITEMS,
@@ -266,6 +276,10 @@ class OWSemanticViewer(OWWidget, ConcurrentWidgetMixin):
     def __on_threshold_changed(self):
         self._show_documents()
 
+    def __on_local_index_changed(self):
+        self._clear()
+        self.update_scores()
+
     def __on_display_changed(self):
         self._show_documents()
 
@@ -305,7 +319,12 @@ class OWSemanticViewer(OWWidget, ConcurrentWidgetMixin):
         self.update_scores()
 
     def update_scores(self):
-        self.start(run, self.corpus, self.words)
+        search = None
+        if self.local_index:
+            if self._local_search is None:
+                self._local_search = LocalSemanticSearch()
+            search = self._local_search
+        self.start(run, self.corpus, self.words, semantic_search=search)
 
     def on_exception(self, ex: Exception):
         raise ex
@@ -19,6 +19,8 @@ class OWSimhash(owbasevectorizer.OWBaseVectorizer):
 
     f = settings.Setting(64)
     shingle_len = settings.Setting(10)
+    fast = settings.Setting(False)
+    expand_bits = settings.Setting(True)
 
     def create_configuration_layout(self):
         layout = QFormLayout()
@@ -31,11 +33,20 @@ class OWSimhash(owbasevectorizer.OWBaseVectorizer):
         spin = gui.spin(self, self, 'shingle_len', minv=1, maxv=100)
         spin.editingFinished.connect(self.on_change)
         layout.addRow('Shingle length:', spin)
+
+        # FNV-1a fingerprints differ from those of the simhash package
+        layout.addRow(gui.checkBox(None, self, 'fast',
+                                   'Fast hashing (FNV-1a)',
+                                   callback=self.on_change))
+        layout.addRow(gui.checkBox(None, self, 'expand_bits',
+                                   'Output a feature per bit',
+                                   callback=self.on_change))
         return layout
 
     def update_method(self):
         self.method = self.Method(shingle_len=self.shingle_len,
-                                  f=self.f)
+                                  f=self.f, fast=self.fast,
+                                  expand_bits=self.expand_bits)
 
 
 if __name__ == '__main__':
@@ -1,4 +1,12 @@
 import functools
+import hashlib
+import json
+import logging
+import os
+import pickle
+import shutil
+import tempfile
+import time
 from typing import Any
 
 import numpy as np
@@ -18,11 +26,13 @@ from Orange.widgets import gui
 from Orange.widgets.settings import DomainContextHandler
 from Orange.widgets.widget import OWWidget, Input, Output, Msg
 from Orange.data import Table
+from Orange.misc.environ import cache_dir
 from orangecontrib.text.corpus import Corpus
 from orangecontrib.text.topics import Topic, Topics, LdaWrapper, HdpWrapper, \
-    LsiWrapper
+    LsiWrapper, NmfWrapper
 from orangecontrib.text.topics.topics import GensimWrapper
 
+log = logging.getLogger(__name__)
 
 class TopicWidget(gui.OWComponent, QGroupBox):
     Model = NotImplemented
@@ -59,8 +69,10 @@ class LdaWidget(TopicWidget):
 
     parameters = (
         ('num_topics', '主题数目', 1, 500, 1, int),
+        ('workers', '并行进程数', 1, os.cpu_count() or 1, 1, int),
     )
     num_topics = settings.Setting(10)
+    workers = settings.Setting(1)
 
 
 class LsiWidget(TopicWidget):
@@ -72,6 +84,15 @@ class LsiWidget(TopicWidget):
     num_topics = settings.Setting(10)
 
 
+class NmfWidget(TopicWidget):
+    Model = NmfWrapper
+
+    parameters = (
+        ('num_topics', '主题数目', 1, 500, 1, int),
+    )
+    num_topics = settings.Setting(10)
+
+
 class HdpWidget(TopicWidget):
     Model = HdpWrapper
 
@@ -104,13 +125,91 @@ def require(attribute):
     return decorator
 
 
-def _run(corpus: Corpus, model: GensimWrapper, state: TaskState):
+MAX_SAVED_MODELS = 5
+# models being saved are written to directories with this suffix; unfinished
+# ones (e.g. of a crashed process) are removed after a day
+SAVING_SUFFIX = ".saving"
+SAVING_TIMEOUT = 24 * 3600
+
+
+def _model_path(corpus: Corpus, model: GensimWrapper) -> str:
+    """ Directory for the model fit on the corpus with model's parameters.
+
+    The corpus is identified by the dictionary and the bag-of-words matrix
+    the model is fit on, which are cached on the corpus. """
+    h = hashlib.md5()
+    params = {k: np.dtype(v).name if k == "dtype" else v
+              for k, v in model.kwargs.items()}
+    params.update((k, getattr(model, k)) for k in model.wrapper_params)
+    h.update(json.dumps([type(model).__name__, params], sort_keys=True,
+                        default=str).encode("utf-8"))
+    h.update(json.dumps(corpus.ngrams_dictionary.token2id)
+             .encode("utf-8", "replace"))
+    sparse = corpus.ngrams_corpus.sparse
+    h.update(str(sparse.shape).encode("utf-8"))
+    for array in (sparse.data, sparse.indices, sparse.indptr):
+        h.update(np.ascontiguousarray(array).tobytes())
+    return os.path.join(cache_dir(), "topic_models", h.hexdigest())
+
+
+def _save_model(model: GensimWrapper, path: str) -> None:
+    """ Save the model and remove the least recently used saved models.
+
+    The model is written to a temporary directory which is then renamed, so
+    other processes never load or prune a partially written model. """
+    root = os.path.dirname(path)
+    os.makedirs(root, exist_ok=True)
+    tmp = tempfile.mkdtemp(suffix=SAVING_SUFFIX, dir=root)
+    try:
+        model.save(tmp)
+        os.replace(tmp, path)
+    except OSError:
+        # e.g. the same model was saved by another process in the meantime
+        shutil.rmtree(tmp, ignore_errors=True)
+        if not os.path.exists(path):
+            raise
+    saved, now = [], time.time()
+    for name in os.listdir(root):
+        full = os.path.join(root, name)
+        if not name.endswith(SAVING_SUFFIX):
+            saved.append(full)
+        elif now - os.path.getmtime(full) > SAVING_TIMEOUT:
+            shutil.rmtree(full, ignore_errors=True)
+    saved.sort(key=os.path.getmtime)
+    for old in saved[:-MAX_SAVED_MODELS]:
+        shutil.rmtree(old, ignore_errors=True)
+
+
+def _run(corpus: Corpus, model: GensimWrapper, state: TaskState,
+         reuse: bool = False):
     def callback(i: float):
         state.set_progress_value(i * 100)
         if state.is_interruption_requested():
             raise Exception
 
-    return model.fit_transform(corpus.copy(), on_progress=callback)
+    corpus = corpus.copy()
+    path = _model_path(corpus, model) if reuse else None
+    if path is not None and os.path.exists(path):
+        try:
+            model.restore(path)
+        except (OSError, ValueError, KeyError, EOFError,
+                pickle.UnpicklingError):
+            # damaged or incompatible model - fit it again
+            log.warning("Saved topic model %s can not be loaded.", path,
+                        exc_info=True)
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            if model.doc_topic is not None and len(model.doc_topic) == len(corpus):
+                os.utime(path)
+                return model.add_topics(corpus)
+    corpus = model.fit_transform(corpus, on_progress=callback)
+    if path is not None and model.model is not None:
+        try:
+            _save_model(model, path)
+        except (OSError, pickle.PicklingError):
+            log.warning("Topic model can not be saved to %s.", path,
+                        exc_info=True)
+    return corpus
 
 
 class OWTopicModeling(OWWidget, ConcurrentWidgetMixin):
@@ -138,15 +237,18 @@ class OWTopicModeling(OWWidget, ConcurrentWidgetMixin):
         (LsiWidget, 'lsi'),
         (LdaWidget, 'lda'),
         (HdpWidget, 'hdp'),
+        (NmfWidget, 'nmf'),
     ]
 
     # Settings
     autocommit = settings.Setting(True)
     method_index = settings.Setting(0)
+    reuse_models = settings.Setting(False)
 
     lsi = settings.SettingProvider(LsiWidget)
     hdp = settings.SettingProvider(HdpWidget)
     lda = settings.SettingProvider(LdaWidget)
+    nmf = settings.SettingProvider(NmfWidget)
 
     selection = settings.Setting(None, schema_only=True)
 
@@ -194,6 +296,9 @@ class OWTopicModeling(OWWidget, ConcurrentWidgetMixin):
         gui.label(box, self, "Log perplexity: %(perplexity)s")
         gui.label(box, self, "Topic coherence: %(coherence)s")
         self.controlArea.layout().insertWidget(1, box)
+        gui.checkBox(self.controlArea, self, "reuse_models", "重用保存的模型",
+                     tooltip="保存训练好的模型，并在相同的语料库和参数下重用，"
+                             "无需重新训练。")
 
         # Topics description
         self.topic_desc = TopicViewer()
@@ -230,7 +335,7 @@ class OWTopicModeling(OWWidget, ConcurrentWidgetMixin):
         self.topic_desc.clear()
         if self.corpus is not None:
             self.Warning.less_topics_found.clear()
-            self.start(_run, self.corpus, self.model)
+            self.start(_run, self.corpus, self.model, reuse=self.reuse_models)
         else:
             self.topic_desc.clear()
             self.Outputs.corpus.send(None)
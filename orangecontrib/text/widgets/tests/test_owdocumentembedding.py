@@ -8,6 +8,7 @@ from Orange.misc.utils.embedder_utils import EmbeddingConnectionError
 from orangecontrib.text.tests.test_documentembedder import PATCH_METHOD, make_dummy_post
 from orangecontrib.text.widgets.owdocumentembedding import OWDocumentEmbedding
 from orangecontrib.text import Corpus
+from orangecontrib.text.tests import isolate_embedding_store
 
 
 async def none_method(_, __):
@@ -17,6 +18,7 @@ async def none_method(_, __):
 class TestOWDocumentEmbedding(WidgetTest):
 
     def setUp(self):
+        isolate_embedding_store(self)
         self.widget = self.create_widget(OWDocumentEmbedding)
         self.corpus = Corpus.from_file('deerwester')
         self.larger_corpus = Corpus.from_file('book-excerpts')
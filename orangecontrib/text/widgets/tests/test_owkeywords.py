@@ -192,7 +192,7 @@ class TestOWKeywords(WidgetTest):
                    ("Embedding", Mock(side_effect=dummy_embedding))]
         with patch.object(ScoringMethods, "ITEMS", methods) as m:
             scores = {"TF-IDF", "YAKE!", "Rake", "Embedding"}
-            settings = {"selected_scoring_methods": scores}
+            settings = {"selected_scoring_methods": scores, "n_jobs": 2}
             widget = self.create_widget(OWKeywords, stored_settings=settings)
 
             cb = widget.controls.yake_lang_index
@@ -214,6 +214,8 @@ class TestOWKeywords(WidgetTest):
             self.assertEqual(m[1][1].call_args[1]["language"], "Arabic")
             self.assertEqual(m[2][1].call_args[1]["language"], "Finnish")
             self.assertEqual(m[3][1].call_args[1]["language"], "Kazakh")
+            self.assertEqual(m[1][1].call_args[1]["n_jobs"], 2)
+            self.assertEqual(m[2][1].call_args[1]["n_jobs"], 2)
 
     def test_send_report(self):
         self.send_signal(self.widget.Inputs.corpus, self.corpus)
@@ -1,6 +1,7 @@
 import os
 import unittest
 
+import numpy as np
 import pandas as pd
 
 from orangecontrib.text.topics import Topics
@@ -96,6 +97,20 @@ class TestOWLDAvis(WidgetTest):
             self._get_graph_labels()[:6],
         )
 
+    def test_compute_relevance(self):
+        self.send_signal(self.widget.Inputs.topics, self.topics)
+        marginal = self.widget.term_frequency
+        self.widget.relevance = 0.3
+        for topic in range(len(self.topics)):
+            p = self.topics.X[topic]
+            nonzero = (p > 0) & (marginal > 0)
+            expected = np.zeros(len(p))
+            expected[nonzero] = 0.3 * np.log(p[nonzero]) \
+                + 0.7 * np.log(p[nonzero] / marginal[nonzero])
+            relevance = self.widget.compute_relevance(topic)
+            self.assertEqual(relevance.dtype, np.float32)
+            np.testing.assert_allclose(relevance, expected, rtol=1e-5)
+
     def test_report(self):
         self.send_signal(self.widget.Inputs.topics, self.topics)
         self.wait_until_finished()
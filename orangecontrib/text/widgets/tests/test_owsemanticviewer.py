@@ -380,6 +380,37 @@ class TestOWSemanticViewer(WidgetTest):
         self.assertEqual(len(other_docs), 8)
         self.assertEqual(len(corpus), 9)
 
+    def test_local_index(self):
+        local_search = Mock(side_effect=DummySearch())
+        with patch("orangecontrib.text.widgets.owsemanticviewer."
+                   "LocalSemanticSearch", return_value=local_search) as cls:
+            self.send_signal(self.widget.Inputs.corpus, self.corpus)
+            self.send_signal(self.widget.Inputs.words, self.words)
+            self.wait_until_finished()
+            cls.assert_not_called()
+
+            self.widget.controls.local_index.click()
+            self.wait_until_finished()
+            self.assertTrue(self.widget.local_index)
+            cls.assert_called_once()
+            local_search.assert_called_once()
+            self.assertEqual(local_search.call_args[0][1],
+                             ["foo", "graph", "minors", "trees"])
+            self.assertEqual(len(self.get_output(
+                self.widget.Outputs.matching_docs)), 1)
+
+            # the local index is reused for new words
+            self.send_signal(self.widget.Inputs.words,
+                             create_words_table(["graph"]))
+            self.wait_until_finished()
+            cls.assert_called_once()
+            self.assertEqual(local_search.call_count, 2)
+
+            self.widget.controls.local_index.click()
+            self.wait_until_finished()
+            self.assertFalse(self.widget.local_index)
+            self.assertEqual(local_search.call_count, 2)
+
     def test_clear(self):
         self.send_signal(self.widget.Inputs.corpus, self.corpus)
         self.send_signal(self.widget.Inputs.words, self.words)
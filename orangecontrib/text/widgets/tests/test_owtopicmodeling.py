@@ -1,5 +1,8 @@
+import os
+import tempfile
 import unittest
 from unittest import skipIf
+from unittest.mock import Mock, patch
 
 import numpy as np
 import gensim
@@ -7,8 +10,10 @@ from AnyQt.QtCore import QItemSelectionModel
 
 from Orange.widgets.tests.base import WidgetTest
 from orangecontrib.text.corpus import Corpus
-from orangecontrib.text.topics import Topics
-from orangecontrib.text.widgets.owtopicmodeling import OWTopicModeling
+from orangecontrib.text.topics import Topics, LdaWrapper, LsiWrapper
+from orangecontrib.text.topics.topics import GensimWrapper
+from orangecontrib.text.widgets.owtopicmodeling import OWTopicModeling, \
+    MAX_SAVED_MODELS, SAVING_SUFFIX, _model_path, _run, _save_model
 
 
 class TestTopicModeling(WidgetTest):
@@ -79,6 +84,95 @@ class TestTopicModeling(WidgetTest):
         self.assertNotEqual(self.widget.perplexity, "n/a")
         self.assertTrue(self.widget.coherence)
 
+    def test_nmf(self):
+        self.widget.method_index = 3
+        self.send_signal(self.widget.Inputs.corpus, self.corpus)
+        self.wait_until_finished()
+        output = self.get_output(self.widget.Outputs.corpus)
+        self.assertEqual(output.X.shape, (len(self.corpus), 10))
+        self.assertTrue(np.all(output.X >= 0))
+        self.assertEqual(len(self.get_output(self.widget.Outputs.all_topics)),
+                         10)
+        self.assertNotEqual(self.widget.coherence, "n/a")
+
+    def test_reuse_models(self):
+        self.assertFalse(self.widget.reuse_models)
+        self.widget.method_index = 1
+        self.widget.reuse_models = True
+        with tempfile.TemporaryDirectory() as path, \
+                patch("orangecontrib.text.widgets.owtopicmodeling.cache_dir",
+                      return_value=path), \
+                patch.object(LdaWrapper, "fit",
+                             side_effect=LdaWrapper.fit, autospec=True) as fit:
+            self.send_signal(self.widget.Inputs.corpus, self.corpus)
+            output1 = self.get_output(self.widget.Outputs.corpus)
+            self.assertEqual(fit.call_count, 1)
+
+            w = self.create_widget(OWTopicModeling,
+                                   stored_settings={"method_index": 1,
+                                                    "reuse_models": True})
+            self.send_signal(w.Inputs.corpus, self.corpus, widget=w)
+            output2 = self.get_output(w.Outputs.corpus, widget=w)
+            self.assertEqual(fit.call_count, 1)
+            np.testing.assert_array_equal(output1.X, output2.X)
+            self.assertIsNotNone(self.get_output(w.Outputs.all_topics, widget=w))
+
+            w.reuse_models = False
+            w.commit()
+            self.wait_until_finished(widget=w)
+            self.assertEqual(fit.call_count, 2)
+
+    def test_damaged_model(self):
+        model = LdaWrapper(num_topics=2)
+        with tempfile.TemporaryDirectory() as root, \
+                patch("orangecontrib.text.widgets.owtopicmodeling.cache_dir",
+                      return_value=root):
+            path = _model_path(self.corpus, model)
+            os.makedirs(path)
+            with open(os.path.join(path, "manifest.json"), "w") as f:
+                f.write("{")
+            state = Mock()
+            state.is_interruption_requested.return_value = False
+            with self.assertLogs("orangecontrib.text.widgets.owtopicmodeling",
+                                 "WARNING"):
+                _run(self.corpus, model, state, reuse=True)
+            # the damaged model is replaced
+            self.assertIsNotNone(GensimWrapper.load(path).model)
+
+    def test_save_model(self):
+        corpus = self.corpus.copy()
+        model = LdaWrapper(num_topics=2)
+        model.fit(corpus)
+        with tempfile.TemporaryDirectory() as root:
+            saving = os.path.join(root, "other" + SAVING_SUFFIX)
+            os.makedirs(saving)
+            for i in range(MAX_SAVED_MODELS + 1):
+                _save_model(model, os.path.join(root, str(i)))
+            # models being saved by other processes are not pruned
+            self.assertEqual(sorted(os.listdir(root)),
+                             [str(i) for i in range(1, MAX_SAVED_MODELS + 1)]
+                             + ["other" + SAVING_SUFFIX])
+
+            os.utime(saving, (0, 0))
+            _save_model(model, os.path.join(root, "0"))
+            self.assertNotIn("other" + SAVING_SUFFIX, os.listdir(root))
+            # saving the same model again keeps the existing one
+            _save_model(model, os.path.join(root, "0"))
+            self.assertIsNotNone(GensimWrapper.load(
+                os.path.join(root, "0")).model)
+
+    def test_model_path(self):
+        model = LdaWrapper(num_topics=2)
+        path = _model_path(self.corpus, model)
+        self.assertEqual(path, _model_path(self.corpus.copy(), model))
+        self.assertNotEqual(path, _model_path(self.corpus[:5], model))
+        self.assertNotEqual(path, _model_path(self.corpus,
+                                              LdaWrapper(num_topics=3)))
+        self.assertNotEqual(
+            _model_path(self.corpus, LsiWrapper(num_topics=2)),
+            _model_path(self.corpus, LsiWrapper(num_topics=2,
+                                                randomized=True)))
+
 
 if __name__ == "__main__":
     unittest.main()
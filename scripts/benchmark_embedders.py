@@ -0,0 +1,135 @@
+"""
+Benchmark server embedders against a local mock server.
+
+Reports documents per second, the highest number of concurrent requests
+seen by the server and cache hit rates of a repeated run for DocumentEmbedder,
+SBERT, SemanticSearch and TweetProfiler, for every combination of
+max_parallel_requests and chunk size. For example:
+
+    python scripts/benchmark_embedders.py --docs 10000 --latency 0.05 \\
+        --parallel 1 10 100 --chunk-size 10000 50000
+"""
+import argparse
+import random
+import tempfile
+import time
+from unittest.mock import patch
+
+from Orange.data import StringVariable
+
+from orangecontrib.text import Corpus
+from orangecontrib.text.misc.mock_server import MockServer
+from orangecontrib.text.semantic_search import SemanticSearch
+from orangecontrib.text.tweet_profiler import TweetProfiler
+from orangecontrib.text.vectorization import sbert as sbert_module
+from orangecontrib.text.vectorization.document_embedder import \
+    DocumentEmbedder
+from orangecontrib.text.vectorization.sbert import SBERT
+
+WORDS = ['alpha', 'beta', 'gamma', 'delta', 'epsilon', 'zeta', 'eta', 'theta',
+         'iota', 'kappa', 'lambda', 'mu', 'nu', 'xi', 'omicron', 'pi']
+
+
+def make_documents(n, length, seed=0):
+    rng = random.Random(seed)
+    return [' '.join(rng.choice(WORDS) for _ in range(length)) + '.'
+            for _ in range(n)]
+
+
+def run_sbert(url, texts):
+    embedder = SBERT(server_url=url)
+    return embedder, lambda: embedder(texts), embedder._server_communicator
+
+
+def run_fasttext(url, texts):
+    embedder = DocumentEmbedder(server_url=url)
+    tokens = [text.split() for text in texts]
+    return embedder, lambda: embedder(tokens), embedder._embedder
+
+
+def run_search(url, texts):
+    embedder = SemanticSearch(server_url=url)
+    return embedder, lambda: embedder(texts, ['alpha beta']), \
+        embedder._server_communicator
+
+
+def run_tweets(url, texts):
+    profiler = TweetProfiler(server=url)
+    text_var = StringVariable('Tweet')
+    corpus = Corpus.from_documents(texts, 'tweets', metas=[(text_var, str)])
+    return None, lambda: profiler.transform(
+        corpus, text_var, 'Multiclass', 'Probabilities'), None
+
+
+EMBEDDERS = {
+    'sbert': run_sbert,
+    'fasttext': run_fasttext,
+    'search': run_search,
+    'tweets': run_tweets,
+}
+
+
+def measure(server, call, n_docs):
+    server.reset_stats()
+    start = time.perf_counter()
+    call()
+    elapsed = time.perf_counter() - start
+    stats = dict(server.stats)
+    return {
+        'docs/s': n_docs / elapsed,
+        'requests': stats.get('requests', 0),
+        'concurrent': stats.get('concurrent', 0),
+        'hit rate': 1 - stats.get('items', 0) / n_docs,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument('--docs', type=int, default=2000)
+    parser.add_argument('--length', type=int, default=30,
+                        help='words per document')
+    parser.add_argument('--latency', type=float, default=0.02)
+    parser.add_argument('--error-rate', type=float, default=0)
+    parser.add_argument('--timeout-rate', type=float, default=0)
+    parser.add_argument('--parallel', type=int, nargs='+', default=[100])
+    parser.add_argument('--chunk-size', type=int, nargs='+',
+                        default=[sbert_module.MAX_CHUNK_SIZE])
+    parser.add_argument('--embedders', nargs='+', default=list(EMBEDDERS),
+                        choices=list(EMBEDDERS))
+    args = parser.parse_args()
+
+    texts = make_documents(args.docs, args.length)
+    header = '{:<9} {:>8} {:>10} {:>10} {:>9} {:>10} {:>9} {:>9}'
+    row = '{:<9} {:>8} {:>10} {:>10.1f} {:>9} {:>10} {:>9.1f} {:>9.0%}'
+    print(header.format('embedder', 'parallel', 'chunk size', 'docs/s',
+                        'requests', 'concurrent', 'warm d/s', 'hit rate'))
+
+    # keep mock embeddings out of the user's embedding store
+    with MockServer(args.latency, args.error_rate, args.timeout_rate) \
+            as server, tempfile.TemporaryDirectory() as store_dir, \
+            patch('orangecontrib.text.vectorization.embedding_store.cache_dir',
+                  return_value=store_dir):
+        for name in args.embedders:
+            for parallel in args.parallel:
+                for chunk_size in args.chunk_size:
+                    sbert_module.MAX_CHUNK_SIZE = chunk_size
+                    embedder, call, communicator = \
+                        EMBEDDERS[name](server.url, texts)
+                    if communicator is not None:
+                        communicator.max_parallel_requests = parallel
+                    if embedder is not None:
+                        embedder.clear_cache()
+                    try:
+                        cold = measure(server, call, len(texts))
+                        warm = measure(server, call, len(texts))
+                    finally:
+                        if embedder is not None:
+                            embedder.clear_cache()
+                    print(row.format(name, parallel, chunk_size,
+                                     cold['docs/s'], cold['requests'],
+                                     cold['concurrent'], warm['docs/s'],
+                                     warm['hit rate']))
+
+
+if __name__ == '__main__':
+    main()